@@ -31,6 +31,11 @@ class FileLoader(modulecor.RigModule):
         self.root_nodes = None
         self.constraints_loaded = False
 
+    @property
+    def sync_steps(self):
+        """ Other modules might use the loaded nodes and the loaded constraints can point to any module. """
+        return self.load_step, 'deform_build'
+
     def load_file(self):
         self.root_nodes = fileutl.import_file(self.path)
         for rn in self.root_nodes:
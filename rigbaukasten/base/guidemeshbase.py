@@ -17,6 +17,8 @@ class GuideMesh(modulecor.RigModule):
             - Everything this module does can be published to rig data of other modules, so it'll be easy to get rid
               of it later if needed.
     """
+    sync_steps = ('skeleton_build', 'deform_build')  # modifies the guides and skinClusters of other modules
+
     def __init__(
             self,
             mesh,
@@ -88,6 +88,8 @@ class HumanIkCustomRig(modulecor.RigModule):
     neck and legs parallel to the world Y axis and feet parallel to the world Z axis. This is important to ensure that
     two characters can be matched without any baked-in offsets.
     """
+    sync_steps = ('skeleton_connect_post', 'puppet_connect_post')  # needs the complete skeleton/puppet
+
     def __init__(
             self,
             skeleton_t_pose_setter=default_skeleton_t_pose_setter,
@@ -19,8 +19,9 @@ class RigSets(modulecor.RigModule):
         :param module_name: str - unique name for the module
         """
         super().__init__(side=side, module_name=module_name)
-        self.load_rigdata(io_type='rigsets')
         parent_set_name = self.mk('parent_RIGSET')
+        if not pm.objExists(parent_set_name):  # rig sets are kept in the scene for incremental rebuilds
+            self.load_rigdata(io_type='rigsets')
         if pm.objExists(parent_set_name):
             # parent set was already created by load_rigdata()
             self.parent_set = pm.PyNode(parent_set_name)
@@ -0,0 +1,292 @@
+""" Build every puppet module in isolation and every rig build template end to end and measure the results, so
+    performance regressions show up before a rig ships.
+
+    Usage:
+        mayapy -m rigbaukasten.benchmarks.modulebench --output bench.json --baseline baseline.json
+        mayapy -m rigbaukasten.benchmarks.modulebench --save-baseline baseline.json
+    Per case the build time, the number of created nodes, the size of the saved mayaBinary file and the playback
+    fps of a canned animation on all controls are recorded. With --baseline every metric is compared against the
+    stored baseline and the exit code is 1 if one of them got worse by more than the threshold (or a case failed).
+
+    The benchmark assets live in a temporary project, unless --project is given. To build the cases on standard
+    guides instead of the module defaults, publish the guides to <project>/characters/<case>/rigdata. The templates
+    load the latest model from <project>/characters/<template>/model, if there is none a placeholder model with a
+    '<template>_body_mdl' mesh is saved there (or the file given with --model is copied).
+    ATTENTION: Opens new scenes.
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+DEFAULT_THRESHOLD = 0.15  # relative change that counts as regression
+PLAYBACK_FRAMES = 100
+ASSET_TYPE = 'characters'
+METRICS = {  # metric: True if higher is better
+    'build_time': False,
+    'node_count': False,
+    'file_size': False,
+    'fps': True,
+}
+
+
+def get_module_cases():
+    """ Get the isolated module cases: {name: function that returns the modules to add to the rig build}.
+        Modules that need joints to hook into are built on a small 'C_driver' fk chain.
+    """
+    from rigbaukasten.puppet import aimpup, chainspup, jointpup, limbspup, mainpup, spinepup
+    from rigbaukasten.utils.typesutl import Jnt, Ctl
+
+    def driver():
+        return [
+            mainpup.MainControl(size=100),
+            chainspup.SimpleFk(side='C', module_name='driver', nr_of_joints=3, size=10, hook=Ctl('C_main', -1)),
+        ]
+
+    return {
+        'FKIkLimb': lambda: [limbspup.FKIkLimb(side='L', module_name='arm', size=10)],
+        'FKIkLeg': lambda: [limbspup.FKIkLimb(side='L', module_name='leg', size=10, as_leg=True, with_foot=False)],
+        'FKIkLegFoot': lambda: [limbspup.FKIkLimb(side='L', module_name='leg', size=10, as_leg=True, with_foot=True)],
+        'Spine': lambda: [spinepup.Spine(size=10)],
+        'SimpleFk': lambda: [chainspup.SimpleFk(side='C', module_name='chain', nr_of_joints=5, size=10)],
+        'AimCtl': lambda: driver() + [aimpup.AimCtl(
+            side='C', module_name='aim', hook=Jnt('C_driver', 0), end_hook=Jnt('C_driver', 2), size=10
+        )],
+        'StretchyJoint': lambda: driver() + [jointpup.StretchyJoint(
+            side='C', module_name='stretchy', hook=Jnt('C_driver', 0), end_hook=Jnt('C_driver', 2), size=10
+        )],
+        'SimpleHingeHelpers': lambda: driver() + [jointpup.SimpleHingeHelpers(
+            side='C', module_name='hinge', hook=Jnt('C_driver', 1), parent_hook=Jnt('C_driver', 0), size=10
+        )],
+        'VolumePushers': lambda: driver() + [jointpup.VolumePushers(
+            side='C', module_name='pushers', hook=Jnt('C_driver', 1), parent_hook=Jnt('C_driver', 0), size=10
+        )],
+        'ShearHinge': lambda: driver() + [jointpup.ShearHinge(
+            side='C', module_name='shear', hook=Jnt('C_driver', 1), parent_hook=Jnt('C_driver', 0), size=10
+        )],
+    }
+
+
+def get_template_cases():
+    """ Get the rig build template cases: {template name: path to the template file}. """
+    templates_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'resources', 'rig_build_templates')
+    return {
+        f.replace('.py', ''): os.path.join(templates_path, f)
+        for f in sorted(os.listdir(templates_path)) if f.endswith('.py')
+    }
+
+
+def set_environment(project_path, asset_name):
+    import rigbaukasten
+    rigbaukasten.environment.set(project_path=project_path, asset_type=ASSET_TYPE, asset_name=asset_name)
+
+
+def new_scene():
+    """ Open a new scene and return the number of default nodes in it. """
+    from maya import cmds
+    cmds.file(new=True, force=True)
+    return len(cmds.ls())
+
+
+def save_placeholder_model(project_path, asset_name, model=None):
+    """ Make sure the asset has a model file, copy the given model or save a placeholder body mesh. """
+    import pymel.core as pm
+    models_dir = os.path.join(project_path, ASSET_TYPE, asset_name, 'model')
+    os.makedirs(models_dir, exist_ok=True)
+    if any(f.startswith(f'{asset_name}_model_v') for f in os.listdir(models_dir)):
+        return
+    path = os.path.join(models_dir, f'{asset_name}_model_v001.ma')
+    if model:
+        shutil.copyfile(model, path)
+        return
+    pm.newFile(f=True)
+    pm.polyCylinder(n=f'{asset_name}_body_mdl', h=180, r=20, sy=40, ch=False)
+    pm.saveAs(path, type='mayaAscii', f=True)
+
+
+def get_module_rig_build_class(add_modules):
+    """ Create a RigBuild class that holds nothing but the modules of the case. """
+    from rigbaukasten.core import modulecor
+
+    class RigBuild(modulecor.RigBuild):
+        prefetch_rigdata = False
+
+        def __init__(self):
+            super().__init__()
+            for mod in add_modules():
+                self.add_module(mod)
+
+    return RigBuild
+
+
+def get_template_rig_build_class(template_path):
+    from rigbaukasten.utils import pythonutl
+    return pythonutl.import_module(template_path).RigBuild
+
+
+def measure_playback(frames=PLAYBACK_FRAMES):
+    """ Play back a rotation wave on all controls and pull the outputs of the rig after each frame.
+        :return: float - frames per second
+    """
+    from maya import cmds
+    from rigbaukasten.core import evalprofilecor
+    evalprofilecor.animate_ctls(1, frames)
+    outputs = evalprofilecor.get_evaluation_outputs()
+    start = time.perf_counter()
+    for frame in range(1, frames + 1):
+        cmds.currentTime(frame, update=True)
+        for plug in outputs:
+            cmds.getAttr(plug)
+    duration = time.perf_counter() - start
+    return frames / duration if duration else 0.0
+
+
+def run_case(rig_build_class, output_dir, name, frames=PLAYBACK_FRAMES):
+    """ Build, save and play back one case.
+        :return: {metric: value} for all METRICS
+    """
+    from maya import cmds
+    default_nodes = new_scene()
+    start = time.perf_counter()
+    rig = rig_build_class()
+    rig.run()
+    build_time = time.perf_counter() - start
+    node_count = len(cmds.ls()) - default_nodes
+
+    path = os.path.join(output_dir, f'{name}.mb')
+    cmds.file(rename=path)
+    cmds.file(save=True, type='mayaBinary', force=True)
+    file_size = os.path.getsize(path)
+
+    fps = measure_playback(frames)
+    return {'build_time': build_time, 'node_count': node_count, 'file_size': file_size, 'fps': fps}
+
+
+def run(project_path=None, cases=None, model=None, frames=PLAYBACK_FRAMES):
+    """ Run the benchmark cases. Failing cases are recorded with their error and don't stop the other cases.
+        :param project_path: str - project for the benchmark assets, default is a temporary folder
+        :param cases: [str, ] - only run these cases (module class or template names), default is all
+        :param model: str - model file for the template cases that have no model in the project yet
+        :param frames: int - length of the canned animation
+        :return: {'meta': {...}, 'results': {case: {'status': 'success'|'failed', metric: value, ...}}}
+    """
+    from maya import cmds
+    project_path = project_path or tempfile.mkdtemp(prefix='rbkModuleBench_')
+    output_dir = os.path.join(project_path, 'bench_scenes')
+    os.makedirs(output_dir, exist_ok=True)
+
+    all_cases = {name: ('module', func) for name, func in get_module_cases().items()}
+    all_cases.update({name: ('template', path) for name, path in get_template_cases().items()})
+    if cases:
+        unknown = [c for c in cases if c not in all_cases]
+        if unknown:
+            raise ValueError(f'Unknown benchmark cases {unknown}, available: {list(all_cases)}')
+        all_cases = {name: all_cases[name] for name in cases}
+
+    results = {}
+    for name, (kind, data) in all_cases.items():
+        print(f'Benchmarking {kind} {name}...')
+        set_environment(project_path, name)
+        try:
+            if kind == 'template':
+                save_placeholder_model(project_path, name, model)
+                rig_build_class = get_template_rig_build_class(data)
+            else:
+                rig_build_class = get_module_rig_build_class(data)
+            results[name] = {'status': 'success', **run_case(rig_build_class, output_dir, name, frames)}
+        except Exception as e:
+            print(f'FAILED! {name}: {e}')
+            results[name] = {'status': 'failed', 'error': str(e)}
+    return {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'maya_version': cmds.about(version=True),
+            'frames': frames,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """ Compare the results against the baseline.
+        :param results: dict - as returned by run()
+        :param baseline: dict - as returned by run()
+        :param threshold: float - relative change that counts as regression, e.g. 0.15 for 15%
+        :return: [(case, metric, baseline value, new value, relative change), ] - all regressions
+    """
+    regressions = []
+    for case, old in baseline['results'].items():
+        new = results['results'].get(case)
+        if new is None or old['status'] != 'success':
+            continue
+        if new['status'] != 'success':
+            regressions.append((case, 'status', old['status'], new['status'], 0.0))
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if not old.get(metric):
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            if higher_is_better:
+                change = -change
+            if change > threshold:
+                regressions.append((case, metric, old[metric], new[metric], change))
+    return regressions
+
+
+def print_results(results, regressions=()):
+    print(f'{"case":<22}{"build s":>10}{"nodes":>9}{"file kb":>10}{"fps":>9}')
+    for case, data in results['results'].items():
+        if data['status'] != 'success':
+            print(f'{case:<22}  FAILED: {data["error"]}')
+            continue
+        print(
+            f'{case:<22}{data["build_time"]:>10.2f}{data["node_count"]:>9}'
+            f'{data["file_size"] / 1024:>10.1f}{data["fps"]:>9.1f}'
+        )
+    for case, metric, old, new, change in regressions:
+        if metric == 'status':
+            print(f'REGRESSION! {case} failed, was successful in the baseline.')
+        else:
+            print(f'REGRESSION! {case} {metric}: {old:.2f} -> {new:.2f} ({change:+.0%} worse)')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the puppet modules and rig build templates.')
+    parser.add_argument('--cases', nargs='+', help='only run these cases, default: all')
+    parser.add_argument('--project', help='project folder for the benchmark assets, default: a temporary folder')
+    parser.add_argument('--model', help='model file for the template cases')
+    parser.add_argument('--frames', type=int, default=PLAYBACK_FRAMES, help='length of the canned animation')
+    parser.add_argument('--output', help='write the results to this json file')
+    parser.add_argument('--baseline', help='compare the results against this json file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative change that counts as regression, default: %(default)s')
+    parser.add_argument('--save-baseline', help='write the results as new baseline to this json file')
+    parsed = parser.parse_args(args)
+
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    results = run(parsed.project, parsed.cases, parsed.model, parsed.frames)
+
+    regressions = []
+    if parsed.baseline:
+        with open(parsed.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), parsed.threshold)
+    print_results(results, regressions)
+
+    for path in (parsed.output, parsed.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=4)
+            print(f'Wrote benchmark results to {path}')
+
+    failed = [case for case, data in results['results'].items() if data['status'] != 'success']
+    return 1 if regressions or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
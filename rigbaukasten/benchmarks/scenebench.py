@@ -0,0 +1,112 @@
+""" Compare the per call cost of pymel and the cmds / OpenMaya 2 functions in sceneutl.
+
+    Usage:
+        mayapy -m rigbaukasten.benchmarks.scenebench --iterations 1000
+    or in the maya script editor:
+        from rigbaukasten.benchmarks import scenebench
+        scenebench.run()
+    ATTENTION: Opens a new scene.
+"""
+import argparse
+import sys
+import time
+
+
+def _time_per_call(func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations
+
+
+def get_cases():
+    """ Get the benchmark cases: {name: (pymel function, sceneutl function)}, each function takes the loop index.
+        Both functions of a case do the same work on the same fresh scene from setup().
+    """
+    import pymel.core as pm
+    from maya import cmds
+    from rigbaukasten.utils import attrutl, sceneutl
+
+    def setup(iterations):
+        pm.newFile(f=True)
+        pm.group(em=True, n='bench_parent_TRN')
+        for i in range(iterations):  # one node per iteration
+            cmds.createNode('transform', n=f'bench{i}_TRN', ss=True)
+            cmds.createNode('multDoubleLinear', n=f'bench{i}_MDL', ss=True)
+
+    cases = {
+        'create node': (
+            lambda i: pm.createNode('multDoubleLinear', n=f'benchCreate{i}_MDL'),
+            lambda i: sceneutl.create_node('multDoubleLinear', f'benchCreate{i}_MDL'),
+        ),
+        'set attr': (
+            lambda i: pm.PyNode(f'bench{i}_MDL').i2.set(i),
+            lambda i: sceneutl.set_attr(f'bench{i}_MDL.i2', i),
+        ),
+        'get attr': (
+            lambda i: pm.PyNode(f'bench{i}_MDL').i2.get(),
+            lambda i: sceneutl.get_attr(f'bench{i}_MDL.i2'),
+        ),
+        'connect': (
+            lambda i: pm.PyNode(f'bench{i}_TRN').tx.connect(pm.PyNode(f'bench{i}_MDL').i1, force=True),
+            lambda i: sceneutl.connect(f'bench{i}_TRN.tx', f'bench{i}_MDL.i1'),
+        ),
+        'add attr': (
+            lambda i: pm.addAttr(f'bench{i}_TRN', ln='benchAttr', at='float', k=True),
+            lambda i: sceneutl.add_attr(f'bench{i}_TRN', 'benchAttr', attributeType='float', keyable=True),
+        ),
+        'lock transforms': (
+            lambda i: [
+                a.set(lock=True, keyable=False, channelBox=False)
+                for a in [pm.PyNode(f'bench{i}_TRN').t] + list(pm.PyNode(f'bench{i}_TRN').t.iterDescendants())
+            ],
+            lambda i: attrutl.lock(f'bench{i}_TRN.t'),
+        ),
+        'world matrix': (
+            lambda i: pm.PyNode(f'bench{i}_TRN').getMatrix(worldSpace=True),
+            lambda i: sceneutl.get_world_matrix(f'bench{i}_TRN'),
+        ),
+        'parent': (
+            lambda i: pm.PyNode(f'bench{i}_TRN').setParent('bench_parent_TRN'),
+            lambda i: sceneutl.set_parent(f'bench{i}_TRN', 'bench_parent_TRN'),
+        ),
+    }
+    return setup, cases
+
+
+def run(iterations=1000):
+    """ Run all benchmark cases and print the results.
+        :param iterations: int - calls per case
+        :return: {case: {'pymel': seconds per call, 'sceneutl': seconds per call}}
+    """
+    setup, cases = get_cases()
+    results = {}
+    for case, (pymel_func, fast_func) in cases.items():
+        setup(iterations)
+        pymel_time = _time_per_call(pymel_func, iterations)
+        setup(iterations)  # same names and scene state for the second run
+        results[case] = {'pymel': pymel_time, 'sceneutl': _time_per_call(fast_func, iterations)}
+    print_results(results)
+    return results
+
+
+def print_results(results):
+    print(f'{"case":<20}{"pymel us":>12}{"sceneutl us":>14}{"speedup":>10}')
+    for case, times in results.items():
+        speedup = times['pymel'] / times['sceneutl'] if times['sceneutl'] else 0.0
+        print(f'{case:<20}{times["pymel"] * 1e6:>12.1f}{times["sceneutl"] * 1e6:>14.1f}{speedup:>9.1f}x')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Compare pymel and sceneutl per call costs.')
+    parser.add_argument('--iterations', type=int, default=1000)
+    parsed = parser.parse_args(args)
+
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    run(parsed.iterations)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
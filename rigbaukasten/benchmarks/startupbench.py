@@ -0,0 +1,95 @@
+""" Measure the cost of importing rbk_startup and running rbk_startup.main(), which runs on every maya start for
+    every artist.
+
+    Usage:
+        mayapy -m rigbaukasten.benchmarks.startupbench --runs 5
+    Every run starts maya.standalone in a fresh interpreter, so nothing is cached in sys.modules. There is no main
+    window in mayapy, so the menu commands are replaced by no-ops, everything else main() does (environment, paths,
+    menu structure) is measured. The exit code is 1 if the best run is slower than the budget or one of the heavy
+    modules is imported at startup, so this can run as a check in CI.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+
+STARTUP_BUDGET = 0.25  # seconds for importing rbk_startup and running main(), without maya.standalone itself
+HEAVY_MODULES = [
+    'pymel.core',
+    'PySide2',
+    'rigbaukasten.core.modulecor',
+    'rigbaukasten.library.controllib',
+    'rigbaukasten.pipeline.newrigbuildpip',
+    'rigbaukasten.utils.mirrorutl',
+]
+
+_MEASURE = '''
+import json, sys, time
+import maya.standalone
+maya.standalone.initialize()
+from maya import cmds, mel
+
+
+def _ui(*args, **kwargs):
+    if kwargs.get('q') or kwargs.get('query'):
+        return [] if kwargs.get('itemArray') else False
+    return args[0] if args else 'rbkStartupBench'
+
+
+# no main window in mayapy, the menu commands don't build any UI
+for name in ('menu', 'menuItem', 'deleteUI', 'setParent'):
+    setattr(cmds, name, _ui)
+cmds.lsUI = lambda *args, **kwargs: []
+_eval = mel.eval
+mel.eval = lambda cmd: 'MayaWindow' if '$gMainWindow' in cmd else _eval(cmd)
+
+start = time.perf_counter()
+from rigbaukasten import rbk_startup
+rbk_startup.main()
+duration = time.perf_counter() - start
+print(json.dumps({'duration': duration, 'modules': sorted(sys.modules)}))
+'''
+
+
+def measure_import(python=sys.executable):
+    """ Import rbk_startup and run its main() in a new interpreter.
+        :param python: str - the interpreter to use, should be mayapy
+        :return: (seconds, [names of the imported modules])
+    """
+    output = subprocess.run([python, '-c', _MEASURE], check=True, capture_output=True, text=True).stdout
+    data = json.loads(output.strip().splitlines()[-1])
+    return data['duration'], data['modules']
+
+
+def run(runs=5, budget=STARTUP_BUDGET, python=sys.executable):
+    """ Measure the startup several times and compare the best run against the budget.
+        :return: bool - True if the startup is within budget and imports none of the HEAVY_MODULES
+    """
+    durations = []
+    modules = []
+    for _ in range(runs):
+        duration, modules = measure_import(python)
+        durations.append(duration)
+    heavy = [m for m in HEAVY_MODULES if m in modules]
+    best = min(durations)
+    print(f'rbk_startup import and main(): best {best * 1e3:.1f} ms, worst {max(durations) * 1e3:.1f} ms, '
+          f'budget {budget * 1e3:.1f} ms')
+    if heavy:
+        print(f'FAILED! Heavy modules imported at startup: {heavy}')
+    if best > budget:
+        print(f'FAILED! rbk_startup is {best / budget:.1f}x over budget.')
+    return best <= budget and not heavy
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Check the rbk_startup time against the budget.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, help='seconds')
+    parser.add_argument('--python', default=sys.executable, help='interpreter to measure, default: this one')
+    parsed = parser.parse_args(args)
+    return 0 if run(parsed.runs, parsed.budget, parsed.python) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
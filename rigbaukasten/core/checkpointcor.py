@@ -0,0 +1,164 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+
+import pymel.core as pm
+
+import rigbaukasten
+from rigbaukasten.core import rebuildcor
+from rigbaukasten.utils.typesutl import ALL_STEPS
+
+
+DEFAULT_MAX_CACHE_SIZE = 10 * 1024 ** 3  # 10 GB
+SCENE_EXT = '.mb'
+STATE_EXT = '.rig'
+
+
+class _CheckpointPickler(pickle.Pickler):
+    """ Store PyNodes by name, the nodes themselves are in the checkpoint scene. """
+    def persistent_id(self, obj):
+        if isinstance(obj, pm.PyNode):
+            try:
+                name = str(obj)
+            except pm.MayaNodeError:
+                return 'PyNode', None
+            return 'PyNode', name if pm.objExists(name) else None
+        return None
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        typ, name = pid
+        if typ != 'PyNode':
+            raise pickle.UnpicklingError(f'Unknown persistent id: {pid}')
+        return pm.PyNode(name) if name else None
+
+
+def get_checkpoint_folder():
+    return rigbaukasten.environment.get_build_cache_path('checkpoints')
+
+
+def get_build_key(rig):
+    """ Get a hash of the build script and everything the modules are built from (see rebuildcor.fingerprint_modules).
+        Checkpoints are only valid for the exact same key.
+    """
+    data = {
+        'build_script': rebuildcor.file_hash(inspect.getsourcefile(type(rig))),
+        'fingerprints': rig.fingerprints or rebuildcor.fingerprint_modules(rig),
+    }
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def get_checkpoint_name(build_key, step):
+    return f'{build_key}_{ALL_STEPS.index(step):02d}_{step}'
+
+
+def save_checkpoint(rig, step, max_size=DEFAULT_MAX_CACHE_SIZE):
+    """ Export the current scene as mayaBinary and pickle the rig build next to it.
+        The current scene name is not changed.
+        :param rig: RigBuild - the rig build, must have completed the given step
+        :param step: str - the build step that was just completed
+        :param max_size: int - max size of the checkpoint cache in bytes, older checkpoints are removed
+        :return: str - path of the scene file or None if the rig state could not be saved
+    """
+    folder = get_checkpoint_folder()
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    name = get_checkpoint_name(get_build_key(rig), step)
+    scene_path = os.path.join(folder, name + SCENE_EXT)
+    state_path = os.path.join(folder, name + STATE_EXT)
+    tmp_path = state_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            _CheckpointPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(rig)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        pm.warning(f'Cannot save checkpoint after {step}, the rig build cannot be pickled: {e}')
+        os.remove(tmp_path)
+        return None
+    pm.exportAll(scene_path, type='mayaBinary', force=True, preserveReferences=True)
+    os.replace(tmp_path, state_path)  # the state file marks the checkpoint as complete
+    print(f'Saved checkpoint after {step} to {scene_path}')
+    evict_checkpoints(max_size)
+    return scene_path
+
+
+def list_checkpoints(build_key=None):
+    """ Get all complete checkpoints in the cache.
+        :param build_key: str - only get checkpoints for this key
+        :return: [(build_key, step, scene_path, state_path), ...]
+    """
+    folder = get_checkpoint_folder()
+    if not os.path.exists(folder):
+        return []
+    checkpoints = []
+    for file_name in os.listdir(folder):
+        if not file_name.endswith(STATE_EXT):
+            continue
+        base = file_name[:-len(STATE_EXT)]
+        key, _, step = base.split('_', 2)
+        scene_path = os.path.join(folder, base + SCENE_EXT)
+        if step not in ALL_STEPS or not os.path.exists(scene_path):
+            continue
+        if build_key and key != build_key:
+            continue
+        checkpoints.append((key, step, scene_path, os.path.join(folder, file_name)))
+    return checkpoints
+
+
+def find_checkpoint(rig, last_step='finalize_post'):
+    """ Find the newest valid checkpoint for the given rig build, that is not past the given step.
+        :return: (step, scene_path, state_path) or None
+    """
+    candidates = [
+        c for c in list_checkpoints(get_build_key(rig))
+        if ALL_STEPS.index(c[1]) <= ALL_STEPS.index(last_step)
+    ]
+    if not candidates:
+        return None
+    _, step, scene_path, state_path = max(candidates, key=lambda c: ALL_STEPS.index(c[1]))
+    return step, scene_path, state_path
+
+
+def load_checkpoint(scene_path, state_path):
+    """ Open the checkpoint scene and restore the rig build.
+        :return: RigBuild or None if the checkpoint could not be restored
+    """
+    pm.openFile(scene_path, force=True)
+    try:
+        with open(state_path, 'rb') as f:
+            rig = _CheckpointUnpickler(f).load()
+    except (pickle.UnpicklingError, pm.MayaNodeError, AttributeError, ImportError, EOFError) as e:
+        pm.warning(f'Cannot restore checkpoint {scene_path}: {e}')
+        return None
+    pm.renameFile('untitled')  # don't accidentally save over the checkpoint
+    for path in (scene_path, state_path):
+        os.utime(path)  # mark as recently used
+    rig.register_modules()
+    rig.current_step_completed = True
+    print(f'Resumed rig build from checkpoint after {rig.current_step}: {scene_path}')
+    return rig
+
+
+def evict_checkpoints(max_size=DEFAULT_MAX_CACHE_SIZE):
+    """ Delete the least recently used checkpoints until the cache is smaller than max_size bytes. """
+    folder = get_checkpoint_folder()
+    if not os.path.exists(folder):
+        return []
+    groups = {}  # checkpoint name: [paths]
+    for file_name in os.listdir(folder):
+        base = os.path.splitext(file_name)[0]
+        groups.setdefault(base, []).append(os.path.join(folder, file_name))
+    sizes = {base: sum(os.path.getsize(p) for p in paths) for base, paths in groups.items()}
+    last_used = {base: max(os.path.getmtime(p) for p in paths) for base, paths in groups.items()}
+    total = sum(sizes.values())
+    removed = []
+    for base in sorted(groups, key=last_used.get):
+        if total <= max_size:
+            break
+        for path in groups[base]:
+            os.remove(path)
+        total -= sizes[base]
+        removed.append(base)
+    return removed
@@ -0,0 +1,1261 @@
+""" Plan a rig build without maya: run a RigBuild against a recording stand-in for pymel, maya.cmds and OpenMaya.
+
+    Usage:
+        python -m rigbaukasten.core.dryruncor --project /path/to/project character/hero
+    or from a plain python session, before anything imported maya:
+        from rigbaukasten.core import dryruncor
+        scene = dryruncor.dry_run('character/hero', project_path='/path/to/project')
+        scene.print_summary()
+
+    The stand-in records created nodes, parenting, connections and set values in SCENE. Calls it doesn't know are
+    counted in SCENE.unhandled and return a DryValue, so the build carries on. Queried values (positions, matrices,
+    ...) are DryValues as well, so code that branches on scene values may take another path than in maya - the
+    result is a plan of the rig, not the rig itself.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+import traceback
+import types
+from collections import Counter
+
+from rigbaukasten.utils import errorutl
+from rigbaukasten.utils.typesutl import ALL_STEPS
+
+
+CONSTRAINT_OUTPUTS = {
+    'parentConstraint': ('translate', 'rotate'),
+    'pointConstraint': ('translate',),
+    'orientConstraint': ('rotate',),
+    'scaleConstraint': ('scale',),
+    'aimConstraint': ('rotate',),
+    'poleVectorConstraint': ('poleVector',),
+}
+SHAPE_TYPES = {'mesh', 'nurbsCurve', 'nurbsSurface', 'locator', 'camera', 'clusterHandle'}
+TRANSFORM_TYPES = {'transform', 'joint', 'ikHandle', 'ikEffector'} | set(CONSTRAINT_OUTPUTS)
+DAG_TYPES = TRANSFORM_TYPES | SHAPE_TYPES
+STR_METHODS = {m for m in dir(str) if not m.startswith('_')} - {'translate', 'center', 'count', 'index'}
+
+
+class DryValue(object):
+    """ Placeholder for every value the recording scene cannot know (positions, matrices, API objects, ...).
+        Supports attribute access, calls, math and unpacking into three values (most queried values are vectors).
+    """
+    def __init__(self, *_, **__):
+        pass
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return DryValue()
+
+    def __call__(self, *args, **kwargs):
+        return DryValue()
+
+    def __getitem__(self, item):
+        return DryValue()
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __iter__(self):
+        return iter([DryValue(), DryValue(), DryValue()])
+
+    def __len__(self):
+        return 3
+
+    def __bool__(self):
+        return True
+
+    def __float__(self):
+        return 0.0
+
+    def __int__(self):
+        return 0
+
+    __index__ = __int__
+
+    def __str__(self):
+        return 'dryRunValue'
+
+    def __repr__(self):
+        return '<DryValue>'
+
+    def __format__(self, spec):
+        return format(0.0, spec) if spec else str(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def _math(self, *_):
+        return DryValue()
+
+    __add__ = __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = __matmul__ = __rmatmul__ = _math
+    __truediv__ = __rtruediv__ = __floordiv__ = __mod__ = __pow__ = __rpow__ = __xor__ = __rxor__ = _math
+    __neg__ = __pos__ = __abs__ = __invert__ = _math
+
+    def __lt__(self, other):
+        return False
+
+    __le__ = __gt__ = __ge__ = __lt__
+
+
+class RecordingScene(object):
+    """ The nodes, hierarchy, connections and values a build created, in creation order. """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ Forget everything, including the unhandled calls and errors of the last dry run. """
+        self.unhandled = Counter()  # 'module.function': calls
+        self.module_stack = []  # module keys of the running build steps
+        self.step = None
+        self.callbacks = {}  # callback id: function, see OpenMaya.MDGMessage.addNodeAddedCallback()
+        self.error = None
+        self.duration = 0.0
+        self.clear()
+
+    def clear(self):
+        """ Remove all nodes, like a new scene. """
+        self.nodes = {}  # name: {'type': str, 'parent': str, 'module': str, 'step': str}
+        self.child_names = {}  # parent: [children]
+        self.inputs = {}  # destination plug: source plug
+        self.values = {}  # plug: value
+        self.attributes = {}  # node: [added attribute names]
+        self.selection = []
+
+    # ---------------------- Edit ---------------------- #
+
+    def unique_name(self, name):
+        name = str(name).split('|')[-1]
+        if name not in self.nodes and '#' not in name:
+            return name
+        base = name.replace('#', '').rstrip('0123456789')
+        i = 1
+        while f'{base}{i}' in self.nodes:
+            i += 1
+        return f'{base}{i}'
+
+    def create(self, typ, name=None, parent=None):
+        """ Add a node, shapes without parent get a transform like in maya.
+            :return: str - the unique name of the new node
+        """
+        if typ in SHAPE_TYPES and not parent:
+            parent = self.create('transform', name or f'{typ}1')
+            name = f'{parent}Shape'
+        name = self.unique_name(name or f'{typ}1')
+        self.nodes[name] = {
+            'type': typ,
+            'parent': None,
+            'module': self.module_stack[-1] if self.module_stack else None,
+            'step': self.step,
+        }
+        self.set_parent(name, parent)
+        for callback in list(self.callbacks.values()):
+            callback(Node(name), None)
+        return name
+
+    def rename(self, name, new_name):
+        new_name = self.unique_name(new_name)
+        self.nodes[new_name] = self.nodes.pop(name)
+        parent = self.nodes[new_name]['parent']
+        if parent:
+            siblings = self.child_names[parent]
+            siblings[siblings.index(name)] = new_name
+        self.child_names[new_name] = self.child_names.pop(name, [])
+        for child in self.child_names[new_name]:
+            self.nodes[child]['parent'] = new_name
+        self.inputs = {
+            self._renamed(d, name, new_name): self._renamed(s, name, new_name) for d, s in self.inputs.items()
+        }
+        return new_name
+
+    @staticmethod
+    def _renamed(plug, name, new_name):
+        node, _, attr = plug.partition('.')
+        return f'{new_name}.{attr}' if node == name else plug
+
+    def delete(self, name):
+        if name not in self.nodes:
+            return
+        for child in self.children(name):
+            self.delete(child)
+        self.set_parent(name, None)
+        del self.nodes[name]
+        self.child_names.pop(name, None)
+        self.inputs = {d: s for d, s in self.inputs.items() if name not in (s.split('.')[0], d.split('.')[0])}
+        self.selection = [s for s in self.selection if s != name]
+
+    def set_parent(self, name, parent=None):
+        old_parent = self.nodes[name]['parent']
+        if old_parent:
+            self.child_names[old_parent].remove(name)
+        parent = str(parent).split('|')[-1] if parent else None
+        self.nodes[name]['parent'] = parent
+        if parent:
+            self.child_names.setdefault(parent, []).append(name)
+
+    def connect(self, src, dst):
+        self.inputs[str(dst)] = str(src)
+
+    def disconnect(self, src, dst=None):
+        src = str(src)
+        self.inputs = {d: s for d, s in self.inputs.items() if not (s == src and (dst is None or d == str(dst)))}
+
+    @property
+    def connections(self):
+        """ :return: [(source plug, destination plug), ] """
+        return [(s, d) for d, s in self.inputs.items()]
+
+    # ---------------------- Query ---------------------- #
+
+    def node_type(self, name):
+        return self.nodes[str(name).split('.')[0].split('|')[-1]]['type']
+
+    def children(self, name):
+        return list(self.child_names.get(name, []))
+
+    def descendants(self, name):
+        result = []
+        for child in self.children(name):
+            result.append(child)
+            result.extend(self.descendants(child))
+        return result
+
+    def roots(self):
+        return [n for n, data in self.nodes.items() if not data['parent'] and data['type'] in DAG_TYPES]
+
+    # ---------------------- Report ---------------------- #
+
+    def nodes_per_module(self):
+        return Counter(data['module'] or '<outside modules>' for data in self.nodes.values())
+
+    def node_types(self):
+        return Counter(data['type'] for data in self.nodes.values())
+
+    def hierarchy(self, root=None, depth=0, max_depth=None):
+        """ Get the DAG hierarchy as indented lines, e.g. for printing. """
+        lines = []
+        for name in ([root] if root else self.roots()):
+            lines.append(f'{"    " * depth}{name} ({self.nodes[name]["type"]})')
+            if max_depth is None or depth < max_depth:
+                for child in self.children(name):
+                    lines.extend(self.hierarchy(child, depth + 1, max_depth))
+        return lines
+
+    def to_dict(self):
+        return {
+            'duration': self.duration,
+            'error': self.error,
+            'node_count': len(self.nodes),
+            'connection_count': len(self.connections),
+            'nodes_per_module': dict(self.nodes_per_module().most_common()),
+            'node_types': dict(self.node_types().most_common()),
+            'nodes': [dict(name=name, **data) for name, data in self.nodes.items()],
+            'connections': self.connections,
+            'unhandled_calls': dict(self.unhandled.most_common()),
+        }
+
+    def print_summary(self, top=20):
+        print(f'Dry run: {len(self.nodes)} nodes, {len(self.connections)} connections in {self.duration:.2f}s')
+        print(f'{"module":<40}{"nodes":>8}')
+        for module_key, count in self.nodes_per_module().most_common(top):
+            print(f'{module_key:<40}{count:>8}')
+        print(f'{"node type":<40}{"nodes":>8}')
+        for typ, count in self.node_types().most_common(top):
+            print(f'{typ:<40}{count:>8}')
+        if self.unhandled:
+            print(f'{len(self.unhandled)} functions were not recorded, their results are placeholders:')
+            for func, count in self.unhandled.most_common(top):
+                print(f'    {func:<36}{count:>8}')
+        if self.error:
+            print(f'FAILED! {self.error.splitlines()[-1]}')
+
+    def write_report(self, folder, name='dryRun'):
+        """ Write the full plan as json.
+            :return: str - path of the report
+        """
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        path = os.path.join(folder, f'{name}.json')
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+        return path
+
+
+SCENE = RecordingScene()
+
+
+# ---------------------- pymel stand-in ---------------------- #
+
+class MayaNodeError(Exception):
+    pass
+
+
+class MayaAttributeError(Exception):
+    pass
+
+
+class PyNode(object):
+    """ Stand-in for pm.PyNode, PyNode('name') looks the node or plug up in the recording scene. """
+    def __new__(cls, *args, **kwargs):
+        if cls is PyNode:
+            return get(args[0])
+        return super().__new__(cls)
+
+    def __str__(self):
+        return self._name
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._name!r})'
+
+    def __format__(self, spec):
+        return format(self._name, spec)
+
+    def __eq__(self, other):
+        return str(self) == str(other) if isinstance(other, (str, PyNode)) else False
+
+    def __hash__(self):
+        return hash(self._name)
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def name(self, *_, **__):
+        return self._name
+
+    def exists(self):
+        return self._name.split('.')[0] in SCENE.nodes
+
+    def __add__(self, other):
+        return self._name + other
+
+    def __radd__(self, other):
+        return other + self._name
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item == '_name':
+            raise AttributeError(item)
+        if item in STR_METHODS:  # pymel proxies the string methods to the name, e.g. node.replace('_JNT', '_GRP')
+            return getattr(self._name, item)
+        return Attribute(f'{self.node()}.{item}')
+
+
+class Node(PyNode):
+    def __init__(self, name, *_, **__):
+        self._name = str(name).split('|')[-1]
+
+    def node(self):
+        return self
+
+    def nodeName(self):
+        return self._name
+
+    shortName = longName = nodeName
+
+    def type(self):
+        return SCENE.node_type(self._name)
+
+    nodeType = type
+
+    def getParent(self, *_):
+        parent = SCENE.nodes[self._name]['parent']
+        return Node(parent) if parent else None
+
+    def setParent(self, parent=None, *_, **flags):
+        SCENE.set_parent(self._name, None if flags.get('world') or flags.get('w') else parent)
+
+    def getChildren(self, **flags):
+        return list_relatives(self, c=True, **flags)
+
+    def getShapes(self, **_):
+        return [Node(c) for c in SCENE.children(self._name) if SCENE.node_type(c) in SHAPE_TYPES]
+
+    def getShape(self, **_):
+        shapes = self.getShapes()
+        return shapes[0] if shapes else None
+
+    def listRelatives(self, **flags):
+        return list_relatives(self, **flags)
+
+    def listConnections(self, **flags):
+        return list_connections(self, **flags)
+
+    inputs = listConnections
+
+    def attr(self, attr_name):
+        return Attribute(f'{self._name}.{attr_name}')
+
+    def hasAttr(self, attr_name, *_, **__):
+        """ Only attributes added in the dry run are known. """
+        return attr_name in SCENE.attributes.get(self._name, [])
+
+    def hasFn(self, fn):
+        """ MObject.hasFn(), see _MFn """
+        return isinstance(fn, str) and is_type(self.type(), fn[1].lower() + fn[2:])
+
+    def addAttr(self, attr_name, **flags):
+        return add_attr(self, ln=attr_name, **flags)
+
+    def rename(self, new_name, **_):
+        self._name = SCENE.rename(self._name, new_name)
+        return self
+
+
+class Attribute(PyNode):
+    """ Stand-in for pm.Attribute, child plugs (node.t.tx) and elements (node.matrix[0]) are supported. """
+    def __init__(self, plug, *_, **__):
+        self._name = str(plug)
+
+    def node(self):
+        return Node(self._name.split('.')[0])
+
+    plugNode = node
+
+    def attrName(self, *_, **__):
+        return self._name.split('.')[-1]
+
+    plugAttr = attrName
+
+    def set(self, *values, **_):
+        if values:
+            SCENE.values[self._name] = values[0] if len(values) == 1 else values
+
+    def get(self, *_, **__):
+        return SCENE.values.get(self._name, DryValue())
+
+    def connect(self, other, *_, **__):
+        SCENE.connect(self, other)
+
+    __rshift__ = connect
+
+    def __lshift__(self, other):
+        SCENE.connect(other, self)
+
+    def disconnect(self, other=None, *_, **__):
+        SCENE.disconnect(self, other)
+
+    def listConnections(self, **flags):
+        return list_connections(self, **flags)
+
+    def inputs(self, **flags):
+        return list_connections(self, s=True, d=False, **flags)
+
+    def outputs(self, **flags):
+        return list_connections(self, s=False, d=True, **flags)
+
+    def isConnected(self):
+        return self._name in SCENE.inputs or self._name in SCENE.inputs.values()
+
+    def iterDescendants(self):
+        return iter(())
+
+    def getChildren(self):
+        return []
+
+    def child(self, attr_name):
+        return Attribute(f'{self.node()}.{attr_name}')
+
+    # MPlug interface, for the OpenMaya code paths
+    isCompound = isArray = isElement = False
+
+    @property
+    def isDestination(self):
+        return self._name in SCENE.inputs
+
+    def source(self):
+        return Attribute(SCENE.inputs[self._name]) if self.isDestination else None
+
+    def partialName(self, includeNodeName=False, **_):
+        return self._name if includeNodeName else self._name.split('.', 1)[1]
+
+    def numChildren(self):
+        return 0
+
+    numElements = numChildren
+
+    def attribute(self):
+        return _AttributeObject(self.attrName())
+
+    def __getitem__(self, index):
+        return Attribute(f'{self._name}[{index}]')
+
+    def __call__(self, *args, **kwargs):
+        """ Unknown methods of nodes and plugs end up here, e.g. node.getMatrix(ws=True). """
+        SCENE.unhandled[f'PyNode.{self.attrName()}'] += 1
+        return DryValue()
+
+
+class _AttributeObject(str):
+    """ Attribute MObject, the attribute type is unknown, so values are set with Attribute.set(). """
+    def hasFn(self, *_):
+        return False
+
+
+class _NodeTypeMeta(type):
+    """ pm.nt.Transform etc. for isinstance() checks and node creation. """
+    def __instancecheck__(cls, instance):
+        return isinstance(instance, Node) and instance.exists() and is_type(instance.type(), cls.type_name)
+
+    def __call__(cls, *args, **flags):
+        return create_node(cls.type_name, **flags)
+
+
+class _NodeTypes(object):
+    def __init__(self):
+        self._classes = {}
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item == '_classes':
+            raise AttributeError(item)
+        if item not in self._classes:
+            self._classes[item] = _NodeTypeMeta(item, (Node,), {'type_name': item[0].lower() + item[1:]})
+        return self._classes[item]
+
+
+class _DataTypes(object):
+    """ pm.dt, every datatype is a DryValue. """
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return DryValue
+
+
+def is_type(typ, base_type):
+    if typ == base_type or base_type == 'dependNode':
+        return True
+    if base_type == 'transform':
+        return typ in TRANSFORM_TYPES
+    if base_type == 'dagNode':
+        return typ in DAG_TYPES
+    if base_type == 'shape':
+        return typ in SHAPE_TYPES
+    return False
+
+
+def get(obj):
+    """ Get the recorded node or plug with the given name, like pm.PyNode(). """
+    if isinstance(obj, PyNode):
+        return obj
+    name = str(obj).split('|')[-1]
+    if '.' in name:
+        if name.split('.')[0] not in SCENE.nodes:
+            raise MayaAttributeError(f'No object matches name: {name}')
+        return Attribute(name)
+    if name not in SCENE.nodes:
+        raise MayaNodeError(f'No object matches name: {name}')
+    return Node(name)
+
+
+# ---------------------- Recorded functions ---------------------- #
+
+def _flag(flags, *names, default=None):
+    for name in names:
+        if name in flags:
+            return flags[name]
+    return default
+
+
+def _flatten(objs):
+    result = []
+    for obj in objs:
+        if isinstance(obj, (list, tuple, set)):
+            result.extend(_flatten(obj))
+        elif obj is not None and not isinstance(obj, DryValue):
+            result.append(str(obj))
+    return result
+
+
+def create_node(typ, *_, **flags):
+    return Node(SCENE.create(str(typ), _flag(flags, 'n', 'name'), _flag(flags, 'p', 'parent')))
+
+
+def group(*objs, **flags):
+    grp = create_node('transform', n=_flag(flags, 'n', 'name', default='group#'), p=_flag(flags, 'p', 'parent'))
+    if not _flag(flags, 'em', 'empty'):
+        for obj in _flatten(objs) or SCENE.selection:
+            SCENE.set_parent(obj.split('|')[-1], grp)
+    return grp
+
+
+def joint(*_, **flags):
+    """ New joints are parented to the selected joint and selected, like in maya. """
+    parent = SCENE.selection[-1] if SCENE.selection and SCENE.node_type(SCENE.selection[-1]) == 'joint' else None
+    jnt = create_node('joint', n=_flag(flags, 'n', 'name', default='joint#'), p=parent)
+    SCENE.selection = [str(jnt)]
+    return jnt
+
+
+def space_locator(*_, **flags):
+    loc = create_node('transform', n=_flag(flags, 'n', 'name', default='locator#'))
+    SCENE.create('locator', f'{loc}Shape', loc)
+    return loc
+
+
+def curve(*_, **flags):
+    crv = create_node('transform', n=_flag(flags, 'n', 'name', default='curve#'))
+    SCENE.create('nurbsCurve', f'{crv}Shape', crv)
+    return crv
+
+
+def circle(*args, **flags):
+    crv = curve(*args, **flags)
+    return [crv, create_node('makeNurbCircle')]
+
+
+def duplicate(*objs, **flags):
+    new_name = _flag(flags, 'n', 'name')
+    result = []
+    for obj in _flatten(objs) or SCENE.selection:
+        data = SCENE.nodes[obj.split('|')[-1]]
+        dup = create_node(data['type'], n=new_name or obj, p=data['parent'])
+        for child in SCENE.children(obj):
+            if SCENE.node_type(child) in SHAPE_TYPES:
+                SCENE.create(SCENE.node_type(child), f'{dup}Shape', dup)
+        result.append(dup)
+    return result
+
+
+def parent(*objs, **flags):
+    names = _flatten(objs)
+    if _flag(flags, 'w', 'world'):
+        children, new_parent = names, None
+    else:
+        children, new_parent = names[:-1], names[-1]
+    for child in children:
+        SCENE.set_parent(child.split('|')[-1], new_parent)
+    return [Node(c) for c in children]
+
+
+def delete(*objs, **_):
+    for obj in _flatten(objs):
+        SCENE.delete(obj.split('|')[-1].split('.')[0])
+
+
+def rename(obj, new_name, **_):
+    return Node(SCENE.rename(str(obj).split('|')[-1], new_name))
+
+
+def obj_exists(obj, **_):
+    """ Plugs only exist if they were added, set or connected in the dry run. """
+    name = str(obj).split('|')[-1]
+    node, _, attr_name = name.partition('.')
+    if node not in SCENE.nodes or not attr_name:
+        return node in SCENE.nodes
+    return (
+        attr_name.split('[')[0].split('.')[0] in SCENE.attributes.get(node, [])
+        or name in SCENE.values
+        or name in SCENE.inputs
+    )
+
+
+def ls(*patterns, **flags):
+    if _flag(flags, 'sl', 'selection'):
+        names = list(SCENE.selection)
+    elif _flag(flags, 'assemblies'):
+        names = SCENE.roots()
+    elif patterns:
+        names = [n for p in _flatten(patterns) for n in SCENE.nodes if fnmatch.fnmatchcase(n, p.split('|')[-1])]
+    else:
+        names = list(SCENE.nodes)
+    typ = _flag(flags, 'type', 'typ', 'et', 'exactType')
+    if typ:
+        types_ = typ if isinstance(typ, (list, tuple)) else [typ]
+        names = [n for n in names if n in SCENE.nodes and any(is_type(SCENE.node_type(n), t) for t in types_)]
+    return [Node(n) for n in names if n in SCENE.nodes]
+
+
+def select(*objs, **flags):
+    names = [n.split('|')[-1] for n in _flatten(objs)]
+    if _flag(flags, 'cl', 'clear'):
+        SCENE.selection = []
+    elif _flag(flags, 'add'):
+        SCENE.selection.extend(names)
+    else:
+        SCENE.selection = names
+
+
+def connect_attr(src, dst, **_):
+    SCENE.connect(src, dst)
+
+
+def disconnect_attr(src, dst=None, **_):
+    SCENE.disconnect(src, dst)
+
+
+def set_attr(plug, *values, **_):
+    if values:
+        SCENE.values[str(plug)] = values[0] if len(values) == 1 else values
+
+
+def get_attr(plug, **_):
+    return SCENE.values.get(str(plug), DryValue())
+
+
+def add_attr(obj, *_, **flags):
+    attr_name = _flag(flags, 'ln', 'longName', 'sn', 'shortName')
+    if attr_name and not _flag(flags, 'q', 'query', 'e', 'edit'):
+        node = str(obj).split('.')[0]
+        SCENE.attributes.setdefault(node, []).append(attr_name)
+        default = _flag(flags, 'dv', 'defaultValue')
+        if default is not None:
+            SCENE.values[f'{node}.{attr_name}'] = default
+    return DryValue() if _flag(flags, 'q', 'query') else None
+
+
+def attribute_query(attr_name, **flags):
+    node = str(_flag(flags, 'n', 'node')).split('|')[-1]
+    if _flag(flags, 'ex', 'exists'):
+        return attr_name in SCENE.attributes.get(node, [])
+    return DryValue()
+
+
+def list_relatives(obj=None, **flags):
+    name = str(obj if obj is not None else SCENE.selection[-1]).split('|')[-1]
+    if _flag(flags, 'p', 'parent'):
+        parent_ = SCENE.nodes[name]['parent']
+        names = [parent_] if parent_ else []
+    elif _flag(flags, 'ad', 'allDescendents'):
+        names = SCENE.descendants(name)
+    else:
+        names = SCENE.children(name)
+    if _flag(flags, 's', 'shapes'):
+        names = [n for n in names if SCENE.node_type(n) in SHAPE_TYPES]
+    typ = _flag(flags, 'type')
+    if typ:
+        names = [n for n in names if is_type(SCENE.node_type(n), typ)]
+    return [Node(n) for n in names]
+
+
+def list_connections(obj, **flags):
+    name = str(obj)
+    source = _flag(flags, 's', 'source', default=True)
+    destination = _flag(flags, 'd', 'destination', default=True)
+    as_plugs = _flag(flags, 'p', 'plugs', default=False)
+    typ = _flag(flags, 'type', 't')
+
+    def matches(plug):
+        return plug == name or plug.split('.')[0] == name or plug.startswith(f'{name}.') or plug.startswith(
+            f'{name}[')
+
+    others = []
+    for src, dst in SCENE.connections:
+        if source and matches(dst):
+            others.append(src)
+        if destination and matches(src):
+            others.append(dst)
+    others = [o for o in others if o.split('.')[0] in SCENE.nodes]
+    if typ:
+        others = [o for o in others if is_type(SCENE.node_type(o), typ)]
+    if as_plugs:
+        return [Attribute(o) for o in others]
+    return [Node(o.split('.')[0]) for o in dict.fromkeys(others)]
+
+
+def node_type(obj, **flags):
+    if _flag(flags, 'isTypeName', 'itn'):
+        return ['dagNode'] if str(obj) in DAG_TYPES and _flag(flags, 'inherited', 'i') else str(obj)
+    return SCENE.node_type(obj)
+
+
+def xform(*_, **flags):
+    return DryValue() if _flag(flags, 'q', 'query') else None
+
+
+def warning(*args, **_):
+    print(f'# Warning: {" ".join(str(a) for a in args)}')
+
+
+def new_file(*_, **__):
+    SCENE.clear()
+
+
+def _constraint(typ):
+    def constraint(*objs, **flags):
+        if _flag(flags, 'q', 'query', 'e', 'edit'):
+            return DryValue()
+        names = _flatten(objs) or SCENE.selection
+        drivers, driven = names[:-1], names[-1]
+        con = create_node(typ, n=_flag(flags, 'n', 'name', default=f'{driven}_{typ}1'), p=driven)
+        for i, driver in enumerate(drivers):
+            SCENE.connect(f'{driver}.parentMatrix[0]', f'{con}.target[{i}].targetParentMatrix')
+        for attr_name in CONSTRAINT_OUTPUTS[typ]:
+            SCENE.connect(f'{con}.constraint{attr_name[0].upper()}{attr_name[1:]}', f'{driven}.{attr_name}')
+        return con
+    return constraint
+
+
+def _deformer(typ, returns_list):
+    def deformer(*objs, **flags):
+        if _flag(flags, 'q', 'query', 'e', 'edit'):
+            return DryValue()
+        node = create_node(_flag(flags, 'type', default=typ), n=_flag(flags, 'n', 'name', default=f'{typ}#'))
+        for i, obj in enumerate(_flatten(objs)):
+            if obj in SCENE.nodes and SCENE.node_type(obj) == 'joint':
+                SCENE.connect(f'{obj}.worldMatrix[0]', f'{node}.matrix[{i}]')
+        return [node] if returns_list else node
+    return deformer
+
+
+def cluster(*objs, **flags):
+    node = create_node('cluster', n=_flag(flags, 'n', 'name', default='cluster#'))
+    handle = create_node('transform', n=f'{node}Handle')
+    SCENE.create('clusterHandle', f'{handle}Shape', handle)
+    return [node, handle]
+
+
+def ik_handle(*_, **flags):
+    handle = create_node('ikHandle', n=_flag(flags, 'n', 'name', default='ikHandle#'))
+    start, end = _flag(flags, 'sj', 'startJoint'), _flag(flags, 'ee', 'endEffector')
+    effector = create_node('ikEffector', n='effector#', p=start if start else None)
+    if end:
+        SCENE.connect(f'{effector}.handlePath[0]', f'{handle}.endEffector')
+    return [handle, effector]
+
+
+def sets(*objs, **flags):
+    if _flag(flags, 'q', 'query', 'e', 'edit', 'add', 'addElement', 'remove', 'rm', 'fe', 'forceElement'):
+        return DryValue()
+    return create_node('objectSet', n=_flag(flags, 'n', 'name', default='set#'))
+
+
+def set_driven_keyframe(driven, **flags):
+    """ Record the anim curve between driver and driven, like maya creates it for the first key. """
+    attr_name = _flag(flags, 'at', 'attribute')
+    driven_plug = f'{driven}.{attr_name}' if attr_name else str(driven)
+    driver = _flag(flags, 'cd', 'currentDriver')
+    if driven_plug not in SCENE.inputs:
+        crv = create_node('animCurveUU', n=driven_plug.replace('.', '_').replace('[', '_').replace(']', ''))
+        SCENE.connect(f'{crv}.output', driven_plug)
+        if driver:
+            SCENE.connect(str(driver), f'{crv}.input')
+
+
+FUNCTIONS = {
+    'createNode': create_node,
+    'group': group,
+    'joint': joint,
+    'spaceLocator': space_locator,
+    'curve': curve,
+    'circle': circle,
+    'duplicate': duplicate,
+    'parent': parent,
+    'delete': delete,
+    'rename': rename,
+    'objExists': obj_exists,
+    'ls': ls,
+    'select': select,
+    'connectAttr': connect_attr,
+    'disconnectAttr': disconnect_attr,
+    'setAttr': set_attr,
+    'getAttr': get_attr,
+    'addAttr': add_attr,
+    'attributeQuery': attribute_query,
+    'listRelatives': list_relatives,
+    'listConnections': list_connections,
+    'listHistory': lambda *_, **__: [],  # no history in the dry run
+    'nodeType': node_type,
+    'objectType': node_type,
+    'xform': xform,
+    'warning': warning,
+    'newFile': new_file,
+    'openFile': new_file,
+    'skinCluster': _deformer('skinCluster', returns_list=False),
+    'blendShape': _deformer('blendShape', returns_list=True),
+    'deformer': _deformer('deformer', returns_list=True),
+    'cluster': cluster,
+    'ikHandle': ik_handle,
+    'setDrivenKeyframe': set_driven_keyframe,
+    'sets': sets,
+}
+FUNCTIONS.update({typ: _constraint(typ) for typ in CONSTRAINT_OUTPUTS})
+# maya.cmds returns a list for these, pymel a single node
+CMDS_LISTS = ('spaceLocator', 'skinCluster') + tuple(CONSTRAINT_OUTPUTS)
+# Calls that don't create, delete or connect anything
+NO_OPS = (
+    'viewFit', 'refresh', 'undoInfo', 'makeIdentity', 'displayInfo', 'flushUndo', 'dgdirty', 'move', 'rotate',
+    'scale', 'hide', 'showHidden', 'matchTransform',
+)
+
+
+def _returning_names(func, as_list=False):
+    """ maya.cmds returns names instead of PyNodes. """
+    def wrapped(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if isinstance(result, PyNode):
+            return [str(result)] if as_list else str(result)
+        if isinstance(result, list):
+            return [str(r) if isinstance(r, PyNode) else r for r in result]
+        return result
+    return wrapped
+
+
+def _unhandled(func_name):
+    def unhandled(*_, **__):
+        SCENE.unhandled[func_name] += 1
+        return DryValue()
+    return unhandled
+
+
+def _no_op(*_, **__):
+    return None
+
+
+class StandInModule(types.ModuleType):
+    """ A module that records the functions in FUNCTIONS and answers everything else with a DryValue. """
+    def __init__(self, name, members=None, record=True, return_names=False):
+        super().__init__(name)
+        self.__path__ = []  # a package, so sub modules can be imported
+        self._record = record
+        self._return_names = return_names
+        for key, value in (members or {}).items():
+            setattr(self, key, value)
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        if not self._record:
+            return DryValue()
+        if item in NO_OPS:
+            func = _no_op
+        elif item in FUNCTIONS:
+            func = FUNCTIONS[item]
+            if self._return_names:
+                func = _returning_names(func, as_list=item in CMDS_LISTS)
+        else:
+            func = _unhandled(f'{self.__name__}.{item}')
+        setattr(self, item, func)
+        return func
+
+
+# ---------------------- OpenMaya stand-in ---------------------- #
+
+class MDGModifier(object):
+    """ Stand-in for OpenMaya.MDGModifier / MDagModifier, the recording scene is edited immediately. """
+    def createNode(self, typ, parent=None):
+        return create_node(typ, p=parent)
+
+    def renameNode(self, node, new_name):
+        node.rename(new_name)
+
+    def connect(self, src, dst):
+        SCENE.connect(src, dst)
+
+    def disconnect(self, src, dst):
+        SCENE.disconnect(src, dst)
+
+    def deleteNode(self, node):
+        SCENE.delete(str(node))
+
+    def doIt(self):
+        pass
+
+    undoIt = doIt
+
+    def __getattr__(self, item):
+        if item.startswith('newPlugValue'):
+            return lambda plug, value: set_attr(plug, value)
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return DryValue()
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._items = []
+
+    def add(self, name):
+        self._items.append(str(name))
+        return self
+
+    def length(self):
+        return len(self._items)
+
+    def getDependNode(self, index):
+        return get(self._items[index])
+
+    def getPlug(self, index):
+        return Attribute(self._items[index])
+
+    def getDagPath(self, index):
+        return MDagPath(self._items[index])
+
+
+class MDagPath(object):
+    """ Only the shape lookups are recorded, matrices etc. are DryValues. """
+    def __init__(self, name=None):
+        self._name = str(name).split('|')[-1]
+
+    def partialPathName(self):
+        return self._name
+
+    fullPathName = partialPathName
+
+    def node(self):
+        return Node(self._name)
+
+    def numberOfShapesDirectlyBelow(self):
+        return len(Node(self._name).getShapes())
+
+    def extendToShape(self, index=0):
+        self._name = str(Node(self._name).getShapes()[index])
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item == '_name':
+            raise AttributeError(item)
+        return DryValue()
+
+
+class MFnDependencyNode(object):
+    def __init__(self, node=None):
+        self._node = node
+
+    def name(self):
+        return str(self._node)
+
+    @property
+    def typeName(self):
+        return SCENE.node_type(self._node)
+
+    def findPlug(self, attr_name, *_):
+        return Attribute(f'{self._node}.{attr_name}')
+
+    def create(self, typ, name=None):
+        self._node = create_node(typ, n=name)
+        return self._node
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item == '_node':
+            raise AttributeError(item)
+        return DryValue()
+
+
+class MFnAnimCurve(MFnDependencyNode):
+    """ Stand-in for OpenMayaAnim.MFnAnimCurve, the keys are not recorded. """
+    kAnimCurveUA = 'animCurveUA'
+    kAnimCurveUL = 'animCurveUL'
+    kAnimCurveUU = 'animCurveUU'
+    kTangentLinear = kTangentSmooth = kTangentFlat = kTangentClamped = kTangentPlateau = kTangentStep = 0
+
+    def create(self, curve_type, *_):
+        self._node = create_node(curve_type)
+        return self._node
+
+    def setName(self, name):
+        self._node.rename(name)
+        return self._node
+
+    def addKey(self, *_):
+        return 0
+
+
+class MFnNurbsCurve(MFnDependencyNode):
+    """ Stand-in for OpenMaya.MFnNurbsCurve, only the created shapes are recorded. """
+    kOpen, kClosed, kPeriodic = 1, 2, 3
+
+    def create(self, *args):
+        parent = args[6] if len(args) > 6 else None
+        self._node = create_node('nurbsCurve', p=parent)
+        return self._node
+
+    def setName(self, name):
+        self._node.rename(name)
+        return str(self._node)
+
+
+class MNodeClass(object):
+    def __init__(self, typ):
+        self.typ = typ
+
+    def attribute(self, attr_name):
+        return _AttributeObject(attr_name)
+
+
+class _MFn(object):
+    """ OpenMaya.MFn.kTransform -> 'kTransform', for Node.hasFn() """
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return item
+
+
+def _plug(node, attr_name):
+    return Attribute(f'{node}.{attr_name}')
+
+
+class _MDGMessage(object):
+    @staticmethod
+    def addNodeAddedCallback(func, *_):
+        callback_id = len(SCENE.callbacks) + 1
+        SCENE.callbacks[callback_id] = func
+        return callback_id
+
+    @staticmethod
+    def addNodeRemovedCallback(*_):
+        return 0
+
+
+class _MMessage(object):
+    @staticmethod
+    def removeCallback(callback_id):
+        SCENE.callbacks.pop(callback_id, None)
+
+
+# ---------------------- Install & run ---------------------- #
+
+def get_stand_in_modules():
+    """ Get the stand-in modules for pymel, maya and the Qt bindings: {module name: module}. """
+    pm = StandInModule('pymel.core', {
+        'PyNode': PyNode,
+        'Attribute': Attribute,
+        'MayaNodeError': MayaNodeError,
+        'MayaAttributeError': MayaAttributeError,
+        'nt': _NodeTypes(),
+        'dt': _DataTypes(),
+        'melGlobals': DryValue(),
+        'mel': DryValue(),
+    })
+    pm.nodetypes = pm.nt
+    pm.datatypes = pm.dt
+    open_maya = StandInModule('maya.api.OpenMaya', {
+        'MDGModifier': MDGModifier,
+        'MDagModifier': MDGModifier,
+        'MSelectionList': MSelectionList,
+        'MDagPath': MDagPath,
+        'MFn': _MFn(),
+        'MFnDependencyNode': MFnDependencyNode,
+        'MFnNurbsCurve': MFnNurbsCurve,
+        'MNodeClass': MNodeClass,
+        'MPlug': _plug,
+        'MDGMessage': _MDGMessage,
+        'MMessage': _MMessage,
+    }, record=False)
+    open_maya_anim = StandInModule('maya.api.OpenMayaAnim', {'MFnAnimCurve': MFnAnimCurve}, record=False)
+    modules = {
+        'pymel': StandInModule('pymel', {'core': pm}, record=False),
+        'pymel.core': pm,
+        'pymel.core.nodetypes': pm.nt,
+        'pymel.core.datatypes': pm.dt,
+        'maya.cmds': StandInModule('maya.cmds', return_names=True),
+        'maya.mel': StandInModule('maya.mel', record=False),
+        'maya.api.OpenMaya': open_maya,
+        'maya.api.OpenMayaAnim': open_maya_anim,
+        'maya.api': StandInModule('maya.api', {'OpenMaya': open_maya, 'OpenMayaAnim': open_maya_anim}, record=False),
+        'maya.OpenMayaUI': StandInModule('maya.OpenMayaUI', record=False),
+        'maya.utils': StandInModule('maya.utils', {'executeDeferred': lambda f, *a, **k: f(*a, **k)}, record=False),
+        'maya.standalone': StandInModule('maya.standalone', {'initialize': _no_op}, record=False),
+        'maya.app': StandInModule('maya.app', record=False),
+        'maya.app.hik': StandInModule('maya.app.hik', record=False),
+        'maya.app.hik.retargeter': StandInModule('maya.app.hik.retargeter', record=False),
+        'shiboken2': StandInModule('shiboken2', record=False),
+        'PySide2': StandInModule('PySide2', record=False),
+        'PySide2.QtWidgets': StandInModule('PySide2.QtWidgets', record=False),
+        'PySide2.QtCore': StandInModule('PySide2.QtCore', record=False),
+        'PySide2.QtGui': StandInModule('PySide2.QtGui', record=False),
+    }
+    modules['maya'] = StandInModule('maya', {
+        name.split('.')[1]: mod for name, mod in modules.items() if name.count('.') == 1 and name.startswith('maya.')
+    }, record=False)
+    return modules
+
+
+def is_installed():
+    return isinstance(sys.modules.get('maya.cmds'), StandInModule)
+
+
+def install():
+    """ Put the stand-in modules into sys.modules, so every following 'import pymel.core as pm' etc. records into
+        SCENE. Must run before any rigbaukasten module that uses maya is imported.
+    """
+    if is_installed():
+        return
+    if 'maya.cmds' in sys.modules or 'pymel.core' in sys.modules:
+        raise errorutl.RbkEnvironmentError('Cannot dry run inside maya, run it in a plain python interpreter.')
+    keep = (__name__, 'rigbaukasten.core', 'rigbaukasten.utils', 'rigbaukasten.utils.errorutl',
+            'rigbaukasten.utils.typesutl', 'rigbaukasten.utils.environmentutl')
+    loaded = [k for k in sys.modules if k.startswith('rigbaukasten.') and k not in keep]
+    for key in loaded:
+        del sys.modules[key]  # import again, with the stand-ins
+    sys.modules.update(get_stand_in_modules())
+
+
+def _wrap_steps(mod):
+    """ Track the running module in SCENE.module_stack, so every node is counted for the module that created it. """
+    for step in ALL_STEPS:
+        if step in vars(mod):
+            continue
+
+        def recorded_step(*args, _method=getattr(mod, step), _key=mod.module_key, _step=step, **kwargs):
+            SCENE.module_stack.append(_key)
+            SCENE.step = _step
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                SCENE.module_stack.pop()
+
+        setattr(mod, step, recorded_step)
+    for sub_mod in mod.modules.values():
+        _wrap_steps(sub_mod)
+
+
+def dry_run(asset, project_path, stop_after_step='finalize', stop_after_sub_step='post'):
+    """ Build the given asset against the recording scene.
+        :param asset: str - <asset_type>/<asset_name>[:<build file>], like in batchbuildpip
+        :param project_path: str - the rigbaukasten project folder
+        :param stop_after_step: str - stop after this main step
+        :param stop_after_sub_step: str - stop after this pre/post step
+        :return: RecordingScene - the plan, check scene.error to see if the build ran through
+    """
+    install()
+    import rigbaukasten
+    from rigbaukasten.core import modulecor
+    from rigbaukasten.pipeline import batchbuildpip
+
+    job = batchbuildpip.BatchJob(asset, project_path)
+    rigbaukasten.environment.set(project_path=project_path, asset_type=job.asset_type, asset_name=job.asset_name)
+    rigbaukasten.environment.get_rig_builds_path()  # adds the project scripts to sys.path
+
+    SCENE.reset()
+    start = time.perf_counter()
+    try:
+        rig = modulecor.get_rig_build_class(job.build_file)()
+        for data in SCENE.nodes.values():  # created by the RigBuild constructor
+            data['module'] = data['module'] or rig.module_key
+        _wrap_steps(rig)
+        rig.run(stop_after_step=stop_after_step, stop_after_sub_step=stop_after_sub_step)
+    except Exception:
+        SCENE.error = traceback.format_exc()
+    SCENE.duration = time.perf_counter() - start
+    SCENE.module_stack = []
+    return SCENE
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Plan a rigbaukasten rig build without maya.')
+    parser.add_argument('asset', help='<asset_type>/<asset_name>[:<build file>]')
+    parser.add_argument('--project', required=True, help='rigbaukasten project folder')
+    parser.add_argument('--stop-after', default='finalize', help='build step to stop after')
+    parser.add_argument('--report', default=None, help='folder for the json report, default: the build cache')
+    parser.add_argument('--hierarchy', action='store_true', help='print the planned DAG hierarchy')
+    parsed = parser.parse_args(args)
+
+    scene = dry_run(parsed.asset, parsed.project, stop_after_step=parsed.stop_after)
+    if parsed.hierarchy:
+        print('\n'.join(scene.hierarchy()))
+    scene.print_summary()
+    import rigbaukasten
+    folder = parsed.report or rigbaukasten.environment.get_build_cache_path('dryruns')
+    print(f'Report written to {scene.write_report(folder, name=f"{rigbaukasten.environment.get_asset_name()}_dryRun")}')
+    if scene.error:
+        print(scene.error)
+    return 1 if scene.error else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+
+from maya import cmds
+
+from rigbaukasten.utils import pythonutl
+
+
+OUTSIDE_KEY = '<unassigned>'
+MODULE_GRP_SUFFIX = '_module_GRP'
+# evaluationManager flags that take a node out of parallel evaluation, strongest first
+SCHEDULING_FLAGS = (
+    ('nodeTypeUntrusted', 'untrusted'),
+    ('nodeTypeGloballySerialize', 'globallySerial'),
+    ('nodeTypeSerialize', 'serial'),
+)
+
+
+def animate_ctls(start=1, end=100, amplitude=30.0):
+    """ Key a rotation wave on all unlocked rotate channels of all controls, so a finished rig can be played back.
+        Channels that already have an incoming connection or animation are skipped, so nothing of the rig is changed.
+        :return: {plug: (value before keying, created animCurve)} - pass this to remove_animation() to restore the rig
+    """
+    keyed = {}
+    quarter = (end - start) * 0.25
+    for ctl in cmds.ls('*_CTL', type='transform') or []:
+        for i, axis in enumerate('xyz'):
+            plug = f'{ctl}.r{axis}'
+            if not cmds.getAttr(plug, settable=True) or cmds.listConnections(plug, s=True, d=False):
+                continue
+            start_value = cmds.getAttr(plug)
+            value = amplitude * (1 - i * 0.3)
+            for frame, offset in ((start, 0), (start + quarter, value), (end - quarter, -value), (end, 0)):
+                cmds.setKeyframe(plug, time=frame, value=start_value + offset)
+            anim_crv = cmds.listConnections(plug, s=True, d=False, type='animCurve')
+            keyed[plug] = (start_value, anim_crv[0] if anim_crv else None)
+    return keyed
+
+
+def remove_animation(keyed):
+    """ Delete the animCurves created by animate_ctls() and restore the previous values. """
+    for plug, (value, anim_crv) in keyed.items():
+        if anim_crv and cmds.objExists(anim_crv):
+            cmds.delete(anim_crv)
+        cmds.setAttr(plug, value)
+
+
+def get_evaluation_outputs():
+    """ Get the plugs that a viewport or skinCluster would pull: the world matrix of all joints and the bounding
+        box of all visible meshes. Pulling them after each time change forces the rig to evaluate, also in mayapy.
+    """
+    outputs = [f'{jnt}.worldMatrix[0]' for jnt in cmds.ls(type='joint') or []]
+    outputs += [f'{mesh}.boundingBoxMin' for mesh in cmds.ls(type='mesh', noIntermediate=True) or []]
+    return outputs
+
+
+class ModuleCost(object):
+    """ Evaluation cost of all nodes that belong to one rig module. """
+    def __init__(self, module_key):
+        self.module_key = module_key
+        self.frames = 0
+        self.compute_time = 0.0  # ms, summed over all frames
+        self.nodes = 0
+        self.scheduling = Counter()  # {'parallel': n, 'serial': n, ...}
+        self.node_types = Counter()  # {node type: compute ms}
+
+    @property
+    def ms_per_frame(self):
+        return self.compute_time / self.frames if self.frames else 0.0
+
+    @property
+    def serial_nodes(self):
+        return self.nodes - self.scheduling['parallel']
+
+    def to_dict(self):
+        return {
+            'module_key': self.module_key,
+            'ms_per_frame': self.ms_per_frame,
+            'compute_time': self.compute_time,
+            'nodes': self.nodes,
+            'serial_nodes': self.serial_nodes,
+            'scheduling': dict(self.scheduling.most_common()),
+            'node_types': {typ: ms / self.frames for typ, ms in self.node_types.most_common()} if self.frames else {},
+        }
+
+
+class EvaluationProfiler(object):
+    """ Play back a frame range of a finished rig and attribute the DG compute time of every node to its rig module.
+
+        The time per node comes from the DG timer. A node belongs to the module whose '<side>_<module>_' prefix its
+        name starts with, DAG nodes without a matching name belong to the closest '*_module_GRP' above them.
+        The scheduling of the node types tells how many nodes of a module can not evaluate in parallel.
+
+        Usage:
+            profiler = EvaluationProfiler()
+            profiler.run(start=1, end=100)
+            profiler.print_top()
+    """
+    def __init__(self):
+        self.records = {}
+        self.frames = 0
+        self.total_time = 0.0  # wall time of the playback
+        self.evaluation_mode = None
+        self._module_keys = []
+        self._scheduling = {}
+
+    def get_module_keys(self):
+        """ Get the module keys of all modules in the scene, longest first so 'L_armTwist' wins over 'L_arm'. """
+        grps = [g.rsplit('|', 1)[-1] for g in cmds.ls(f'*{MODULE_GRP_SUFFIX}', type='transform') or []]
+        return sorted({g[:-len(MODULE_GRP_SUFFIX)] for g in grps}, key=len, reverse=True)
+
+    def get_module_key(self, node):
+        short_name = node.rsplit('|', 1)[-1]
+        for module_key in self._module_keys:
+            if short_name.startswith(f'{module_key}_'):
+                return module_key
+        if cmds.objectType(node, isAType='dagNode'):
+            for parent in cmds.ls(node, long=True)[0].split('|')[-2:0:-1]:  # closest parent first
+                if parent.endswith(MODULE_GRP_SUFFIX):
+                    return parent[:-len(MODULE_GRP_SUFFIX)]
+        return OUTSIDE_KEY
+
+    def get_scheduling(self, node_type):
+        """ Get the evaluation manager scheduling of the given node type, e.g. 'parallel' or 'globallySerial'. """
+        if node_type not in self._scheduling:
+            self._scheduling[node_type] = 'parallel'
+            for flag, scheduling in SCHEDULING_FLAGS:
+                try:
+                    if any(pythonutl.force_list(cmds.evaluationManager(node_type, q=True, **{flag: True}))):
+                        self._scheduling[node_type] = scheduling
+                        break
+                except (RuntimeError, TypeError):
+                    continue  # flag not available in this maya version
+        return self._scheduling[node_type]
+
+    def _get_record(self, module_key):
+        if module_key not in self.records:
+            self.records[module_key] = ModuleCost(module_key)
+        return self.records[module_key]
+
+    def run(self, start=None, end=None, animate=True):
+        """ Play back the given range and collect the compute time of all nodes, replaces the previous results.
+            :param start: int - first frame, default is the start of the playback range
+            :param end: int - last frame, default is the end of the playback range
+            :param animate: bool - key a rotation wave on all controls for the duration of the playback,
+                                   use False to profile the animation that is already in the scene
+        """
+        start = int(cmds.playbackOptions(q=True, min=True) if start is None else start)
+        end = int(cmds.playbackOptions(q=True, max=True) if end is None else end)
+        self.evaluation_mode = cmds.evaluationManager(q=True, mode=True)[0]
+        self._module_keys = self.get_module_keys()
+        current_time = cmds.currentTime(q=True)
+        keyed = animate_ctls(start, end) if animate else {}
+        outputs = get_evaluation_outputs()
+        try:
+            cmds.dgtimer(reset=True)
+            cmds.dgtimer(on=True)
+            playback_start = time.perf_counter()
+            for frame in range(start, end + 1):
+                cmds.currentTime(frame, update=True)
+                for plug in outputs:
+                    cmds.getAttr(plug)
+            self.total_time = time.perf_counter() - playback_start
+            cmds.dgtimer(off=True)
+            self.frames = end - start + 1
+            self.records = {}
+            self._collect()
+        finally:
+            cmds.dgtimer(off=True)
+            remove_animation(keyed)
+            cmds.currentTime(current_time)
+
+    def _collect(self):
+        default_nodes = set(cmds.ls(defaultNodes=True, long=True) or [])
+        output_file = os.path.join(tempfile.gettempdir(), 'rbkDgTimer.txt')  # keep the per node tables out of the log
+        try:
+            for node in cmds.ls(long=True) or []:
+                if node in default_nodes:
+                    continue
+                node_type = cmds.nodeType(node)
+                record = self._get_record(self.get_module_key(node))
+                record.frames = self.frames
+                record.nodes += 1
+                record.scheduling[self.get_scheduling(node_type)] += 1
+                compute_time = cmds.dgtimer(
+                    q=True, name=node, metric='compute', timerType='self', returnType='total', outputFile=output_file
+                ) or 0.0
+                record.compute_time += compute_time
+                record.node_types[node_type] += compute_time
+        finally:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+
+    # ---------------------- Reports ---------------------- #
+
+    def sorted_records(self, sort_by='ms_per_frame'):
+        """ Get all records, most expensive first.
+            :param sort_by: str - any ModuleCost attribute, e.g. 'ms_per_frame', 'nodes', 'serial_nodes'
+        """
+        return sorted(self.records.values(), key=lambda r: getattr(r, sort_by), reverse=True)
+
+    def to_dict(self):
+        return {
+            'frames': self.frames,
+            'total_time': self.total_time,
+            'fps': self.frames / self.total_time if self.total_time else 0.0,
+            'evaluation_mode': self.evaluation_mode,
+            'ms_per_frame': sum(r.ms_per_frame for r in self.records.values()),
+            'records': [r.to_dict() for r in self.sorted_records()],
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+        return path
+
+    def write_csv(self, path):
+        fields = ['module_key', 'ms_per_frame', 'compute_time', 'nodes', 'serial_nodes', 'scheduling', 'node_types']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for record in self.sorted_records():
+                row = record.to_dict()
+                row['scheduling'] = ' '.join(f'{s}:{count}' for s, count in row['scheduling'].items())
+                row['node_types'] = ' '.join(f'{typ}:{ms:.3f}' for typ, ms in row['node_types'].items())
+                writer.writerow(row)
+        return path
+
+    def write_report(self, folder, name='evalProfile'):
+        """ Write the profile as json and csv into the given folder, with a time stamp in the file names.
+            :return: (json_path, csv_path)
+        """
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        json_path = self.write_json(os.path.join(folder, f'{name}_{stamp}.json'))
+        csv_path = self.write_csv(os.path.join(folder, f'{name}_{stamp}.csv'))
+        print(f'Evaluation profile written to {json_path}')
+        return json_path, csv_path
+
+    def print_top(self, n=20, sort_by='ms_per_frame'):
+        """ Print a table with the n most expensive modules. """
+        data = self.to_dict()
+        print(
+            f'Evaluation profile: {data["frames"]} frames, {data["fps"]:.1f} fps, {data["ms_per_frame"]:.3f} ms/frame '
+            f'compute, evaluation mode {self.evaluation_mode}, top {n} by {sort_by}'
+        )
+        print(f'{"module":<32}{"ms/frame":>10}{"nodes":>8}{"serial":>8}  top node types')
+        for record in self.sorted_records(sort_by)[:n]:
+            top_types = ', '.join(
+                f'{typ}:{ms / record.frames:.3f}' for typ, ms in record.node_types.most_common(3) if record.frames
+            )
+            print(
+                f'{record.module_key:<32}{record.ms_per_frame:>10.3f}{record.nodes:>8}{record.serial_nodes:>8}'
+                f'  {top_types}'
+            )
+
+
+def profile_evaluation(start=None, end=None, animate=True, report_folder=None, name='evalProfile'):
+    """ Profile the evaluation of the rig in the scene, print the most expensive modules and write a report.
+        :param report_folder: str - folder for the json/csv report, None won't write a report
+        :return: EvaluationProfiler
+    """
+    profiler = EvaluationProfiler()
+    profiler.run(start, end, animate)
+    profiler.print_top()
+    if report_folder:
+        profiler.write_report(report_folder, name)
+    return profiler
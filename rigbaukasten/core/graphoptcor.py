@@ -0,0 +1,335 @@
+import contextlib
+import time
+from collections import Counter, defaultdict
+
+from maya import cmds
+
+from rigbaukasten.utils import connectutl, sceneutl
+
+
+# Utility nodes whose outputs only depend on their inputs. Two of them with the same inputs can be merged and one
+# without any input connections can be replaced by its output values.
+OPTIMIZABLE_TYPES = (
+    'addDoubleLinear',
+    'blendColors',
+    'clamp',
+    'composeMatrix',
+    'condition',
+    'decomposeMatrix',
+    'distanceBetween',
+    'inverseMatrix',
+    'multDoubleLinear',
+    'multMatrix',
+    'multiplyDivide',
+    'plusMinusAverage',
+    'remapValue',
+    'reverse',
+    'setRange',
+    'unitConversion',
+    'vectorProduct',
+)
+IGNORE_ATTRS = {'binMembership', 'caching', 'isHistoricallyInteresting'}  # don't change the result of a node
+DRIVEN_KEY_TYPES = ('animCurveUA', 'animCurveUL', 'animCurveUU')  # animCurves with unitless input
+TOLERANCE = 1e-6
+
+
+@contextlib.contextmanager
+def unlocked(plug):
+    """ Temporarily unlock the given plug, e.g. to connect or set a locked destination. """
+    locked = cmds.getAttr(plug, lock=True)
+    if locked:
+        cmds.setAttr(plug, lock=False)
+    try:
+        yield
+    finally:
+        if locked:
+            cmds.setAttr(plug, lock=True)
+
+
+def get_inputs(node):
+    """ :return: {attribute name: source plug} for all incoming connections of the node """
+    connections = cmds.listConnections(node, s=True, d=False, c=True, p=True) or []
+    return {dst.split('.', 1)[1]: src for dst, src in zip(connections[::2], connections[1::2])}
+
+
+def get_outputs(node):
+    """ :return: [(plug on the node, destination plug), ] for all outgoing connections of the node """
+    connections = cmds.listConnections(node, s=False, d=True, c=True, p=True) or []
+    return list(zip(connections[::2], connections[1::2]))
+
+
+def get_conversions(node):
+    """ :return: [str, ] - the unitConversion nodes between the node and the final destinations of its outputs """
+    conversions = []
+    pending = [node]
+    while pending:
+        for _, dst in get_outputs(pending.pop()):
+            dst_node = dst.split('.')[0]
+            if cmds.nodeType(dst_node) == 'unitConversion' and dst_node not in conversions:
+                conversions.append(dst_node)
+                pending.append(dst_node)
+    return conversions
+
+
+def get_input_values(node):
+    """ Get the values of all unconnected writable attributes, as hashable signature for merging nodes. """
+    connected = set(get_inputs(node))
+    values = []
+    for attr in cmds.listAttr(node, write=True, multi=True) or []:
+        if attr in IGNORE_ATTRS or attr in connected:
+            continue
+        try:
+            values.append((attr, str(cmds.getAttr(f'{node}.{attr}'))))
+        except (RuntimeError, ValueError):
+            continue  # message, empty multi or data attributes
+    return tuple(values)
+
+
+def get_candidates(nodes=None):
+    """ Get all nodes that may be optimized: utility nodes of the OPTIMIZABLE_TYPES that are not referenced, locked
+        or tagged with user defined attributes (e.g. nodes that tools look up later).
+        :param nodes: [str, ] - only consider these nodes (e.g. from get_module_nodes()), default is all nodes in the
+                                scene
+    """
+    if nodes is not None:
+        nodes = [n for n in nodes if cmds.objExists(n)]
+        nodes = cmds.ls(nodes, type=OPTIMIZABLE_TYPES) if nodes else []  # ls without nodes lists the whole scene
+    else:
+        nodes = cmds.ls(type=OPTIMIZABLE_TYPES)
+    return [
+        n for n in nodes or []
+        if not cmds.referenceQuery(n, isNodeReferenced=True)
+        and not cmds.lockNode(n, q=True, lock=True)[0]
+        and not cmds.listAttr(n, userDefined=True)
+    ]
+
+
+def fold_constants(nodes):
+    """ Replace the outgoing connections of all nodes without input connections by the values they carry.
+        Connections through unitConversion nodes are followed to the final plug, which gets its current value in its
+        own units. The conversion nodes are deleted, maya would delete them on disconnect anyway.
+        :return: [str, ] - the folded nodes, they have no outgoing connections anymore
+    """
+    folded = []
+    for node in nodes:
+        if not cmds.objExists(node) or get_inputs(node):
+            continue
+        connections = cmds.listConnections(node, s=False, d=True, c=True, p=True, scn=True) or []
+        outputs = list(zip(connections[::2], connections[1::2]))
+        if not outputs or any(cmds.lockNode(dst.split('.')[0], q=True, lock=True)[0] for _, dst in outputs):
+            continue
+        try:
+            values = [sceneutl.get_attr(dst) for _, dst in outputs]  # the constant result, in units of the plug
+        except (RuntimeError, ValueError):
+            continue  # e.g. message connections
+        conversions = get_conversions(node)
+        if conversions:
+            cmds.delete(conversions)
+        for (src, dst), value in zip(outputs, values):
+            with unlocked(dst):
+                if cmds.isConnected(src, dst):
+                    cmds.disconnectAttr(src, dst)
+                sceneutl.set_attr(dst, value)
+        folded.append(node)
+    return folded
+
+
+def get_module_key(node, module_keys):
+    """ Get the module that the node belongs to by name, i.e. the longest key of the <module_key>_* prefix.
+        :return: str or None
+    """
+    matches = [k for k in module_keys if node.startswith(f'{k}_')]
+    return max(matches, key=len) if matches else None
+
+
+def get_module_nodes(module_keys, node_types=OPTIMIZABLE_TYPES):
+    """ Get the nodes of the given types that belong to one of the modules (see get_module_key()), so nodes that are
+        not part of the rig (e.g. shading networks of the model) are never optimized.
+    """
+    return [n for n in cmds.ls(type=node_types) or [] if get_module_key(n, module_keys) is not None]
+
+
+def merge_duplicates(nodes, module_keys=()):
+    """ Merge nodes of the same type with the same input connections and values. The outgoing connections of the
+        duplicates are moved to the node that is kept.
+        :param nodes: [str, ] - nodes to merge
+        :param module_keys: [str, ] - only merge nodes of the same module, so deleting a module by name in an
+                                      incremental build doesn't remove nodes that other modules depend on
+        :return: [str, ] - the merged duplicates, they have no outgoing connections anymore
+    """
+    groups = defaultdict(list)
+    for node in nodes:
+        if not cmds.objExists(node):
+            continue
+        inputs = get_inputs(node)
+        if inputs:  # nodes without inputs are folded instead
+            key = (get_module_key(node, module_keys), cmds.nodeType(node), tuple(sorted(inputs.items())))
+            groups[key].append(node)
+    merged = []
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        kept = {}  # input values: node
+        for node in group:
+            signature = get_input_values(node)
+            if signature not in kept:
+                kept[signature] = node
+                continue
+            for src, dst in get_outputs(node):
+                with unlocked(dst):
+                    cmds.connectAttr(f'{kept[signature]}.{src.split(".", 1)[1]}', dst, force=True)
+            merged.append(node)
+    return merged
+
+
+def delete_unused(nodes):
+    """ Delete all nodes without outgoing connections.
+        :return: {node type: number of deleted nodes}
+    """
+    unused = [n for n in nodes if cmds.objExists(n) and not cmds.listConnections(n, s=False, d=True)]
+    deleted = Counter(cmds.nodeType(n) for n in unused)
+    if unused:
+        cmds.delete(unused)
+    return deleted
+
+
+def optimize(nodes=None, max_passes=10, module_keys=()):
+    """ Fold constant utility nodes, merge duplicates and delete unused ones until nothing changes anymore.
+        Every pass may enable the next one, e.g. merging two multMatrix nodes makes their decomposeMatrix nodes equal.
+        :param nodes: [str, ] - only optimize these nodes, default is all nodes in the scene
+        :param max_passes: int - stop after this many passes even if there is still something to optimize
+        :param module_keys: [str, ] - only merge nodes of the same module, see merge_duplicates()
+        :return: {'nodes_before': int, 'nodes_after': int, 'folded': int, 'merged': int, 'deleted': {type: int}}
+    """
+    start = time.perf_counter()
+    stats = {'nodes_before': len(cmds.ls()), 'folded': 0, 'merged': 0, 'deleted': Counter()}
+    for _ in range(max_passes):
+        candidates = get_candidates(nodes)
+        folded = fold_constants(candidates)
+        merged = merge_duplicates(candidates, module_keys)
+        deleted = delete_unused(candidates)
+        stats['folded'] += len(folded)
+        stats['merged'] += len(merged)
+        stats['deleted'].update(deleted)
+        if not (folded or merged or deleted):
+            break
+    stats['nodes_after'] = len(cmds.ls())
+    top_types = ', '.join(f'{typ}:{count}' for typ, count in stats['deleted'].most_common(5))
+    print(
+        f'Graph optimization: {stats["nodes_before"]} -> {stats["nodes_after"]} nodes, {stats["folded"]} folded, '
+        f'{stats["merged"]} merged, {sum(stats["deleted"].values())} deleted ({top_types}) '
+        f'in {time.perf_counter() - start:.2f}s'
+    )
+    return stats
+
+
+def get_linear_keys(curve):
+    """ Get the keys of a driven key curve if it is piecewise linear, i.e. all its tangents are linear.
+        :return: ([(driver value, driven value), ], pre infinity, post infinity) in ui units, or None
+    """
+    tangents = (cmds.keyTangent(curve, q=True, inTangentType=True) or []) + \
+        (cmds.keyTangent(curve, q=True, outTangentType=True) or [])
+    if any(t != 'linear' for t in tangents):
+        return None
+    inputs = cmds.keyframe(curve, q=True, floatChange=True) or []
+    values = cmds.keyframe(curve, q=True, valueChange=True) or []
+    if len(inputs) < 2 or inputs[-1] - inputs[0] < TOLERANCE:
+        return None
+    pre = cmds.setInfinity(curve, q=True, preInfinite=True)[0]
+    post = cmds.setInfinity(curve, q=True, postInfinite=True)[0]
+    return list(zip(inputs, values)), pre, post
+
+
+def _create_remap(curve, driver, keys):
+    """ Piecewise linear mapping, clamped to the first and last key, like a curve with constant infinity. """
+    (x0, _), (xn, _) = keys[0], keys[-1]
+    low = min(y for _, y in keys)
+    high = max(y for _, y in keys)
+    rmv = connectutl.create_node(
+        'remapValue',
+        inputValue=driver,
+        inputMin=x0,
+        inputMax=xn,
+        outputMin=low,
+        outputMax=high,
+        n=f'{curve}Linear_RMV',
+    )
+    cmds.removeMultiInstance(f'{rmv}.value[1]', b=True)  # remove the default ramp
+    for i, (x, y) in enumerate(keys):
+        sceneutl.set_attr(f'{rmv}.value[{i}].value_Position', (x - x0) / (xn - x0))
+        sceneutl.set_attr(f'{rmv}.value[{i}].value_FloatValue', (y - low) / (high - low) if high > low else 0.0)
+        sceneutl.set_attr(f'{rmv}.value[{i}].value_Interp', 1)  # linear
+    return f'{rmv}.outValue'
+
+
+def linearize_driven_key(curve):
+    """ Replace a piecewise linear driven key curve with arithmetic nodes:
+        - a straight line with linear infinity becomes a multDoubleLinear and/or addDoubleLinear
+        - a straight line through the origin with slope 1 and constant infinity becomes a clamp
+        - everything else with constant infinity becomes a remapValue with a linear ramp
+        - a flat line is replaced by its value
+        :return: str|float - the output plug or value that replaces the curve, None if the curve was kept
+    """
+    driver = cmds.listConnections(f'{curve}.input', s=True, d=False, p=True)
+    outputs = cmds.listConnections(f'{curve}.output', s=False, d=True, p=True)
+    linear_keys = get_linear_keys(curve)
+    if not driver or not outputs or not linear_keys:
+        return None
+    driver = driver[0]
+    keys, pre, post = linear_keys
+    (x0, y0), (xn, yn) = keys[0], keys[-1]
+    slope = (yn - y0) / (xn - x0)
+    offset = y0 - slope * x0
+    straight = all(abs(y - (slope * x + offset)) < TOLERANCE for x, y in keys)
+    is_identity = abs(slope - 1) < TOLERANCE and abs(offset) < TOLERANCE
+
+    if straight and abs(slope) < TOLERANCE:  # flat, the driven plugs get a static value
+        for dst in outputs:
+            with unlocked(dst):
+                cmds.disconnectAttr(f'{curve}.output', dst)
+                sceneutl.set_attr(dst, y0)
+        cmds.delete(curve)
+        return y0
+    if straight and pre == post == 'linear':
+        output = driver
+        if abs(slope - 1) >= TOLERANCE:
+            output = connectutl.create_node('multDoubleLinear', i1=output, i2=slope, n=f'{curve}Linear_MDL').o
+        if abs(offset) >= TOLERANCE:
+            output = connectutl.create_node('addDoubleLinear', i1=output, i2=offset, n=f'{curve}Linear_ADL').o
+        output = str(output)
+    elif straight and is_identity and pre == post == 'constant':
+        clp = connectutl.create_node('clamp', ipr=driver, mnr=x0, mxr=xn, n=f'{curve}Linear_CLP')
+        output = f'{clp}.opr'
+    elif pre == post == 'constant':
+        output = _create_remap(curve, driver, keys)
+    else:
+        return None
+    for dst in outputs:
+        with unlocked(dst):
+            cmds.connectAttr(output, dst, force=True)  # adds a unitConversion for angle and distance curves
+    cmds.delete(curve)
+    return output
+
+
+def linearize_driven_keys(curves=None, keep=()):
+    """ Replace all piecewise linear driven keys with arithmetic nodes, see linearize_driven_key().
+        :param curves: [str, ] - only check these animCurves, default is all driven keys in the scene
+        :param keep: [str, ] - nodes whose driven keys are kept, e.g. the nodes that are published as drivenKeys
+        :return: int - number of replaced curves
+    """
+    keep_curves = set()
+    if keep:
+        keep_curves = set(cmds.listConnections([str(n) for n in keep], s=True, d=False, type='animCurve') or [])
+    if curves is not None:
+        curves = cmds.ls(curves, type=DRIVEN_KEY_TYPES) if curves else []  # ls without nodes lists the whole scene
+    else:
+        curves = cmds.ls(type=DRIVEN_KEY_TYPES)
+    curves = curves or []
+    replaced = 0
+    for curve in curves:
+        if curve in keep_curves or cmds.referenceQuery(curve, isNodeReferenced=True):
+            continue
+        if linearize_driven_key(curve) is not None:
+            replaced += 1
+    print(f'Linearized {replaced} of {len(curves)} driven keys.')
+    return replaced
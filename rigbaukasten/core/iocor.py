@@ -1,42 +1,322 @@
 import json
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 import pymel.core as pm
 
 import rigbaukasten
-from rigbaukasten.library import controllib, guidelib, skinlib, rigsetlib
+from rigbaukasten.library import blendshapelib, controllib, drivenkeylib, guidelib, skinlib, rigsetlib
 from rigbaukasten.utils import errorutl, ioutl, pymelutl, constraintutl
 
 
+class RigDataCache(object):
+    """ Parsed rig data files, keyed by path. Filled in parallel by prefetch(), read by the loaders.
+
+        Parsing only happens in the worker threads, everything that touches the maya scene still runs on the main
+        thread in the loaders. Entries are removed when they are read (every file is loaded once per build) and are
+        ignored if the file was modified after it was cached.
+    """
+    # Files that are parsed in python per io_type, everything else is loaded by maya commands.
+    parsed_extensions = {
+        'skinClusters': ('.npz', ioutl.HEADER_EXT),  # the json payload is read by pm.deformerWeights
+        'blendshapes': (),
+        'drivenKeys': ('.npz',),  # the legacy .ma files are imported by maya
+    }
+    default_extensions = ('.json',)
+
+    def __init__(self):
+        self.data = {}  # path: (mtime, parsed data)
+
+    def clear(self):
+        self.data = {}
+
+    def _get(self, path, keep=False):
+        entry = self.data.get(path) if keep else self.data.pop(path, None)
+        if entry and entry[0] == os.path.getmtime(path):
+            return entry[1]
+        return None
+
+    @staticmethod
+    def parse(path):
+        if path.endswith('.npz'):
+            return ioutl.read_npz(path)
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _prefetch_file(self, path):
+        """ Parse the file into the cache. Errors are returned instead of raised, the owning loader parses the file
+            again and reports the error in context (if the file is loaded at all).
+        """
+        try:
+            self.data[path] = (os.path.getmtime(path), self.parse(path))
+        except Exception as e:
+            return f'{path}: {e}'
+        return None
+
+    def read_json(self, path):
+        data = self._get(path)
+        if data is None:
+            data = self.parse(path)
+        return data
+
+    def read_npz(self, path):
+        data = self._get(path)
+        if data is None:
+            data = ioutl.read_npz(path)
+        return data
+
+    def read_header(self, path):
+        if path.endswith('.npz'):
+            data = self._get(path, keep=True)  # keep the arrays for read_npz
+            if data is not None:
+                return data[0]
+        else:
+            data = self._get(path + ioutl.HEADER_EXT)
+            if data is not None:
+                return data
+        return ioutl.read_header(path)
+
+    def prefetch(self, module_keys, io_types, workers=8):
+        """ Find the latest files of all given modules and io types and parse them on a thread pool.
+            On network drives most of the time is spent waiting for the file system, which threads can overlap.
+            :param module_keys: [str, ]
+            :param io_types: [str, ] - e.g. ['ctls', 'guides', 'skinClusters']
+            :param workers: int - number of threads
+            :return: int - number of cached files
+        """
+        paths = []
+        for module_key in module_keys:
+            io = BaseIo(module_key)
+            for io_type in io_types:
+                extensions = self.parsed_extensions.get(io_type, self.default_extensions)
+                if not extensions:
+                    continue
+                folder = io.get_latest_folder(io_type=io_type)
+                if not folder:
+                    continue
+                for file_name in os.listdir(folder):
+                    if file_name.endswith(extensions) and not (file_name.endswith('.npz') and not ioutl.HAS_NUMPY):
+                        paths.append(os.path.join(folder, file_name))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            errors = [e for e in pool.map(self._prefetch_file, paths) if e]
+        for error in errors:  # warn on the main thread, not in the workers
+            pm.warning(f'Cannot prefetch rig data, skipping: {error}')
+        return len(paths) - len(errors)
+
+
+CACHE = RigDataCache()
+
+
+class RigDataIndex(object):
+    """ Manifest of all published rig data of the asset, stored in <rigdata>/index.json:
+            {module_key: {io_type: [{'version': 1, 'folder': 'ctls_v001', 'time': ..., 'files': {name: sha1}}, ]}}
+
+        Finding the latest version of each module and io_type only needs this one file instead of listing and sorting
+        all module folders. The index is read once per session and only read again if the file was changed (e.g.
+        by someone else publishing). If there is no index yet, it is created by scanning the rigdata folder once.
+        Updates re-read the file right before writing it and replace it atomically.
+    """
+    file_name = 'index.json'
+    blob_folder_name = '_blobs'
+
+    def __init__(self):
+        self.path = None
+        self.mtime = None
+        self.data = {}
+
+    def get_path(self):
+        return os.path.join(rigbaukasten.environment.get_rigdata_path(), self.file_name)
+
+    def get_blob_folder(self):
+        return os.path.join(rigbaukasten.environment.get_rigdata_path(), self.blob_folder_name)
+
+    def clear(self):
+        self.path = None
+        self.mtime = None
+        self.data = {}
+
+    def load(self, force=False):
+        """ Get the index data, from memory if the file did not change since it was last read. """
+        path = self.get_path()
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if not force and path == self.path and mtime == self.mtime:
+            return self.data
+        self.path = path
+        if mtime is None:
+            self.data = self.scan()
+            if self.data:
+                self.write()
+        else:
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+            self.mtime = mtime
+        return self.data
+
+    def write(self):
+        ioutl.write_json_atomic(self.path, self.data)
+        self.mtime = os.path.getmtime(self.path)
+
+    @staticmethod
+    def get_version_entry(folder):
+        """ Get the index entry for the given version folder, e.g. .../C_main/ctls_v001 """
+        files = {}
+        for file_name in sorted(os.listdir(folder)):
+            file_path = os.path.join(folder, file_name)
+            if os.path.isfile(file_path):
+                files[file_name] = ioutl.file_checksum(file_path)
+        folder_name = os.path.basename(folder)
+        return {
+            'version': ioutl.get_version(folder_name, folder_name.rpartition('_v')[0] + '_v'),
+            'folder': folder_name,
+            'time': os.path.getmtime(folder),
+            'files': files,
+        }
+
+    def scan_module(self, module_key):
+        """ Get the index entries of all io types of the given module from its folder on disk. """
+        module_folder = os.path.join(rigbaukasten.environment.get_rigdata_path(), module_key)
+        if not os.path.isdir(module_folder):
+            return {}
+        io_types = {}
+        for folder_name in os.listdir(module_folder):
+            io_type = folder_name.rpartition('_v')[0]
+            if not io_type or ioutl.get_version(folder_name, f'{io_type}_v') is None:
+                continue
+            entry = self.get_version_entry(os.path.join(module_folder, folder_name))
+            io_types.setdefault(io_type, []).append(entry)
+        for versions in io_types.values():
+            versions.sort(key=lambda v: v['version'])
+        return io_types
+
+    def scan(self):
+        """ Build the index from the rigdata folder on disk. """
+        rigdata_path = rigbaukasten.environment.get_rigdata_path()
+        if not os.path.isdir(rigdata_path):
+            return {}
+        data = {}
+        for module_key in sorted(os.listdir(rigdata_path)):
+            if module_key.startswith('_'):
+                continue  # blob store
+            module_data = self.scan_module(module_key)
+            if module_data:
+                data[module_key] = module_data
+        return data
+
+    def rescan_module(self, module_key):
+        """ Update the index of the given module from disk, e.g. after version folders were deleted by hand. """
+        data = self.load(force=True)
+        module_data = self.scan_module(module_key)
+        if module_data:
+            data[module_key] = module_data
+        else:
+            data.pop(module_key, None)
+        self.write()
+
+    def get_versions(self, module_key, io_type):
+        """ Get the index entries of all versions of the given module and io type, oldest first. """
+        return self.load().get(module_key, {}).get(io_type, [])
+
+    def get_latest(self, module_key, io_type):
+        versions = self.get_versions(module_key, io_type)
+        return versions[-1] if versions else None
+
+    def add_version(self, module_key, io_type, folder, entry=None):
+        """ Add or update the entry of the given version folder, call after all files are written to it. """
+        data = self.load(force=True)
+        entry = entry or self.get_version_entry(folder)
+        versions = data.setdefault(module_key, {}).setdefault(io_type, [])
+        versions[:] = [v for v in versions if v['version'] != entry['version']]
+        versions.append(entry)
+        versions.sort(key=lambda v: v['version'])
+        self.write()
+        return entry
+
+    def remove_version(self, module_key, io_type, folder):
+        data = self.load(force=True)
+        versions = data.get(module_key, {}).get(io_type, [])
+        versions[:] = [v for v in versions if v['folder'] != os.path.basename(folder)]
+        self.write()
+
+
+INDEX = RigDataIndex()
+
+
 class BaseIo(object):
     def __init__(self, module_key):
         self.module_key = module_key
+        self.publish_folder = None  # the folder created by the last make_next_folder() call
+
+    def get_module_folder(self):
+        return os.path.join(rigbaukasten.environment.get_rigdata_path(), self.module_key)
 
     def get_latest_folder(self, io_type='ctls'):
-        module_folder = os.path.join(rigbaukasten.environment.get_rigdata_path(), self.module_key)
-        return ioutl.get_latest_folder(module_folder, file_prefix=f'{io_type}_v')
+        """ Get the latest version folder of the given io type from the rigdata index. """
+        latest = INDEX.get_latest(self.module_key, io_type)
+        if not latest:
+            return None
+        folder = os.path.join(self.get_module_folder(), latest['folder'])
+        if not os.path.isdir(folder):
+            pm.warning(f'Rigdata index is out of date, rescanning {self.module_key}: {folder} does not exist.')
+            INDEX.rescan_module(self.module_key)
+            latest = INDEX.get_latest(self.module_key, io_type)
+            return os.path.join(self.get_module_folder(), latest['folder']) if latest else None
+        return folder
 
     def make_next_folder(self, io_type='ctls'):
-        module_folder = os.path.join(rigbaukasten.environment.get_rigdata_path(), self.module_key)
+        module_folder = self.get_module_folder()
         if not os.path.exists(module_folder):
             os.makedirs(module_folder)
-        versions = [a for a in os.listdir(module_folder) if a.startswith(f'{io_type}_v')]
-        if versions:
-            versions.sort()
-            latest_version = int(versions[-1].replace(f'{io_type}_v', ''))
-            next_version = latest_version + 1
-        else:
-            next_version = 1
+        latest = INDEX.get_latest(self.module_key, io_type)
+        next_version = latest['version'] + 1 if latest else 1
         next_folder = os.path.join(module_folder, f'{io_type}_v{next_version:03d}')
+        while os.path.exists(next_folder):  # published without updating the index
+            next_version += 1
+            next_folder = os.path.join(module_folder, f'{io_type}_v{next_version:03d}')
         os.mkdir(next_folder)
+        INDEX.add_version(self.module_key, io_type, next_folder)
+        self.publish_folder = next_folder
         return next_folder
 
+    def finalize_publish(self, io_type):
+        """ Deduplicate the folder written by the last publish and add its files to the rigdata index.
+            If all files are identical to the previous version, the new folder is removed again. Otherwise every file
+            is moved to the blob store and hard linked back, so files that did not change (or exist in other
+            modules) are only stored once.
+            Call after the publisher succeeded, see discard_publish() for failed publishes.
+            :return: str - the published folder or None if nothing changed
+        """
+        folder = self.publish_folder
+        self.publish_folder = None
+        entry = INDEX.get_version_entry(folder)
+        previous = [v for v in INDEX.get_versions(self.module_key, io_type) if v['folder'] != entry['folder']]
+        if entry['files'] and previous and previous[-1]['files'] == entry['files']:
+            shutil.rmtree(folder)
+            INDEX.remove_version(self.module_key, io_type, folder)
+            kept = os.path.join(self.get_module_folder(), previous[-1]['folder'])
+            print(f'SUCCESS! No changes in {io_type} of {self.module_key}, kept {kept}')
+            return None
+        for file_name, checksum in entry['files'].items():
+            ioutl.link_to_blob(os.path.join(folder, file_name), INDEX.get_blob_folder(), checksum)
+        INDEX.add_version(self.module_key, io_type, folder, entry=entry)
+        print(f'SUCCESS! Published {io_type} to {folder}')
+        return folder
+
+    def discard_publish(self, io_type):
+        """ Remove the folder of a failed publish and its index entry, so loaders don't pick up partial data. """
+        folder = self.publish_folder
+        self.publish_folder = None
+        shutil.rmtree(folder, ignore_errors=True)
+        try:
+            INDEX.remove_version(self.module_key, io_type, folder)
+        except OSError as e:  # don't hide the error of the publisher
+            pm.warning(f'Cannot remove {folder} from the rigdata index: {e}')
+
     def write_single_json(self, data, io_type='ctls'):
         """ Write the given data to a single json file in a new up-versioned folder. """
         publish_folder = self.make_next_folder(io_type=io_type)
         publish_file = os.path.join(publish_folder, f'{self.module_key}_{io_type}.json')
         with open(publish_file, 'w') as f:
             json.dump(data, f, indent=4)
-        print(f'SUCCESS! Published {io_type} to {publish_file}')
         return publish_file
 
     def read_single_json(self, io_type='ctls'):
@@ -46,9 +326,7 @@ class BaseIo(object):
             return None  # no data of given io_type exists
 
         load_file = os.path.join(load_folder, f'{self.module_key}_{io_type}.json')
-        with open(load_file, 'r') as f:
-            data = json.load(f)
-        return data
+        return CACHE.read_json(load_file)
 
 
 class RigDataIo(BaseIo):
@@ -78,7 +356,16 @@ class RigDataIo(BaseIo):
     def publish_rigdata(self, io_type, nodes):
         if nodes:
             publisher = self.publishers[io_type]
-            return publisher(nodes)
+            self.publish_folder = None
+            try:
+                result = publisher(nodes)
+            except BaseException:
+                if self.publish_folder:
+                    self.discard_publish(io_type)
+                raise
+            if self.publish_folder:
+                self.finalize_publish(io_type)
+            return result
 
     def load_rigdata(self, io_type):
         loader = self.loaders[io_type]
@@ -164,7 +451,6 @@ class RigDataIo(BaseIo):
             with open(publish_file, 'w') as f:
                 json.dump(set_members, f, indent=4)
             publish_files.append([publish_file])
-        print(f'SUCCESS! Published rigsets to {publish_folder}')
         return publish_files
 
     def load_rigsets(self):
@@ -176,8 +462,7 @@ class RigDataIo(BaseIo):
         for lf in load_files:
             load_path = os.path.join(load_folder, lf)
             set_name = lf.replace('.json', '')
-            with open(load_path, 'r') as f:
-                data[set_name] = json.load(f)
+            data[set_name] = CACHE.read_json(load_path)
         rigsetlib.create_rigsets_from_dict(data)
 
     def publish_guides(self, guides):
@@ -216,6 +501,16 @@ class RigDataIo(BaseIo):
         publish_folder = self.make_next_folder(io_type='skinClusters')
         publish_files = []
         for skin in skins:
+            if ioutl.HAS_NUMPY:
+                try:
+                    header, arrays = skinlib.get_skin_weights(skin)
+                except errorutl.RbkInvalidObjectError:
+                    pass  # not a mesh, use the json format
+                else:
+                    publish_file = f'{self.module_key}_skinClusters.{skin}.npz'
+                    ioutl.write_npz(os.path.join(publish_folder, publish_file), header, **arrays)
+                    publish_files.append(publish_file)
+                    continue
             publish_file = f'{self.module_key}_skinClusters.{skin}.json'
             pm.deformerWeights(
                 publish_file,
@@ -226,22 +521,38 @@ class RigDataIo(BaseIo):
                 weightPrecision=5,
                 weightTolerance=0.0001
             )
+            publish_path = os.path.join(publish_folder, publish_file)
+            ioutl.write_header(publish_path, skinlib.get_header_from_skin_file(publish_path, skin))
             publish_files.append(publish_file)
-        print(f'SUCCESS! Published skinClusters to {publish_folder}')
         return publish_files
 
     def load_skins(self):
         load_folder = self.get_latest_folder(io_type='skinClusters')
         if not load_folder:
             return
-        load_files = [j for j in os.listdir(load_folder) if self.module_key in j and j.endswith('.json')]
+        load_files = [
+            j for j in os.listdir(load_folder) if self.module_key in j and j.endswith(('.json', '.npz'))
+        ]
 
         skins = []
         for load_file in load_files:
-            with open(os.path.join(load_folder, load_file), 'r') as f:
-                data = json.load(f)
+            load_path = os.path.join(load_folder, load_file)
+            if load_file.endswith('.npz') and not ioutl.HAS_NUMPY:
+                pm.warning(f'Cannot load binary skin weights without numpy, skipping: {load_file}')
+                continue
+            header = CACHE.read_header(load_path)  # None for json files published before headers existed
+            if header and not pm.objExists(header['shape']):
+                print(f'Geo not found during skin weight import, skipping: {load_file}')
+                continue
             try:
-                skn = skinlib.create_skin_from_data(data)
+                if load_file.endswith('.npz'):
+                    skn = skinlib.create_skin_from_weights_file(load_path, data=CACHE.read_npz(load_path))
+                elif header:
+                    skn = skinlib.create_skin_from_json_file(load_path, header)
+                else:
+                    with open(load_path, 'r') as f:
+                        data = json.load(f)
+                    skn = skinlib.create_skin_from_data(data)
                 skins.append(skn)
             except errorutl.RbkNotFound:
                 print(f'Geo not found during skin weight import, skipping: {load_file}')
@@ -251,58 +562,84 @@ class RigDataIo(BaseIo):
         publish_folder = self.make_next_folder(io_type='blendshapes')
         publish_files = []
         for bs in blendshapes:
+            if ioutl.HAS_NUMPY:
+                header, arrays = blendshapelib.get_blendshape_data(bs)
+                publish_file = f'{self.module_key}_blendshapes.{bs}.npz'
+                ioutl.write_npz(os.path.join(publish_folder, publish_file), header, **arrays)
+                publish_files.append(publish_file)
+                continue
             publish_file = f'{self.module_key}_blendshapes.{bs}.shp'
             publish_path = os.path.join(publish_folder, publish_file)
             pm.blendShape(bs, e=True, export=publish_path)
             publish_files.append(publish_file)
-        print(f'SUCCESS! Published blendshapes to {publish_folder}')
         return publish_files
 
-    def load_blendshapes(self):
+    def load_blendshapes(self, targets=None):
+        """ Load the latest blendshape targets onto the existing blendShapes.
+            :param targets: [str, ] - only load these targets, default is all (only for npz files, .shp files are
+                                      always imported completely)
+        """
         load_folder = self.get_latest_folder(io_type='blendshapes')
         if not load_folder:
             return
-        load_files = [j for j in os.listdir(load_folder) if self.module_key in j and j.endswith('.shp')]
+        load_files = [j for j in os.listdir(load_folder) if self.module_key in j and j.endswith(('.shp', '.npz'))]
 
         for load_file in load_files:
             bs = load_file.split('.')[1]
-            if pm.objExists(bs):
-                pm.blendShape(bs, e=True, ip=os.path.join(load_folder, load_file))
-            else:
+            load_path = os.path.join(load_folder, load_file)
+            if not pm.objExists(bs):
                 print(f'BlendShape not found during blendshape import, skipping: {load_file}')
+            elif load_file.endswith('.shp'):
+                pm.blendShape(bs, e=True, ip=load_path)
+            elif ioutl.HAS_NUMPY:
+                blendshapelib.load_blendshape_file(pm.PyNode(bs), load_path, targets)
+            else:
+                pm.warning(f'Cannot load binary blendshapes without numpy, skipping: {load_file}')
 
     def publish_driven_keys(self, driven_nodes):
         """
         Publish driven keys as rigdata.
-        Find all driven keys (animCurve nodes) that are driving the given 'driven nodes' and export them as mayaAscii.
+        Find all driven keys (animCurve nodes) that are driving the given 'driven nodes' and store their keys as npz
+        file (json header + numpy arrays). Without numpy they are exported as mayaAscii.
         :param driven_nodes: Nodes that have channels driven by a drivenKey
         """
-        anim_crvs = []
-        for d in driven_nodes:
-            for anim_crv in pm.listConnections(d, s=True, d=False, type='animCurve'):
-                driver_plug = pm.listConnections(f'{anim_crv}.i', p=True, s=True, d=False)
-                if driver_plug:
-                    anim_crvs.append(anim_crv)
+        anim_crvs = drivenkeylib.get_driven_keys(driven_nodes)
 
         publish_folder = self.make_next_folder(io_type='drivenKeys')
+        if ioutl.HAS_NUMPY:
+            header, arrays = drivenkeylib.get_driven_keys_data(anim_crvs)
+            publish_file = f'{self.module_key}_drivenKeys.npz'
+            ioutl.write_npz(os.path.join(publish_folder, publish_file), header, **arrays)
+            return publish_file
         publish_file = f'{self.module_key}_drivenKeys.ma'
         publish_path = os.path.join(publish_folder, publish_file)
         pm.select(anim_crvs, r=True)
         pm.exportSelected(publish_path, constructionHistory=False)
-        print(f'SUCCESS! Published drivenKeys to {publish_file}')
         return publish_file
 
     def load_driven_keys(self):
         """
         Load Driven keys as rigdata.
-        Import the latest drivenKeys file with a prefix. Then find the matching existing non-prefixed drivenKey node
-        in the scene and replace it with the imported one.
+        Update the keys of the existing driven keys in place from the latest drivenKeys npz file. Folders that were
+        published as mayaAscii are loaded with load_driven_keys_ma().
         """
         load_folder = self.get_latest_folder(io_type='drivenKeys')
         if not load_folder:
             return
-        load_file = os.path.join(load_folder, f'{self.module_key}_drivenKeys.ma')
+        load_file = os.path.join(load_folder, f'{self.module_key}_drivenKeys.npz')
+        if not os.path.exists(load_file):
+            return self.load_driven_keys_ma(os.path.join(load_folder, f'{self.module_key}_drivenKeys.ma'))
+        if not ioutl.HAS_NUMPY:
+            pm.warning(f'Cannot load binary driven keys without numpy, skipping: {load_file}')
+            return
+        return drivenkeylib.load_driven_keys_file(load_file, data=CACHE.read_npz(load_file))
 
+    def load_driven_keys_ma(self, load_file):
+        """
+        Load Driven keys from a mayaAscii file, as they were published before the npz format.
+        Import the file with a prefix. Then find the matching existing non-prefixed drivenKey node
+        in the scene and replace it with the imported one.
+        """
         prefix = 'drivenKeyImportTmp_'
         pm.importFile(load_file, renameAll=True, renamingPrefix=prefix)
         nodes = pm.ls(f'{prefix}_*')
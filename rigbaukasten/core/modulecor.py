@@ -1,19 +1,38 @@
+import contextlib
 import importlib
 import sys
 
 import pymel.core as pm
 
 import rigbaukasten
-from rigbaukasten.core import iocor
+from rigbaukasten.core import checkpointcor, evalprofilecor, graphoptcor, iocor, profilecor, rebuildcor, schedulecor
 from rigbaukasten.library import jointlib
-from rigbaukasten.utils import errorutl, attrutl, mathutl, connectutl
-from rigbaukasten.utils.typesutl import BuildStep, Ctl, Jnt, Trn, OutputDataPointer
+from rigbaukasten.utils import errorutl, attrutl, mathutl, connectutl, constraintutl
+from rigbaukasten.utils.typesutl import ALL_STEPS, BuildStep, Ctl, Jnt, Trn, OutputDataPointer
 
 
 ALL_MODULES = {}
+# (module_key, suffix): {index: node} - filled by store_output_data, the connections in the scene are the source of truth
+OUTPUT_DATA = {}
+KEEP_SCENE = False
+
+
+@contextlib.contextmanager
+def keep_scene():
+    """ Construct RigBuilds without starting a new scene, e.g. to compare them against the current build. """
+    global KEEP_SCENE
+    KEEP_SCENE = True
+    try:
+        yield
+    finally:
+        KEEP_SCENE = False
 
 
 class RigModule(object):
+    # Build steps that need the whole rig in a defined state, e.g. because they work on all joints in the scene.
+    # These steps are never reordered by the build scheduler, see schedulecor.BuildSchedule.
+    sync_steps = ()
+
     def __init__(self, side, module_name):
         self.side = side
         self.module_name = module_name
@@ -147,6 +166,11 @@ class RigModule(object):
         for key, mod in self.modules.items():
             mod.finalize_post()
 
+    @classmethod
+    def overridden_steps(cls):
+        """ Get the build steps that this class implements itself, instead of just running them on the sub modules. """
+        return [step for step in ALL_STEPS if getattr(cls, step) is not getattr(RigModule, step)]
+
     def create_grps(self):
         if self.parent_module:
             self.grp = pm.group(em=True, n=f'{self.module_key}_module_GRP', p=self.parent_module.modules_grp)
@@ -187,6 +211,10 @@ class RigModule(object):
         else:
             raise errorutl.RbkNotFound(f'Module {self.module_key} is unable to find provided hook {hook}.')
 
+    def __getstate__(self):
+        # Build step wrappers on the instance (e.g. from the profiler) are not part of the module state.
+        return {k: v for k, v in vars(self).items() if k not in ALL_STEPS}
+
     def get_asset_root_module(self):
         """ Get the root module of the rig module hierarchy (usually this will be the RigBuild). """
         if ALL_MODULES:
@@ -233,9 +261,11 @@ class RigModule(object):
                     child_names=[f'{typ.suffix}_{key}' for key in keys]
                 )
                 nodes = data.values() if isinstance(data, dict) else data
-                for node, plug in zip(nodes, child_plugs):
+                outputs = OUTPUT_DATA.setdefault((self.module_key, typ.suffix), {})
+                for key, node, plug in zip(keys, nodes, child_plugs):
                     src_plug = attrutl.add_message(node, 'rbk_output')
                     src_plug >> plug
+                    outputs[str(key)] = src_plug.node()
 
     @staticmethod
     def get_output_data(pointer):
@@ -246,33 +276,64 @@ class RigModule(object):
         if not isinstance(pointer, OutputDataPointer):
             raise errorutl.RbkInvalidKeywordArgument('Given pointer is not a subclass of typesutl.OutputDataPointer!')
 
-        try:
-            mod = ALL_MODULES[pointer.module_key]
-        except IndexError:
-            raise errorutl.RbkNotFound(f'Module "{pointer.module_key}" does not exist.')
-
-        try:
-            plug = mod.grp.attr(f'{pointer.suffix}_{pointer.index}')
-        except pm.MayaAttributeError:
-            outputs = []
-            if pm.attributeQuery(f"rbkOutput{pointer.suffix}", n=mod.grp, ex=True):
-                attrs = pm.attributeQuery(f"rbkOutput{pointer.suffix}", n=mod.grp, lc=True)  # [Jnt_top, Jnt_00, Jnt_01]
-                outputs = [a.replace(pointer.suffix + '_', '', 1) for a in attrs]  # ['top', '00', '01']
-                numeric_outputs = [a for a in outputs if a.isnumeric()]  # ['00', '01']
-                if isinstance(pointer.index, (int, float)) and pointer.index < 0:
-                    positive_index = outputs.index(numeric_outputs[pointer.index])
-                    plug = mod.grp.attr(attrs[positive_index])
-                    node = pm.listConnections(plug, s=True, d=False, p=False)[0]
-                    return node
+        outputs = OUTPUT_DATA.get((pointer.module_key, pointer.suffix))
+        node = RigModule._find_output(outputs, pointer.index) if outputs else None
+        if node is None or not node.exists():  # not registered in this session or deleted since
+            outputs = RigModule.load_output_data(pointer.module_key, pointer.suffix)
+            node = RigModule._find_output(outputs, pointer.index)
+        if node is None:
             raise errorutl.RbkNotFound(
                 f'Module {pointer.module_key} has no output "{pointer.index}"! '
-                f'Available {pointer.suffix} outputs: {outputs}'
+                f'Available {pointer.suffix} outputs: {list(outputs)}'
             )
-        node = pm.listConnections(plug, s=True, d=False, p=False)[0]
         return node
 
+    @staticmethod
+    def _find_output(outputs, index):
+        if isinstance(index, (int, float)) and index < 0:
+            numeric_outputs = [a for a in outputs if a.isnumeric()]  # ['00', '01'] from ['top', '00', '01']
+            try:
+                return outputs[numeric_outputs[int(index)]]
+            except IndexError:
+                return None
+        return outputs.get(str(index))
+
+    @staticmethod
+    def load_output_data(module_key, suffix):
+        """ Read the output data of the given module and type from the connections on the module group into
+            OUTPUT_DATA, e.g. after resuming a build from a checkpoint.
+            :return: {index: node}
+        """
+        try:
+            mod = ALL_MODULES[module_key]
+        except KeyError:
+            raise errorutl.RbkNotFound(f'Module "{module_key}" does not exist.')
+
+        outputs = {}
+        if pm.attributeQuery(f'rbkOutput{suffix}', n=mod.grp, ex=True):
+            attrs = pm.attributeQuery(f'rbkOutput{suffix}', n=mod.grp, lc=True) or []  # [Jnt_top, Jnt_00, Jnt_01]
+            for attr in attrs:
+                nodes = pm.listConnections(mod.grp.attr(attr), s=True, d=False, p=False)
+                if nodes:
+                    outputs[attr.replace(f'{suffix}_', '', 1)] = nodes[0]
+        OUTPUT_DATA[(module_key, suffix)] = outputs
+        return outputs
+
 
 class RigBuild(RigModule):
+    # Save a scene checkpoint after these steps, so build_rig(resume=True) can continue from there (see checkpointcor)
+    checkpoint_steps = ()
+    checkpoint_max_size = checkpointcor.DEFAULT_MAX_CACHE_SIZE  # bytes, older checkpoints are deleted
+    # Parse all rig data files on a thread pool before a new build starts (see iocor.RigDataCache)
+    prefetch_rigdata = True
+    # Connect hooks with multMatrix/blendMatrix into offsetParentMatrix instead of constraints (see constraintutl)
+    matrix_constraints = False
+    # Replace linear driven keys by utility nodes, fold constant utility nodes, merge duplicates and delete unused ones
+    # after a complete build (see graphoptcor)
+    optimize_graph = False
+    # Play back the finished rig and report the evaluation cost per module (see evalprofilecor)
+    evaluation_report = False
+
     def __init__(self):
         super().__init__(side='C', module_name='assetRootModule')
 
@@ -284,12 +345,28 @@ class RigBuild(RigModule):
         self.skel_grp = None
         self.current_step = None
         self.current_step_completed = False
+        self.schedule = None
+        self.fingerprints = {}
+        self.rigset_versions = {}  # see rebuildcor.rigset_versions()
 
-        self.scene_prep()
+        if not KEEP_SCENE:
+            self.scene_prep()
 
     def reset_all_modules(self):
-        global ALL_MODULES
+        global ALL_MODULES, OUTPUT_DATA
         ALL_MODULES = {}
+        OUTPUT_DATA = {}
+
+    def register_modules(self):
+        """ Rebuild ALL_MODULES from the module hierarchy, e.g. after modules were exchanged. """
+        self.reset_all_modules()
+
+        def _register(mod):
+            for key, sub_mod in mod.modules.items():
+                ALL_MODULES[key] = sub_mod
+                _register(sub_mod)
+
+        _register(self)
 
     def scene_prep(self):
         pm.newFile(f=True)
@@ -308,16 +385,105 @@ class RigBuild(RigModule):
             attrutl.unlock(grp.overrideDisplayType, k=False, cb=True)
             grp.overrideDisplayType.set(2)
 
-    def run(self, stop_after_step='finalize', stop_after_sub_step='post'):
+    def run(
+            self,
+            stop_after_step='finalize',
+            stop_after_sub_step='post',
+            profile=False,
+            schedule=False,
+            only_modules=None,
+            checkpoint_steps=None
+    ):
+        """ Run all build steps up to the given stop step.
+            :param stop_after_step: str - stop after this main step
+            :param stop_after_sub_step: str - stop after this pre/post step
+            :param profile: bool - record time and created nodes per module and step, print the most expensive
+                                   ones and write a json/csv report to the build cache (see profilecor)
+            :param schedule: bool - run the modules in dependency order instead of tree order and print the critical
+                                    path of the build (see schedulecor)
+            :param only_modules: [str, ] - only run the given modules and the modules that depend on them, implies
+                                           schedule=True. Use this to rebuild parts of an existing rig.
+            :param checkpoint_steps: [str, ] - save a scene checkpoint after these steps, default is
+                                               self.checkpoint_steps
+        """
+        if checkpoint_steps is None:
+            checkpoint_steps = self.checkpoint_steps
+        constraintutl.set_matrix_constraints(self.matrix_constraints)
+        profiler = None
+        if profile:
+            profiler = profilecor.BuildProfiler()
+            profiler.start(self)
+        if self.prefetch_rigdata and self.current_step is None:
+            iocor.CACHE.prefetch([self.module_key] + list(ALL_MODULES), self.publish_nodes.keys())
+        try:
+            if schedule or only_modules:
+                self._run_scheduled(stop_after_step, stop_after_sub_step, only_modules, checkpoint_steps)
+            else:
+                self._run_steps(stop_after_step, stop_after_sub_step, checkpoint_steps)
+        finally:
+            iocor.CACHE.clear()
+            if profiler:
+                profiler.stop()
+                profiler.print_top()
+                profiler.write_report(
+                    rigbaukasten.environment.get_build_cache_path('profiles'),
+                    name=f'{self.asset_name}_buildProfile'
+                )
+        if self.current_step_completed and self.current_step == 'finalize_post':
+            if self.optimize_graph:
+                module_keys = list(ALL_MODULES)  # only the rig's nodes, not the imported model
+                graphoptcor.linearize_driven_keys(
+                    curves=graphoptcor.get_module_nodes(module_keys, graphoptcor.DRIVEN_KEY_TYPES),
+                    keep=[n for mod in ALL_MODULES.values() for n in mod.publish_nodes['drivenKeys']]
+                )
+                graphoptcor.optimize(nodes=graphoptcor.get_module_nodes(module_keys), module_keys=module_keys)
+            if self.evaluation_report:
+                evalprofilecor.profile_evaluation(
+                    report_folder=rigbaukasten.environment.get_build_cache_path('profiles'),
+                    name=f'{self.asset_name}_evalProfile'
+                )
+        return profiler
+
+    def _run_scheduled(self, stop_after_step, stop_after_sub_step, only_modules=None, checkpoint_steps=()):
         fit_cam = self.current_step is None
-        for step_name, step_method in self.build_steps.items():
+        full_stop_step = f'{stop_after_step}_{stop_after_sub_step}' if stop_after_sub_step else stop_after_step
+        if self.schedule is None:
+            self.schedule = schedulecor.BuildSchedule(self)
+        self.current_step_completed = False
+        start_after = None if only_modules else self.current_step
+        # Checkpoint steps are run as barriers, so every module has completed them when the scene is saved. A partial
+        # rebuild (only_modules) has no consistent intermediate state, it only saves the stop step.
+        stop_steps = [full_stop_step]
+        if not only_modules:
+            first = ALL_STEPS.index(start_after) + 1 if start_after else 0
+            last = ALL_STEPS.index(full_stop_step)
+            stop_steps = [s for s in ALL_STEPS[first:last] if s in checkpoint_steps] + stop_steps
+        elif any(s != full_stop_step for s in checkpoint_steps):
+            pm.warning(f'Partial rebuilds only save a checkpoint after {full_stop_step}, if it is a checkpoint step.')
+        for stop_step in stop_steps:
+            self.schedule.run(stop_step=stop_step, start_after=start_after, modules=only_modules)
+            if not only_modules:
+                self.current_step = BuildStep(stop_step)
+                start_after = stop_step
+            if stop_step in checkpoint_steps:
+                checkpointcor.save_checkpoint(self, stop_step, max_size=self.checkpoint_max_size)
+        self.current_step_completed = True
+        self.schedule.print_critical_path()
+        if fit_cam:
+            pm.viewFit('persp', self.geo_grp)
+
+    def _run_steps(self, stop_after_step, stop_after_sub_step, checkpoint_steps=()):
+        fit_cam = self.current_step is None
+        for step_name in self.build_steps:
             if self.current_step and self.current_step >= step_name:
                 continue
             self.current_step = BuildStep(step_name)
             self.current_step_completed = False
             # print(f'Running {step_name}...')
-            step_method()
+            getattr(self, step_name)()  # not self.build_steps[step_name], so the profiler wrappers are used
             # print(f'...{step_name} completed')
+            if step_name in checkpoint_steps:
+                checkpointcor.save_checkpoint(self, step_name, max_size=self.checkpoint_max_size)
             full_stop_step = f'{stop_after_step}_{stop_after_sub_step}' if stop_after_sub_step else stop_after_step
             if step_name == full_stop_step:
                 if fit_cam:
@@ -326,7 +492,113 @@ class RigBuild(RigModule):
         self.current_step_completed = True
 
 
-def build_rig(file='myRig.myRig_build', stop_after_step='finalize', stop_after_sub_step='post', force_rebuild=False):
+def get_rig_build_class(file):
+    """ Import (or reload) the given rig build file and return its RigBuild class. """
+    mod = importlib.import_module(f'rig_builds.{file}')
+    importlib.reload(mod)
+    if not hasattr(mod, 'RigBuild'):
+        raise errorutl.RbkNotFound(
+            f'cannot find a RigBuild in {file}! Need a modulecor.RigBuild subclass called "RigBuild".'
+        )
+    if not issubclass(mod.RigBuild, RigBuild):
+        raise errorutl.RbkValueError(f'{file}.RigBuild is not a subclass of modulecor.RigBuild')
+    return mod.RigBuild
+
+
+def incremental_build(rig, rig_build_class, stop_after_step='finalize', stop_after_sub_step='post', profile=False):
+    """
+    Rebuild only the modules that changed since the given rig was built, and all modules that depend on them.
+
+    A module counts as changed if its constructor arguments, the source files of its class or its latest rig data
+    versions changed (see rebuildcor). The nodes of the changed modules are deleted and the modules are built again
+    up to the current step of the rig, then the whole rig continues to the given stop step.
+
+    :param rig: RigBuild - the existing rig build, its scene must still be open
+    :param rig_build_class: the (reloaded) RigBuild class to compare against
+    :param stop_after_step: stop after this main step
+    :param stop_after_sub_step: stop after this pre/post step
+    :param profile: Profile the build per module and step, see RigBuild.run()
+    :return: bool - False if an incremental build was not possible and the rig needs to be rebuilt from scratch
+    """
+    if not rig.fingerprints or not rig.current_step_completed or not pm.objExists(rig.grp):
+        pm.warning('Cannot build incrementally: previous rig build is not complete.')
+        return False
+    if rig.overridden_steps():
+        pm.warning('Cannot build incrementally: the RigBuild overwrites build steps, these would need to run again.')
+        return False
+
+    try:
+        with keep_scene():
+            new_rig = rig_build_class()
+    except errorutl.RbkBaseException as e:
+        pm.warning(f'Cannot build incrementally: constructing the new rig build failed ({e}).')
+        return False
+    new_prints = rebuildcor.fingerprint_modules(new_rig)
+    if new_prints.get(rig.module_key) != rig.fingerprints.get(rig.module_key):
+        pm.warning('Cannot build incrementally: the RigBuild class has changed.')
+        return False
+
+    dirty, removed = rebuildcor.get_dirty_modules(rig.fingerprints, new_prints)
+    old_schedule = schedulecor.BuildSchedule(rig)
+    old_rigset_versions = getattr(rig, 'rigset_versions', {})
+    new_rigset_versions = rebuildcor.rigset_versions(new_rig)
+    outdated_sets = [k for k, v in new_rigset_versions.items() if old_rigset_versions.get(k, v) != v]
+    if outdated_sets:
+        # The modules only load their rig sets if they don't exist yet, delete the old ones and construct again.
+        keep_keys = set(old_schedule.unit_of) - set(outdated_sets)
+        rebuildcor.teardown_modules(outdated_sets, keep_keys=keep_keys, sets_only=True)
+        with keep_scene():
+            new_rig = rig_build_class()
+    new_schedule = schedulecor.BuildSchedule(new_rig)
+    dirty += [k for k in new_schedule.units if k not in old_schedule.units]
+    rebuild = new_schedule.downstream(dirty)
+
+    # Tear down everything that will be rebuilt or is gone.
+    old_keys = set(old_schedule.unit_of)
+    teardown_keys = {k for k, unit in old_schedule.unit_of.items() if unit in rebuild or k in removed}
+    rebuildcor.teardown_modules(teardown_keys, keep_keys=old_keys - teardown_keys)
+
+    # Use the existing module objects (with all their scene nodes) for everything that is not rebuilt.
+    for key, unit in new_schedule.units.items():
+        if key not in rebuild:
+            old_unit = old_schedule.units[key]
+            unit.parent_module.modules[key] = old_unit
+            old_unit.parent_module = unit.parent_module
+    for mod in new_rig.modules.values():
+        mod.parent_module = rig
+    rig.modules = new_rig.modules
+    rig.register_modules()
+    rig.fingerprints = new_prints
+    rig.rigset_versions = new_rigset_versions
+    rig.schedule = None
+
+    sync_keys = [k for k, unit in new_schedule.units.items() if k not in rebuild and new_schedule.is_sync(unit)]
+    if rebuild and sync_keys:
+        pm.warning(
+            f'Modules {sync_keys} work on the whole rig and were not rebuilt. Force a full rebuild if they need to '
+            'pick up the changes.'
+        )
+    print(f'Rebuilding {len(rebuild)} of {len(new_schedule.units)} modules: {sorted(rebuild)}')
+
+    current_step = rig.current_step
+    if rebuild:
+        rig.run(stop_after_step=current_step, stop_after_sub_step='', profile=profile, only_modules=sorted(rebuild))
+    end_step = f'{stop_after_step}_{stop_after_sub_step}' if stop_after_sub_step else stop_after_step
+    if current_step < end_step:
+        rig.run(stop_after_step=stop_after_step, stop_after_sub_step=stop_after_sub_step, profile=profile)
+    return True
+
+
+def build_rig(
+        file='myRig.myRig_build',
+        stop_after_step='finalize',
+        stop_after_sub_step='post',
+        force_rebuild=False,
+        profile=False,
+        schedule=False,
+        incremental=False,
+        resume=False
+):
     """
     Start or continue a rig build.
 
@@ -334,7 +606,27 @@ def build_rig(file='myRig.myRig_build', stop_after_step='finalize', stop_after_s
     :param stop_after_step: stop after this main step
     :param stop_after_sub_step: stop after this pre/post step
     :param force_rebuild: Don't try to find an existing rig build and continue the build - force a new rig build.
+    :param profile: Profile the build per module and step, see RigBuild.run()
+    :param schedule: Run the modules in dependency order, see RigBuild.run()
+    :param incremental: Keep the existing rig build and only rebuild the modules that changed, see incremental_build()
+    :param resume: If the previous build cannot be continued, resume from the newest checkpoint that matches the
+                   current build script and rig data instead of starting from scratch (see RigBuild.checkpoint_steps)
     """
+    if incremental and not force_rebuild:
+        rig = getattr(sys.modules['__main__'], 'rig', None)
+        if isinstance(rig, RigBuild):
+            if incremental_build(
+                rig,
+                get_rig_build_class(file),
+                stop_after_step=stop_after_step,
+                stop_after_sub_step=stop_after_sub_step,
+                profile=profile
+            ):
+                return
+        else:
+            pm.warning("Cannot build incrementally: no previous rig build found in the 'rig' variable.")
+        force_rebuild = True
+
     if not force_rebuild:
         if hasattr(sys.modules['__main__'], 'rig'):  # rig variable exists
             if isinstance(sys.modules['__main__'].rig, RigBuild):  # rig variable is a rig build
@@ -347,7 +639,9 @@ def build_rig(file='myRig.myRig_build', stop_after_step='finalize', stop_after_s
                                 # Current scene and rig build valid, continue build
                                 rig.run(
                                     stop_after_step=stop_after_step,
-                                    stop_after_sub_step=stop_after_sub_step
+                                    stop_after_sub_step=stop_after_sub_step,
+                                    profile=profile,
+                                    schedule=schedule
                                 )
                                 return
                             else:
@@ -366,17 +660,31 @@ def build_rig(file='myRig.myRig_build', stop_after_step='finalize', stop_after_s
         else:
             pm.warning("Cannot continue previous rig build: 'rig' variable not found.")
 
-    mod = importlib.import_module(f'rig_builds.{file}')
-    importlib.reload(mod)
-    if not hasattr(mod, 'RigBuild'):
-        raise errorutl.RbkNotFound(
-            f'cannot find a RigBuild in {file}! Need a modulecor.RigBuild subclass called "RigBuild".'
-        )
-    if not issubclass(mod.RigBuild, RigBuild):
-        raise errorutl.RbkValueError(f'{file}.RigBuild is not a subclass of modulecor.RigBuild')
-    rig = mod.RigBuild()
+    rig_build_class = get_rig_build_class(file)
+    rig = rig_build_class()
+    rig.fingerprints = rebuildcor.fingerprint_modules(rig)
+    rig.rigset_versions = rebuildcor.rigset_versions(rig)
+    if resume:
+        end_step = f'{stop_after_step}_{stop_after_sub_step}' if stop_after_sub_step else stop_after_step
+        checkpoint = checkpointcor.find_checkpoint(rig, last_step=end_step)
+        if checkpoint:
+            _, scene_path, state_path = checkpoint
+            restored_rig = checkpointcor.load_checkpoint(scene_path, state_path)
+            if restored_rig:
+                rig = restored_rig
+            else:  # the checkpoint scene is open now, start over
+                rig = rig_build_class()
+                rig.fingerprints = rebuildcor.fingerprint_modules(rig)
+                rig.rigset_versions = rebuildcor.rigset_versions(rig)
+        else:
+            pm.warning('No valid checkpoint found, starting a new rig build.')
     sys.modules['__main__'].rig = rig
-    rig.run(stop_after_step=stop_after_step, stop_after_sub_step=stop_after_sub_step)
+    rig.run(
+        stop_after_step=stop_after_step,
+        stop_after_sub_step=stop_after_sub_step,
+        profile=profile,
+        schedule=schedule
+    )
 
 
 class RigPuppetModule(RigModule):
@@ -470,7 +778,10 @@ class RigPuppetModule(RigModule):
 
     def connect_puppet_joints(self):
         for p, j in zip(self.puppet_joints, self.joints):
-            connectutl.simple_matrix_constraint(p, j)
+            if constraintutl.MATRIX_CONSTRAINTS:
+                constraintutl.matrix_constraint(p, j, mo=False)
+            else:
+                connectutl.simple_matrix_constraint(p, j)
 
     def constraint_to_hook(self, driven, hook=None, prefer_puppet_joint=True):
         _hook = hook or self.hook
@@ -478,5 +789,4 @@ class RigPuppetModule(RigModule):
             hook_trn = self.get_hook(_hook)
             if prefer_puppet_joint and pm.objExists(f'{hook_trn}.puppet_joint_equivalent'):
                 hook_trn = hook_trn.puppet_joint_equivalent.listConnections(s=False, d=True)[0]
-            pm.parentConstraint(hook_trn, driven, mo=True)
-            pm.scaleConstraint(hook_trn, driven)
+            constraintutl.parent_constraint(hook_trn, driven)
@@ -0,0 +1,207 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+
+from maya.api import OpenMaya
+
+from rigbaukasten.utils.typesutl import ALL_STEPS
+
+
+class StepRecord(object):
+    """ Profiling data of a single (module_key, build step) pair. """
+    def __init__(self, module_key, step):
+        self.module_key = module_key
+        self.step = step
+        self.calls = 0
+        self.total_time = 0.0  # including the time spent in child modules
+        self.self_time = 0.0  # excluding the time spent in child modules
+        self.nodes_added = 0
+        self.nodes_removed = 0
+        self.node_types = Counter()
+
+    @property
+    def node_delta(self):
+        return self.nodes_added - self.nodes_removed
+
+    def to_dict(self):
+        return {
+            'module_key': self.module_key,
+            'step': self.step,
+            'calls': self.calls,
+            'total_time': self.total_time,
+            'self_time': self.self_time,
+            'nodes_added': self.nodes_added,
+            'nodes_removed': self.nodes_removed,
+            'node_delta': self.node_delta,
+            'node_types': dict(self.node_types.most_common()),
+        }
+
+
+class BuildProfiler(object):
+    """ Record wall time and created nodes for every (module_key, build step) pair of a rig build.
+
+        The profiler wraps the build step methods of every module instance, so the recursive fan out from
+        RigModule.<step> is timed per module. Times are stored inclusive (total_time) and exclusive (self_time),
+        node statistics are always exclusive, i.e. a node counts for the module that was running when it was created.
+
+        Usage:
+            profiler = BuildProfiler()
+            profiler.start(rig)
+            try:
+                rig.run()
+            finally:
+                profiler.stop()
+            profiler.print_top()
+    """
+    outside_key = '<outside>'
+
+    def __init__(self):
+        self.records = {}
+        self.total_time = 0.0
+        self._stack = []  # [[StepRecord, child_time], ...]
+        self._wrapped = []
+        self._callback_ids = []
+        self._start_time = None
+
+    def start(self, root_module):
+        """ Wrap the build steps of the given module and all its sub modules, start listening for node changes. """
+        self._wrap_recursive(root_module)
+        self._callback_ids = [
+            OpenMaya.MDGMessage.addNodeAddedCallback(self._node_added, 'dependNode'),
+            OpenMaya.MDGMessage.addNodeRemovedCallback(self._node_removed, 'dependNode'),
+        ]
+        self._start_time = time.perf_counter()
+
+    def stop(self):
+        """ Remove all wrappers and callbacks. Safe to call more than once. """
+        if self._start_time is not None:
+            self.total_time += time.perf_counter() - self._start_time
+            self._start_time = None
+        for callback_id in self._callback_ids:
+            OpenMaya.MMessage.removeCallback(callback_id)
+        self._callback_ids = []
+        for mod, step in self._wrapped:
+            if step in vars(mod):
+                delattr(mod, step)
+        self._wrapped = []
+        self._stack = []
+
+    def _wrap_recursive(self, mod):
+        for step in ALL_STEPS:
+            if step in vars(mod):
+                continue  # already wrapped
+            setattr(mod, step, self._timed(mod.module_key, step, getattr(mod, step)))
+            self._wrapped.append((mod, step))
+        for sub_mod in mod.modules.values():
+            self._wrap_recursive(sub_mod)
+
+    def _get_record(self, module_key, step):
+        key = (module_key, step)
+        if key not in self.records:
+            self.records[key] = StepRecord(module_key, step)
+        return self.records[key]
+
+    def _timed(self, module_key, step, method):
+        def timed_step(*args, **kwargs):
+            record = self._get_record(module_key, step)
+            record.calls += 1
+            frame = [record, 0.0]
+            self._stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._stack.pop()
+                record.total_time += elapsed
+                record.self_time += elapsed - frame[1]
+                if self._stack:
+                    self._stack[-1][1] += elapsed
+        return timed_step
+
+    def _current_record(self):
+        if self._stack:
+            return self._stack[-1][0]
+        return self._get_record(self.outside_key, '')
+
+    def _node_added(self, node, *_):
+        record = self._current_record()
+        record.nodes_added += 1
+        record.node_types[OpenMaya.MFnDependencyNode(node).typeName] += 1
+
+    def _node_removed(self, *_):
+        self._current_record().nodes_removed += 1
+
+    # ---------------------- Reports ---------------------- #
+
+    def sorted_records(self, sort_by='self_time'):
+        """ Get all records, most expensive first.
+            :param sort_by: str - any StepRecord attribute, e.g. 'self_time', 'total_time', 'nodes_added'
+        """
+        return sorted(self.records.values(), key=lambda r: getattr(r, sort_by), reverse=True)
+
+    def step_totals(self):
+        """ Sum of the exclusive times per build step. """
+        totals = {step: 0.0 for step in ALL_STEPS}
+        for record in self.records.values():
+            if record.step in totals:
+                totals[record.step] += record.self_time
+        return totals
+
+    def node_type_totals(self):
+        totals = Counter()
+        for record in self.records.values():
+            totals.update(record.node_types)
+        return totals
+
+    def to_dict(self):
+        return {
+            'total_time': self.total_time,
+            'nodes_added': sum(r.nodes_added for r in self.records.values()),
+            'nodes_removed': sum(r.nodes_removed for r in self.records.values()),
+            'step_totals': self.step_totals(),
+            'node_types': dict(self.node_type_totals().most_common()),
+            'records': [r.to_dict() for r in self.sorted_records()],
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+        return path
+
+    def write_csv(self, path):
+        fields = ['module_key', 'step', 'calls', 'total_time', 'self_time', 'nodes_added', 'nodes_removed',
+                  'node_delta', 'node_types']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for record in self.sorted_records():
+                row = record.to_dict()
+                row['node_types'] = ' '.join(f'{typ}:{count}' for typ, count in row['node_types'].items())
+                writer.writerow(row)
+        return path
+
+    def write_report(self, folder, name='buildProfile'):
+        """ Write the profile as json and csv into the given folder, with a time stamp in the file names.
+            :return: (json_path, csv_path)
+        """
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        json_path = self.write_json(os.path.join(folder, f'{name}_{stamp}.json'))
+        csv_path = self.write_csv(os.path.join(folder, f'{name}_{stamp}.csv'))
+        print(f'Build profile written to {json_path}')
+        return json_path, csv_path
+
+    def print_top(self, n=20, sort_by='self_time'):
+        """ Print a table with the n most expensive (module_key, step) pairs. """
+        print(f'Build profile: {self.total_time:.2f}s total, top {n} by {sort_by}')
+        print(f'{"module":<32}{"step":<24}{"self s":>9}{"total s":>9}{"nodes":>8}  top node types')
+        for record in self.sorted_records(sort_by)[:n]:
+            top_types = ', '.join(f'{typ}:{count}' for typ, count in record.node_types.most_common(3))
+            print(
+                f'{record.module_key:<32}{record.step:<24}{record.self_time:>9.3f}{record.total_time:>9.3f}'
+                f'{record.node_delta:>8}  {top_types}'
+            )
@@ -0,0 +1,161 @@
+import hashlib
+import inspect
+import json
+import os
+
+import pymel.core as pm
+
+from rigbaukasten.core import iocor
+from rigbaukasten.utils.typesutl import OutputDataPointer
+
+
+IGNORED_ATTRS = ('parent_module', 'modules', 'publish_nodes', 'build_steps')
+
+
+def file_hash(path, _cache=None):
+    """ Get the sha1 of the given file, optionally cached in the given dict. """
+    if _cache is not None and path in _cache:
+        return _cache[path]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    if _cache is not None:
+        _cache[path] = digest
+    return digest
+
+
+def to_simple(value):
+    """ Convert the given value to something json serializable that does not change between two python sessions. """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, OutputDataPointer):  # Jnt('C_spine', 0)
+        return [type(value).__name__, value.module_key, value.index]
+    if isinstance(value, (list, tuple)):
+        return [to_simple(v) for v in value]
+    if isinstance(value, set):
+        return sorted(str(to_simple(v)) for v in value)
+    if isinstance(value, dict):
+        return {str(k): to_simple(v) for k, v in value.items()}
+    if isinstance(value, pm.PyNode):
+        return value.name()
+    if hasattr(value, 'module_key') and hasattr(value, 'modules'):  # RigModule instance
+        return ['RigModule', value.module_key]
+    if callable(value):
+        return f'{getattr(value, "__module__", "")}.{getattr(value, "__qualname__", type(value).__name__)}'
+    return type(value).__name__
+
+
+def source_hashes(cls, _cache=None):
+    """ Hash the source files of the given class and all its base classes. """
+    hashes = {}
+    for base in cls.__mro__:
+        if base is object:
+            continue
+        try:
+            path = inspect.getsourcefile(base)
+        except TypeError:
+            continue  # builtin
+        if path and os.path.isfile(path):
+            hashes[f'{base.__module__}.{base.__qualname__}'] = file_hash(path, _cache)
+    return hashes
+
+
+def rigdata_versions(module_key, io_types):
+    """ Get the name of the latest published version for each of the given io types. """
+    versions = {}
+    for io_type in io_types:
+        latest = iocor.INDEX.get_latest(module_key, io_type)
+        versions[io_type] = latest['folder'] if latest else None
+    return versions
+
+
+def module_fingerprint(mod, _cache=None):
+    """ Get a hash of everything that defines what the given module builds:
+        - its constructor arguments, i.e. all simple attributes right after __init__
+        - the source files of its class and base classes
+        - the latest published rig data versions
+        Must be called before the build starts, since the attributes change during the build.
+    """
+    data = {
+        'attrs': {k: to_simple(v) for k, v in vars(mod).items() if k not in IGNORED_ATTRS},
+        'source': source_hashes(type(mod), _cache),
+        'rigdata': rigdata_versions(mod.module_key, mod.publish_nodes.keys()),
+        'parent': mod.parent_module.module_key if mod.parent_module else None,
+    }
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def root_fingerprint(root_module):
+    """ Get a hash of the RigBuild class itself, without its __init__. The __init__ only defines the modules, which are
+        fingerprinted individually.
+    """
+    sources = []
+    for name, value in sorted(vars(type(root_module)).items()):
+        if name != '__init__' and inspect.isfunction(value):
+            sources.append(inspect.getsource(value))
+    data = {'methods': sources, 'steps': root_module.overridden_steps()}
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def fingerprint_modules(root_module):
+    """ Get the fingerprints of all modules in the rig.
+        :return: {module_key: fingerprint}, in module order, including the root module
+    """
+    cache = {}
+    prints = {root_module.module_key: root_fingerprint(root_module)}
+
+    def _collect(mod):
+        for key, sub_mod in mod.modules.items():
+            prints[key] = module_fingerprint(sub_mod, cache)
+            _collect(sub_mod)
+
+    _collect(root_module)
+    return prints
+
+
+def rigset_versions(root_module):
+    """ Get the latest published rig sets version of all modules that have rig sets. Rig sets are loaded when a module
+        is constructed and are kept in the scene, so a new version is only picked up if the old sets are deleted first.
+        :return: {module_key: version folder or None}
+    """
+    versions = {}
+
+    def _collect(mod):
+        for key, sub_mod in mod.modules.items():
+            if sub_mod.publish_nodes.get('rigsets'):
+                versions[key] = rigdata_versions(key, ['rigsets'])['rigsets']
+            _collect(sub_mod)
+
+    _collect(root_module)
+    return versions
+
+
+def get_dirty_modules(old_prints, new_prints):
+    """ Compare two fingerprint dicts.
+        :return: ([changed or new module keys], [removed module keys])
+    """
+    dirty = [k for k, v in new_prints.items() if old_prints.get(k) != v]
+    removed = [k for k in old_prints if k not in new_prints]
+    return dirty, removed
+
+
+def teardown_modules(module_keys, keep_keys=(), sets_only=False):
+    """ Delete the scene nodes of the given modules, i.e. everything named <module_key>_*.
+        Rig sets are kept, they contain user data that is loaded when the module is constructed.
+        :param module_keys: [str, ] - modules to delete
+        :param keep_keys: [str, ] - modules to keep, to resolve names that could belong to more than one module
+                                    (e.g. L_arm_* also matches L_arm_twist_* if there is a module called L_arm_twist)
+        :param sets_only: bool - only delete the rig sets, e.g. to load a new published version of them
+    """
+    nodes = []
+    for key in module_keys:
+        longer_keys = [k for k in keep_keys if k.startswith(f'{key}_')]
+        for node in pm.ls(f'{key}_*'):
+            if any(node.startswith(f'{k}_') for k in longer_keys):
+                continue
+            if (pm.objectType(node) == 'objectSet') != sets_only:
+                continue
+            nodes.append(node)
+    nodes = [n for n in nodes if pm.objExists(n)]
+    if nodes:
+        pm.delete(nodes)
+    return nodes
@@ -0,0 +1,242 @@
+import heapq
+import time
+
+from rigbaukasten.utils import errorutl
+from rigbaukasten.utils.typesutl import ALL_STEPS, OutputDataPointer
+
+
+class BuildSchedule(object):
+    """ Run the build steps of a RigBuild in dependency order instead of strict tree order.
+
+        Every (module, step) pair is a task. A task can run as soon as
+            - the same module finished its previous step,
+            - all modules it is hooked to (hook, parent_joint, Jnt/Ctl/Trn pointers, node names, ...) finished the
+              same step.
+        So a module can continue building while unrelated modules are still in earlier steps.
+
+        Some work needs the whole scene in a certain state (e.g. the HumanIK definition needs all joints), modules can
+        declare those steps in RigModule.sync_steps. A sync step runs after every module finished the previous step,
+        and in the original module order relative to the same step of all other modules. Steps that are overwritten
+        on the RigBuild itself always run the classic way, as one task for the whole rig.
+
+        Modules that don't overwrite any build step (e.g. simple containers) are replaced by their sub modules,
+        all other modules are scheduled as a whole, including their sub modules.
+    """
+    def __init__(self, root_module):
+        """
+        :param root_module: RigBuild - the asset root module
+        """
+        self.root = root_module
+        self.units = {}  # module_key: module, the modules that are scheduled as one unit
+        self.unit_of = {}  # module_key: unit key, for every module in the rig
+        self.dependencies = {}  # unit key: {upstream unit keys}
+        self.tasks = {}  # (unit key, step): {(unit key, step), ...} the tasks that need to finish first
+        self.durations = {}  # (unit key, step): seconds
+        self.done = set()
+
+        self.collect_units(self.root)
+        self.collect_dependencies()
+        self.collect_tasks()
+
+    @property
+    def root_key(self):
+        return self.root.module_key
+
+    # ---------------------- Graph ---------------------- #
+
+    def collect_units(self, mod):
+        for key, sub_mod in mod.modules.items():
+            if sub_mod.modules and not sub_mod.overridden_steps():
+                self.collect_units(sub_mod)
+            else:
+                self.units[key] = sub_mod
+                self._map_to_unit(sub_mod, key)
+
+    def _map_to_unit(self, mod, unit_key):
+        self.unit_of[mod.module_key] = unit_key
+        for sub_mod in mod.modules.values():
+            self._map_to_unit(sub_mod, unit_key)
+
+    def collect_dependencies(self):
+        """ Find the modules each unit is hooked to by scanning the attributes of the unit and its sub modules. """
+        all_keys = sorted(self.unit_of, key=len, reverse=True)  # longest first, so 'L_armTwist' wins over 'L_arm'
+        for unit_key, unit in self.units.items():
+            found = set()
+            for mod in self._iter_modules(unit):
+                for name, value in vars(mod).items():
+                    if name in ('parent_module', 'modules', 'publish_nodes', 'build_steps'):
+                        continue
+                    self._scan(value, all_keys, found, set())
+            self.dependencies[unit_key] = {
+                self.unit_of[k] for k in found if k in self.unit_of and self.unit_of[k] != unit_key
+            }
+
+    def _iter_modules(self, mod):
+        yield mod
+        for sub_mod in mod.modules.values():
+            yield from self._iter_modules(sub_mod)
+
+    def _scan(self, value, all_keys, found, visited):
+        if isinstance(value, OutputDataPointer):  # Jnt('C_spine', 0)
+            found.add(value.module_key)
+        elif isinstance(value, str):  # 'C_spine_0_JNT'
+            for key in all_keys:
+                if value == key or value.startswith(f'{key}_'):
+                    found.add(key)
+                    break
+        elif hasattr(value, 'module_key') and hasattr(value, 'modules'):  # RigModule instance
+            found.add(value.module_key)
+        elif isinstance(value, (list, tuple, set, dict)):  # ['C_spine', 0], {'hook': Jnt('C_spine', 0)}
+            if id(value) in visited:
+                return
+            visited.add(id(value))
+            for item in (value.values() if isinstance(value, dict) else value):
+                self._scan(item, all_keys, found, visited)
+
+    def collect_tasks(self):
+        root_steps = self.root.overridden_steps()
+        unit_keys = list(self.units)
+        for i, step in enumerate(ALL_STEPS):
+            prev_step = ALL_STEPS[i - 1] if i else None
+            if step in root_steps:
+                deps = {(k, prev_step) for k in unit_keys + [self.root_key]} if prev_step else set()
+                self.tasks[(self.root_key, step)] = deps
+                continue
+            if prev_step:
+                self.tasks[(self.root_key, step)] = {(self.root_key, prev_step)}
+            else:
+                self.tasks[(self.root_key, step)] = set()
+            for key in unit_keys:
+                deps = {(self.root_key, step)}
+                if prev_step:
+                    deps.add((key, prev_step))
+                deps.update((d, step) for d in self.dependencies[key])
+                self.tasks[(key, step)] = deps
+            sync_keys = [k for k in unit_keys if self.is_sync(self.units[k], step)]
+            for sync_key in sync_keys:
+                index = unit_keys.index(sync_key)
+                if prev_step:
+                    self.tasks[(sync_key, step)].update((k, prev_step) for k in unit_keys)
+                self.tasks[(sync_key, step)].update((k, step) for k in unit_keys[:index])
+                for key in unit_keys[index + 1:]:
+                    self.tasks[(key, step)].add((sync_key, step))
+        # Steps overwritten on the root need all units to be through with the previous step and block the next one.
+        for i, step in enumerate(ALL_STEPS):
+            if step in root_steps and i + 1 < len(ALL_STEPS):
+                for key in unit_keys:
+                    self.tasks[(key, ALL_STEPS[i + 1])].add((self.root_key, step))
+        self.order()  # fail early on cyclic dependencies
+
+    def is_sync(self, mod, step=None):
+        """ Check if the given module or any of its sub modules has the given sync step (default: any sync step). """
+        if step is None:
+            return any(m.sync_steps for m in self._iter_modules(mod))
+        return any(step in m.sync_steps for m in self._iter_modules(mod))
+
+    def is_root_step(self, task):
+        return task[0] == self.root_key and task[1] in self.root.overridden_steps()
+
+    # ---------------------- Queries ---------------------- #
+
+    def downstream(self, module_keys):
+        """ Get all units that depend on the given modules (directly or indirectly), including the modules' units.
+            :param module_keys: [str, ] - any module keys of the rig, sub modules are resolved to their unit
+        """
+        result = {self.unit_of.get(k, k) for k in module_keys}
+        changed = True
+        while changed:
+            changed = False
+            for key, deps in self.dependencies.items():
+                if key not in result and deps & result:
+                    result.add(key)
+                    changed = True
+        return result
+
+    def order(self, tasks=None):
+        """ Get the given tasks (default: all) in an order that respects all dependencies.
+            Ready tasks are picked by module order first, so each module runs ahead as far as its inputs allow.
+        """
+        tasks = set(self.tasks) if tasks is None else set(tasks)
+        unit_index = {key: i for i, key in enumerate([self.root_key] + list(self.units))}
+        waiting = {t: {d for d in self.tasks[t] if d in tasks} for t in tasks}
+        users = {t: [] for t in tasks}
+        for t, deps in waiting.items():
+            for d in deps:
+                users[d].append(t)
+        ready = [(unit_index[t[0]], ALL_STEPS.index(t[1]), t) for t, deps in waiting.items() if not deps]
+        heapq.heapify(ready)
+        ordered = []
+        while ready:
+            _, _, task = heapq.heappop(ready)
+            ordered.append(task)
+            for user in users[task]:
+                waiting[user].discard(task)
+                if not waiting[user]:
+                    heapq.heappush(ready, (unit_index[user[0]], ALL_STEPS.index(user[1]), user))
+        if len(ordered) != len(tasks):
+            stuck = sorted({t[0] for t in tasks if t not in ordered})
+            raise errorutl.RbkDependencyError(f'Cyclic dependencies between modules: {stuck}')
+        return ordered
+
+    def critical_path(self):
+        """ Get the chain of dependent tasks with the longest total duration, based on the measured durations.
+            :return: ([(unit key, step), ...], total seconds)
+        """
+        ordered = self.order(t for t in self.tasks if t in self.durations)
+        best = {}  # task: (total duration, previous task)
+        for task in ordered:
+            prev = max(
+                (d for d in self.tasks[task] if d in best),
+                key=lambda d: best[d][0],
+                default=None
+            )
+            total = self.durations[task] + (best[prev][0] if prev else 0.0)
+            best[task] = (total, prev)
+        if not best:
+            return [], 0.0
+        task = max(best, key=lambda t: best[t][0])
+        total = best[task][0]
+        path = []
+        while task:
+            path.append(task)
+            task = best[task][1]
+        return path[::-1], total
+
+    def print_critical_path(self, min_duration=0.01):
+        """ Print the critical path of the last run, skipping tasks that took less than min_duration seconds. """
+        path, total = self.critical_path()
+        print(f'Critical path: {total:.2f}s of {sum(self.durations.values()):.2f}s total build time')
+        for key, step in path:
+            if self.durations[(key, step)] >= min_duration:
+                print(f'    {key:<32}{step:<24}{self.durations[(key, step)]:>9.3f}')
+
+    # ---------------------- Run ---------------------- #
+
+    def run(self, stop_step='finalize_post', start_after=None, modules=None):
+        """ Run all tasks up to (and including) the given step.
+            :param stop_step: str - last step to run
+            :param start_after: str - skip all steps up to (and including) this one, e.g. when continuing a build
+            :param modules: [str, ] - only run the given modules and everything that depends on them. Steps that are
+                                      overwritten on the RigBuild itself are skipped in this case.
+        """
+        last = ALL_STEPS.index(stop_step)
+        first = ALL_STEPS.index(start_after) + 1 if start_after else 0
+        steps = ALL_STEPS[first:last + 1]
+        units = self.downstream(modules) if modules else set(self.units)
+        if modules:
+            self.done = {t for t in self.done if t[0] not in units}  # run them again
+        tasks = [
+            t for t in self.tasks
+            if t[1] in steps and t not in self.done and (t[0] in units or (t[0] == self.root_key and not modules))
+        ]
+        for key, step in self.order(tasks):
+            if key == self.root_key:
+                if not self.is_root_step((key, step)):
+                    continue  # placeholder task, the units are scheduled individually
+                mod = self.root
+            else:
+                mod = self.units[key]
+            start = time.perf_counter()
+            getattr(mod, step)()
+            self.durations[(key, step)] = time.perf_counter() - start
+            self.done.add((key, step))
@@ -4,6 +4,8 @@ import pymel.core as pm
 
 class BlendShape(modulecor.RigModule):
     """ Simple blendShape module. Lets you create sculpt targtes in maya and export them as rig data. """
+    sync_steps = ('deform_build',)  # keep the deformer order on the geo
+
     def __init__(
             self,
             side,
@@ -8,6 +8,8 @@ from rigbaukasten.utils.typesutl import Jnt
 
 class SimpleSkin(modulecor.RigModule):
     """ A simple skinCluster with given joints and geo. """
+    sync_steps = ('deform_build',)  # keep the deformer order on the geo
+
     def __init__(
             self,
             side,
@@ -86,8 +88,9 @@ class SkinSet(SimpleSkin):
         """
         super().__init__(side=side, module_name=module_name, joints=joints)
 
-        self.load_rigdata(io_type='rigsets', recursive=False)
         parent_set_name = self.mk('parent_RIGSET')
+        if not pm.objExists(parent_set_name):  # rig sets are kept in the scene for incremental rebuilds
+            self.load_rigdata(io_type='rigsets', recursive=False)
         if pm.objExists(parent_set_name):
             # parent set was already created by load_rigdata()
             self.parent_set = pm.PyNode(parent_set_name)
@@ -118,6 +121,8 @@ class TransferredSkin(modulecor.RigModule):
     Create skinClusters based on already existing ones. E.g. to transfer skinning from lowRes to hiRes meshes.
     Specify source and target meshes by using sets with matching names and a 'Src_RIGSET' / 'Tgt_RIGSET' suffix.
     """
+    sync_steps = ('deform_build', 'deform_connect')  # needs the source skinClusters from other modules
+
     def __init__(
             self,
             side='C',
@@ -138,8 +143,9 @@ class TransferredSkin(modulecor.RigModule):
         self.tgt_sets = []
         self.skin_clusters = []
 
-        self.load_rigdata(io_type='rigsets', recursive=False)
         parent_set_name = self.mk('parent_RIGSET')
+        if not pm.objExists(parent_set_name):  # rig sets are kept in the scene for incremental rebuilds
+            self.load_rigdata(io_type='rigsets', recursive=False)
         if pm.objExists(parent_set_name):
             # parent set was already created by load_rigdata()
             self.parent_set = pm.PyNode(parent_set_name)
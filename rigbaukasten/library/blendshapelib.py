@@ -0,0 +1,173 @@
+import pymel.core as pm
+from maya import cmds
+from maya.api import OpenMaya
+
+from rigbaukasten.utils import ioutl, sceneutl
+from rigbaukasten.utils.ioutl import np
+
+
+BLENDSHAPE_FORMAT = 'rbkBlendShape'
+BLENDSHAPE_VERSION = 1
+BLENDSHAPE_TOLERANCE = 0.00001  # deltas below this length are not stored
+
+
+def get_target_names(bs):
+    """ Get the weight alias names of the given blendShape.
+        :return: {target index: name}
+    """
+    aliases = cmds.aliasAttr(str(bs), q=True) or []
+    return {int(attr.split('[')[1][:-1]): alias for alias, attr in zip(aliases[::2], aliases[1::2])}
+
+
+def get_array_names(index, item):
+    """ Names of the component ids and delta arrays of one target item in the blendshape file. """
+    return f'ids_{index}_{item}', f'deltas_{index}_{item}'
+
+
+def _item_plug(bs, index, item, attr):
+    return f'{bs}.inputTarget[0].inputTargetGroup[{index}].inputTargetItem[{item}].{attr}'
+
+
+def get_target_deltas(bs, index, item):
+    """ Get the stored deltas of one target item through the API, without exporting the blendShape.
+        :return: (component ids, deltas) - int32 array and float32 array with shape (n, 3)
+    """
+    try:
+        points = OpenMaya.MFnPointArrayData(sceneutl.get_plug(_item_plug(bs, index, item, 'ipt')).asMObject()).array()
+        components = OpenMaya.MFnComponentListData(
+            sceneutl.get_plug(_item_plug(bs, index, item, 'ict')).asMObject()
+        )
+    except RuntimeError:  # no data, e.g. an empty target
+        return np.zeros(0, dtype=np.int32), np.zeros((0, 3), dtype=np.float32)
+    ids = []
+    for i in range(components.length()):
+        ids += OpenMaya.MFnSingleIndexedComponent(components.get(i)).getElements()
+    deltas = np.array([(p.x, p.y, p.z) for p in points], dtype=np.float32).reshape(-1, 3)
+    return np.array(ids, dtype=np.int32), deltas
+
+
+def get_blendshape_data(bs, tolerance=BLENDSHAPE_TOLERANCE):
+    """ Get all targets and in-betweens (inputTargetItem 5000 + weight * 1000) of the given blendShape as sparse
+        numpy arrays.
+        Only the first geometry of the blendShape and the stored deltas are exported, targets that are driven by a
+        live target geometry have to be baked (disconnected) first.
+        :param bs: PyNode - blendShape
+        :param tolerance: float - deltas shorter than this are not stored
+        :return: (header, arrays) - header is a json serializable dict with deformer, shape, vertex_count and a list
+                 of targets (name, index, weight, items), arrays contains the component ids and float32 deltas of
+                 every target item, see get_array_names().
+    """
+    shape = cmds.blendShape(str(bs), q=True, geometry=True)[0]
+    names = get_target_names(bs)
+    targets = []
+    arrays = {}
+    for index in cmds.getAttr(f'{bs}.weight', multiIndices=True) or []:
+        items = cmds.getAttr(f'{bs}.inputTarget[0].inputTargetGroup[{index}].inputTargetItem', multiIndices=True)
+        target = {
+            'name': names.get(index, f'target{index}'),
+            'index': index,
+            'weight': cmds.getAttr(f'{bs}.weight[{index}]'),
+            'items': [],
+        }
+        for item in items or []:
+            ids, deltas = get_target_deltas(bs, index, item)
+            keep = np.linalg.norm(deltas, axis=1) > tolerance
+            ids_name, deltas_name = get_array_names(index, item)
+            arrays[ids_name] = ids[keep]
+            arrays[deltas_name] = deltas[keep]
+            target['items'].append(item)
+        targets.append(target)
+    header = {
+        'format': BLENDSHAPE_FORMAT,
+        'version': BLENDSHAPE_VERSION,
+        'deformer': bs.name(),
+        'shape': shape,
+        'vertex_count': cmds.polyEvaluate(shape, vertex=True) if cmds.objectType(shape) == 'mesh' else None,
+        'targets': targets,
+    }
+    header['checksum'] = ioutl.arrays_checksum(arrays)
+    return header, arrays
+
+
+def get_header_targets(header, targets=None):
+    """ Get the target entries of the header for the given target names, missing names are skipped with a warning. """
+    if targets is None:
+        return header['targets']
+    by_name = {t['name']: t for t in header['targets']}
+    missing = [t for t in targets if t not in by_name]
+    if missing:
+        pm.warning(f'Targets not found in blendshape data of {header["deformer"]}, skipping: {missing}')
+    return [by_name[t] for t in targets if t in by_name]
+
+
+def set_blendshape_data(bs, header, arrays, targets=None):
+    """ Create or update the targets of the given blendShape from the data of get_blendshape_data().
+        All deltas and weights are set with a single MDGModifier. Existing targets are matched by name, new targets
+        keep their published index if it is free.
+        :param bs: PyNode - blendShape
+        :param header: dict - header from get_blendshape_data()
+        :param arrays: dict - arrays from get_blendshape_data(), only the arrays of the loaded targets are needed
+        :param targets: [str, ] - only load these targets, default is all
+        :return: [str, ] - names of the loaded targets
+    """
+    shape = cmds.blendShape(str(bs), q=True, geometry=True)[0]
+    if header['vertex_count'] is not None and cmds.polyEvaluate(shape, vertex=True) != header['vertex_count']:
+        pm.warning(f'Vertex count of {shape} changed, cannot load blendshape targets of {bs}')
+        return []
+    indices = {name: index for index, name in get_target_names(bs).items()}
+    used = set(cmds.getAttr(f'{bs}.weight', multiIndices=True) or [])
+    modifier = OpenMaya.MDGModifier()
+    new_names = {}
+    loaded = get_header_targets(header, targets)
+    for target in loaded:
+        index = indices.get(target['name'])
+        if index is None:
+            index = target['index'] if target['index'] not in used else max(used) + 1
+            used.add(index)
+            new_names[index] = target['name']
+        current_items = cmds.getAttr(
+            f'{bs}.inputTarget[0].inputTargetGroup[{index}].inputTargetItem', multiIndices=True
+        ) or []
+        for item in set(current_items) - set(target['items']):
+            cmds.removeMultiInstance(f'{bs}.inputTarget[0].inputTargetGroup[{index}].inputTargetItem[{item}]', b=True)
+        for item in target['items']:
+            ids_name, deltas_name = get_array_names(target['index'], item)
+            component_fn = OpenMaya.MFnSingleIndexedComponent()
+            component = component_fn.create(OpenMaya.MFn.kMeshVertComponent)
+            component_fn.addElements(arrays[ids_name].tolist())
+            components_fn = OpenMaya.MFnComponentListData()
+            components = components_fn.create()
+            components_fn.add(component)
+            points = OpenMaya.MPointArray([OpenMaya.MPoint(*d) for d in arrays[deltas_name].tolist()])
+            modifier.newPlugValue(sceneutl.get_plug(_item_plug(bs, index, item, 'ict')), components)
+            modifier.newPlugValue(
+                sceneutl.get_plug(_item_plug(bs, index, item, 'ipt')),
+                OpenMaya.MFnPointArrayData().create(points)
+            )
+        modifier.newPlugValueFloat(sceneutl.get_plug(f'{bs}.weight[{index}]'), target['weight'])
+    modifier.doIt()
+    for index, name in new_names.items():
+        cmds.aliasAttr(name, f'{bs}.weight[{index}]')
+    return [t['name'] for t in loaded]
+
+
+def load_blendshape_file(bs, path, targets=None):
+    """ Load the targets from a file that was written with get_blendshape_data() onto the given blendShape.
+        Only the arrays of the requested targets are read from the file.
+        :param bs: PyNode - blendShape
+        :param path: str - the .npz file
+        :param targets: [str, ] - only load these targets, default is all
+        :return: [str, ] - names of the loaded targets
+    """
+    header = ioutl.read_npz(path, header_only=True)
+    names = None
+    if targets is not None:
+        targets = [t['name'] for t in get_header_targets(header, targets)]
+        names = []
+        for target in get_header_targets(header, targets):
+            for item in target['items']:
+                names += get_array_names(target['index'], item)
+    _, arrays = ioutl.read_npz(path, names=names)
+    if names is None and header.get('checksum') and header['checksum'] != ioutl.arrays_checksum(arrays):
+        pm.warning(f'Checksum mismatch, blendshape file might be corrupted: {path}')
+    return set_blendshape_data(bs, header, arrays, targets)
@@ -1,10 +1,72 @@
 import json
 import pymel.core as pm
+from maya import cmds
+from maya.api import OpenMaya
 
 import os
 
 import rigbaukasten
-from rigbaukasten.utils import errorutl, attrutl
+from rigbaukasten.utils import errorutl, attrutl, sceneutl
+
+
+class ShapeLibrary(object):
+    """ All ctl shapes from resources/shapes, parsed once per session.
+
+        Each shape is stored with its CV positions, knots, degree and form, so new curves can be created with a single
+        MFnNurbsCurve.create() call instead of reading the json file and rebuilding a dummy curve for every ctl.
+        Shapes are parsed again if their file was modified, new or removed files are found through the modification
+        time of the shapes folder.
+    """
+    def __init__(self):
+        self.folder = None
+        self.folder_mtime = None
+        self.shapes = {}  # name: (mtime, path, data)
+
+    def clear(self):
+        self.folder = None
+        self.folder_mtime = None
+        self.shapes = {}
+
+    def refresh(self):
+        """ Update the list of shape files if the shapes folder changed. """
+        folder = rigbaukasten.environment.get_resources_path('shapes')
+        folder_mtime = os.path.getmtime(folder)
+        if folder == self.folder and folder_mtime == self.folder_mtime:
+            return
+        shapes = {}
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.endswith('.json'):
+                continue
+            shape = file_name.replace('.json', '')
+            cached = self.shapes.get(shape) if folder == self.folder else None
+            shapes[shape] = cached or (None, os.path.join(folder, file_name), None)
+        self.folder = folder
+        self.folder_mtime = folder_mtime
+        self.shapes = shapes
+
+    def get_available_shapes(self):
+        self.refresh()
+        return list(self.shapes)
+
+    def get(self, shape):
+        """ Get the parsed data of the given shape, see get_ctl_shape_data(), plus its knots and MPoints.
+            Don't modify the returned data, it is shared by all callers.
+        """
+        self.refresh()
+        if shape not in self.shapes:
+            raise errorutl.RbkInvalidName(f'Given ctl_shape "{shape}" is unknown. Use one of {list(self.shapes)}')
+        mtime, path, data = self.shapes[shape]
+        current_mtime = os.path.getmtime(path)
+        if data is None or mtime != current_mtime:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            data['knots'] = get_knots(data['spans'], data['degree'], data['form'])
+            data['points'] = [OpenMaya.MPoint(p) for p in data['positions']]
+            self.shapes[shape] = (current_mtime, path, data)
+        return data
+
+
+SHAPES = ShapeLibrary()
 
 
 class AnimCtl(object):
@@ -40,9 +102,10 @@ class AnimCtl(object):
 
     def create_ctl(self):
         self.trn = create_curve(shape=self.ctl_shape, name=f'{self.side}_{self.module_name}_{self.label}_{self.suffix}')
-        self.shp = self.trn.getShape()
-        self.grp = pm.group(em=True, n=f'{self.side}_{self.module_name}_{self.label}Offset_GRP')
-        self.trn.setParent(self.grp)  # important to create group empty at first, otherwise pivot might be off center
+        self.shp = pm.PyNode(sceneutl.get_shape(self.trn))
+        self.grp = pm.PyNode(sceneutl.create_group(f'{self.side}_{self.module_name}_{self.label}Offset_GRP'))
+        # important to create group empty at first, otherwise pivot might be off center
+        sceneutl.set_parent(self.trn, self.grp)
 
     def add_ctl_shape(self, shape, label, size=None, color=None):
         """ Add another shape node the the CTL.
@@ -60,30 +123,30 @@ class AnimCtl(object):
         shp = tmp.getShape()
         pm.parent(shp, self.trn, r=True, s=True)
         pm.delete(tmp)
-        pm.scale(f'{shp}.cv[*]', size or self.size, size or self.size, size or self.size)
-        shp.overrideEnabled.set(True)
-        shp.overrideColor.set(color or self.color)
+        cmds.scale(size or self.size, size or self.size, size or self.size, f'{shp}.cv[*]')
+        sceneutl.set_attr(f'{shp}.overrideEnabled', True)
+        sceneutl.set_attr(f'{shp}.overrideColor', color or self.color)
         return shp
 
     def place_ctl(self):
         if isinstance(self.pos, (pm.PyNode, str)):
-            pos = pm.xform(self.pos, q=True, ws=True, t=True)
+            pos = sceneutl.get_world_translation(self.pos)
         else:
             pos = self.pos
         if isinstance(self.rot, (pm.PyNode, str)):
-            rot = pm.xform(self.rot, q=True, ws=True, ro=True)
+            rot = sceneutl.get_world_rotation(self.rot)
         else:
             rot = self.rot
-        pm.xform(self.grp, ws=True, t=pos, ro=rot)
+        sceneutl.set_world_transform(self.grp, translation=pos, rotation=rot)
 
-        pm.scale(f'{self.shp}.cv[*]', self.size, self.size, self.size)
+        cmds.scale(self.size, self.size, self.size, f'{self.shp}.cv[*]')
 
     def set_color(self):
-        self.shp.overrideEnabled.set(True)
-        self.shp.overrideColor.set(self.color)
+        sceneutl.set_attr(f'{self.shp}.overrideEnabled', True)
+        sceneutl.set_attr(f'{self.shp}.overrideColor', self.color)
 
     def lock(self):
-        attrutl.lock([self.trn.attr(attr) for attr in self.lock_attrs])
+        attrutl.lock([f'{self.trn}.{attr}' for attr in self.lock_attrs])
 
     def run(self):
         self.create_ctl()
@@ -92,70 +155,83 @@ class AnimCtl(object):
         self.set_color()
 
 
-def get_ctl_shape_data(ctl):
+def _get_curve_shape(ctl):
+    """ Get the name of the nurbsCurve shape for the given AnimCtl, transform or shape. """
     if isinstance(ctl, AnimCtl):
         ctl = ctl.shp
-    elif isinstance(ctl, pm.nt.Transform):
-        ctl = ctl.getShape()
+    return sceneutl.get_shape(ctl)
+
+
+def get_ctl_shape_data(ctl):
+    ctl = _get_curve_shape(ctl)
     reset_plugs = {}
     for deformer in pm.findDeformers(ctl) or []:
-        deformer = pm.PyNode(deformer)
-        reset_plugs[deformer.en] = deformer.en.get()
-        deformer.en.set(0)  # make sure we only read the local point data and not some deformed result (e.g. plumbob)
+        reset_plugs[f'{deformer}.en'] = cmds.getAttr(f'{deformer}.en')
+        # make sure we only read the local point data and not some deformed result (e.g. plumbob)
+        cmds.setAttr(f'{deformer}.en', 0)
+    fn = OpenMaya.MFnNurbsCurve(sceneutl.get_dag_path(ctl))
     data = {
-        'degree': ctl.degree(),
-        'positions': [list(pnt) for pnt in ctl.getCVs()],
-        'spans': ctl.spans.get(),
-        'form': int(ctl.form()),
-        'color': ctl.overrideColor.get() if ctl.overrideEnabled.get() else None
+        'degree': fn.degree,
+        'positions': [[pnt.x, pnt.y, pnt.z] for pnt in fn.cvPositions(OpenMaya.MSpace.kObject)],
+        'spans': fn.numSpans,
+        'form': fn.form,
+        'color': cmds.getAttr(f'{ctl}.overrideColor') if cmds.getAttr(f'{ctl}.overrideEnabled') else None
     }
     for plug, value in reset_plugs.items():
-        plug.set(value)
+        cmds.setAttr(plug, value)
     return data
 
 
 def set_ctl_shape_data(ctl, data):
-    if isinstance(ctl, AnimCtl):
-        ctl = ctl.shp
-    elif isinstance(ctl, pm.nt.Transform):
-        ctl = ctl.getShape()
-    if int(ctl.form()) != data['form']:
-        pm.closeCurve(ctl, ch=False, replaceOriginal=True)
-    pm.rebuildCurve(ctl, spans=data['spans'], degree=data['degree'], ch=False, replaceOriginal=True)
-    ctl.setCVs(data['positions'])
-    ctl.updateCurve()
+    ctl = _get_curve_shape(ctl)
+    if OpenMaya.MFnNurbsCurve(sceneutl.get_dag_path(ctl)).form != data['form']:
+        cmds.closeCurve(ctl, ch=False, replaceOriginal=True)
+    cmds.rebuildCurve(ctl, spans=data['spans'], degree=data['degree'], ch=False, replaceOriginal=True)
+    fn = OpenMaya.MFnNurbsCurve(sceneutl.get_dag_path(ctl))
+    fn.setCVPositions([OpenMaya.MPoint(p) for p in data['positions']], OpenMaya.MSpace.kObject)
+    fn.updateCurve()
     if data.get('color') is not None:
-        ctl.overrideColor.set(data['color'])
+        cmds.setAttr(f'{ctl}.overrideColor', data['color'])
+
+
+def get_knots(spans, degree, form):
+    """ Get the uniform knot vector of a curve with the given spans, degree and MFnNurbsCurve form. """
+    if form == OpenMaya.MFnNurbsCurve.kPeriodic:
+        return [float(k) for k in range(1 - degree, spans + degree)]
+    return [0.0] * (degree - 1) + [float(k) for k in range(spans + 1)] + [float(spans)] * (degree - 1)
 
 
 def set_ctl_shape(ctl, shape):
-    j = get_shape_json(shape)
-    with open(j, 'r') as f:
-        data = json.load(f)
-    set_ctl_shape_data(ctl, data)
+    set_ctl_shape_data(ctl, SHAPES.get(shape))
 
 
 def create_curve(shape, name):
-    crv = pm.curve(n=name, p=((0, 0, 0), (0, 1, 0), (0, 2, 0)), d=1)
-    set_ctl_shape(ctl=crv, shape=shape)
-    return crv
+    """ Create a curve with the given ctl shape, directly from the cached shape data. """
+    data = SHAPES.get(shape)
+    trn = sceneutl.create_node('transform', name)
+    fn = OpenMaya.MFnNurbsCurve()
+    fn.create(
+        data['points'], data['knots'], data['degree'], data['form'], False, False,
+        sceneutl.get_dag_path(trn).node()
+    )
+    fn.setName(f'{trn}Shape')
+    if data.get('color') is not None:
+        cmds.setAttr(f'{fn.name()}.overrideColor', data['color'])
+    return pm.PyNode(trn)
 
 
 def get_available_shapes():
     """ Get a list of all available ctl shapes.
     :return: (list) names of all available ctl shapes
     """
-    shapes_jsons = os.listdir(rigbaukasten.environment.get_resources_path('shapes'))
-    available_shapes = [j.replace('.json', '') for j in shapes_jsons if j.endswith('.json')]
-    return available_shapes
+    return SHAPES.get_available_shapes()
 
 
 def get_shape_json(shape):
-    shape_path = os.path.join(rigbaukasten.environment.get_resources_path('shapes'), f'{shape}.json')
-    if not os.path.exists(shape_path):
-        available = get_available_shapes()
-        raise errorutl.RbkInvalidName(f'Given ctl_shape "{shape}" is unknown. Use one of {available}')
-    return shape_path
+    SHAPES.refresh()
+    if shape not in SHAPES.shapes:
+        raise errorutl.RbkInvalidName(f'Given ctl_shape "{shape}" is unknown. Use one of {list(SHAPES.shapes)}')
+    return SHAPES.shapes[shape][1]
 
 
 def store_selected_curve_shape():
@@ -0,0 +1,152 @@
+import pymel.core as pm
+from maya.api import OpenMaya, OpenMayaAnim
+
+from rigbaukasten.utils import ioutl
+from rigbaukasten.utils.ioutl import np
+
+
+DRIVEN_KEYS_FORMAT = 'rbkDrivenKeys'
+DRIVEN_KEYS_VERSION = 1
+DRIVEN_KEY_TYPES = ('animCurveUA', 'animCurveUL', 'animCurveUU')  # animCurves with unitless input
+
+
+def get_anim_curve_fn(anim_crv):
+    """ Get an OpenMaya MFnAnimCurve for the given animCurve. """
+    sel = OpenMaya.MSelectionList()
+    sel.add(str(anim_crv))
+    return OpenMayaAnim.MFnAnimCurve(sel.getDependNode(0))
+
+
+def get_driven_keys(driven_nodes):
+    """ Get all driven keys (animCurves with a driver connection) that drive the given nodes. """
+    anim_crvs = []
+    for d in driven_nodes:
+        for anim_crv in pm.listConnections(d, s=True, d=False, type='animCurve'):
+            if anim_crv not in anim_crvs and pm.listConnections(f'{anim_crv}.i', s=True, d=False):
+                anim_crvs.append(anim_crv)
+    return anim_crvs
+
+
+def get_driven_keys_data(anim_crvs):
+    """ Get the keys of the given driven keys as numpy arrays, using MFnAnimCurve instead of exporting the curves.
+        :param anim_crvs: [PyNode, ] - animCurves with unitless input
+        :return: (header, arrays) - header is a json serializable dict with one entry per curve (name, type, driver,
+                 driven plugs, infinity, weighted, key_count), arrays contains the inputs, values, tangent types and
+                 tangent angles/weights of all keys, concatenated in curve order. Values and angles are internal units.
+    """
+    curves = []
+    inputs, values, tangent_types, tangent_angles, tangent_weights = [], [], [], [], []
+    for anim_crv in anim_crvs:
+        fn = get_anim_curve_fn(anim_crv)
+        driver = pm.listConnections(f'{anim_crv}.i', p=True, s=True, d=False, scn=True)
+        curves.append({
+            'name': anim_crv.name(),
+            'type': pm.objectType(anim_crv),
+            'driver': driver[0].name() if driver else None,
+            'driven': [p.name() for p in pm.listConnections(f'{anim_crv}.o', p=True, s=False, d=True, scn=True)],
+            'pre_infinity': fn.preInfinityType,
+            'post_infinity': fn.postInfinityType,
+            'weighted': fn.isWeighted,
+            'key_count': fn.numKeys,
+        })
+        for i in range(fn.numKeys):
+            inputs.append(fn.input(i))
+            values.append(fn.value(i))
+            tangent_types.append((fn.inTangentType(i), fn.outTangentType(i)))
+            in_angle, in_weight = fn.getTangentAngleWeight(i, True)
+            out_angle, out_weight = fn.getTangentAngleWeight(i, False)
+            tangent_angles.append((in_angle.asRadians(), out_angle.asRadians()))
+            tangent_weights.append((in_weight, out_weight))
+    header = {
+        'format': DRIVEN_KEYS_FORMAT,
+        'version': DRIVEN_KEYS_VERSION,
+        'curves': curves,
+    }
+    arrays = {
+        'inputs': np.array(inputs, dtype=np.float64),
+        'values': np.array(values, dtype=np.float64),
+        'tangent_types': np.array(tangent_types, dtype=np.int32).reshape(-1, 2),
+        'tangent_angles': np.array(tangent_angles, dtype=np.float64).reshape(-1, 2),
+        'tangent_weights': np.array(tangent_weights, dtype=np.float64).reshape(-1, 2),
+    }
+    header['checksum'] = ioutl.arrays_checksum(arrays)
+    return header, arrays
+
+
+def find_driven_key(curve_data):
+    """ Find the existing driven key for the given curve data, by name or else by the curve on the driven plugs.
+        :return: PyNode or None
+    """
+    candidates = [curve_data['name']]
+    for plug in curve_data['driven']:
+        if pm.objExists(plug):
+            candidates += pm.listConnections(plug, s=True, d=False, type='animCurve', scn=True)
+    for candidate in candidates:
+        if not pm.objExists(candidate):
+            continue
+        anim_crv = pm.PyNode(candidate)
+        if pm.objectType(anim_crv) in DRIVEN_KEY_TYPES and pm.listConnections(f'{anim_crv}.i', s=True, d=False):
+            return anim_crv
+    return None
+
+
+def set_driven_key_data(anim_crv, curve_data, keys):
+    """ Replace the keys of the given animCurve in place.
+        :param anim_crv: PyNode - existing driven key, its connections are kept
+        :param curve_data: dict - curve entry from the header of get_driven_keys_data()
+        :param keys: dict - the arrays of get_driven_keys_data(), sliced to the keys of this curve
+    """
+    fn = get_anim_curve_fn(anim_crv)
+    for i in reversed(range(fn.numKeys)):
+        fn.remove(i)
+    fn.setIsWeighted(curve_data['weighted'])
+    fn.setPreInfinityType(curve_data['pre_infinity'])
+    fn.setPostInfinityType(curve_data['post_infinity'])
+    for key_input, value, (in_type, out_type) in zip(keys['inputs'], keys['values'], keys['tangent_types']):
+        fn.addKey(float(key_input), float(value), int(in_type), int(out_type))
+    for i, (in_type, out_type) in enumerate(keys['tangent_types']):
+        # fixed tangents keep their angle and weight, all other types are computed by maya
+        for is_in, tangent_type in ((True, in_type), (False, out_type)):
+            if tangent_type == OpenMayaAnim.MFnAnimCurve.kTangentFixed or curve_data['weighted']:
+                column = 0 if is_in else 1
+                fn.setTangent(
+                    i,
+                    OpenMaya.MAngle(float(keys['tangent_angles'][i][column])),
+                    float(keys['tangent_weights'][i][column]),
+                    is_in
+                )
+
+
+def set_driven_keys_data(header, arrays):
+    """ Set the keys from get_driven_keys_data() on the existing driven keys in the scene.
+        Curves without a matching driven key in the scene are skipped with a warning.
+        :return: [PyNode, ] - the updated animCurves
+    """
+    updated = []
+    start = 0
+    for curve_data in header['curves']:
+        end = start + curve_data['key_count']
+        keys = {k: v[start:end] for k, v in arrays.items()}
+        start = end
+        anim_crv = find_driven_key(curve_data)
+        if anim_crv is None:
+            pm.warning(f'No matching driven key in current scene, skipping: {curve_data["name"]}')
+            continue
+        if pm.objectType(anim_crv) != curve_data['type']:
+            pm.warning(f'Driven key {anim_crv} is not an {curve_data["type"]} anymore, skipping.')
+            continue
+        set_driven_key_data(anim_crv, curve_data, keys)
+        updated.append(anim_crv)
+    return updated
+
+
+def load_driven_keys_file(path, data=None):
+    """ Update the existing driven keys from a file that was written with get_driven_keys_data().
+        :param path: str - the .npz file
+        :param data: (header, arrays) - the already parsed file, e.g. from iocor.CACHE
+        :return: [PyNode, ] - the updated animCurves
+    """
+    header, arrays = data or ioutl.read_npz(path)
+    if header.get('checksum') and header['checksum'] != ioutl.arrays_checksum(arrays):
+        pm.warning(f'Checksum mismatch, driven keys file might be corrupted: {path}')
+    return set_driven_keys_data(header, arrays)
@@ -1,38 +1,38 @@
 from collections import namedtuple
 
 import pymel.core as pm
+from maya import cmds
 
-from rigbaukasten.utils import errorutl, mathutl, attrutl
+from rigbaukasten.utils import errorutl, mathutl, attrutl, sceneutl
 
 
 def create_guide(side, module_name, label, size, parent=None, lock_attrs='sv'):
-    gde = pm.spaceLocator(n=f'{side}_{module_name}_{label}_GDE')
-    gde.localScale.set(size, size, size)
-    gde.overrideEnabled.set(True)
-    gde.overrideColor.set({'C': 17, 'L': 6, 'R': 13}[side])
+    gde = cmds.spaceLocator(n=f'{side}_{module_name}_{label}_GDE')[0]
+    sceneutl.set_attr(f'{gde}.localScale', size, size, size)
+    sceneutl.set_attr(f'{gde}.overrideEnabled', True)
+    sceneutl.set_attr(f'{gde}.overrideColor', {'C': 17, 'L': 6, 'R': 13}[side])
     for attr in lock_attrs:
-        gde.attr(attr).set(lock=True)
+        sceneutl.set_flags(f'{gde}.{attr}', lock=True)
     if parent:
-        gde.setParent(parent)
-    return gde
+        gde = sceneutl.set_parent(gde, parent)
+    return pm.PyNode(gde)
 
 
 def get_guide_data(gde):
     """ Get the transform & user data from the given guide for rig data publish. """
     data = {
-        'translate': list(gde.getTranslation('world')),
-        'rotate': list(gde.getRotation('world')),
-        'scale': list(gde.scale.get()),
-        'localScale': list(gde.localScale.get()),
-        'userAttrs': {attr: gde.attr(attr).get() for attr in pm.listAttr(gde, ud=True)}
+        'translate': sceneutl.get_world_translation(gde),
+        'rotate': sceneutl.get_world_rotation(gde),
+        'scale': list(sceneutl.get_attr(f'{gde}.scale')),
+        'localScale': list(sceneutl.get_attr(f'{gde}.localScale')),
+        'userAttrs': {attr: sceneutl.get_attr(f'{gde}.{attr}') for attr in cmds.listAttr(str(gde), ud=True) or []}
     }
     return data
 
 
 def set_guide_data(gde, data):
     """ Apply the data from a previous rig data publish to the given guide """
-    gde.setTranslation(data['translate'], 'world')
-    gde.setRotation(data['rotate'], 'world')
+    sceneutl.set_world_transform(gde, translation=data['translate'], rotation=data['rotate'])
     for i, ax in enumerate('XYZ'):
         for attr in ('scale', 'localScale'):
             attrutl.safe_set(gde.attr(attr + ax), data[attr][i])
@@ -91,13 +91,13 @@ def create_oriented_guide_chain(
     guides, joints = [], []
     for label, pos in zip(labels, positions):
         gde = create_guide(side=side, module_name=module_name, label=label, size=size, parent=grp)
-        gde.attr('localScale' + mathutl.axis_from_vector(aim, 1)).set(size * 0.1)
-        pm.xform(gde, ws=True, t=pos)
-        jnt = pm.createNode('joint', n=f'{side}_{module_name}_{label}_JNT')
-        jnt.displayLocalAxis.set(True)
+        sceneutl.set_attr(f'{gde}.localScale{mathutl.axis_from_vector(aim, 1)}', size * 0.1)
+        sceneutl.set_world_transform(gde, translation=pos)
+        jnt = pm.PyNode(sceneutl.create_node('joint', f'{side}_{module_name}_{label}_JNT'))
+        sceneutl.set_attr(f'{jnt}.displayLocalAxis', True)
         pm.pointConstraint(gde, jnt)
         if joints:
-            jnt.setParent(joints[-1])
+            sceneutl.set_parent(jnt, joints[-1])
             if world_up_type == WORLD_AXIS:
                 pm.aimConstraint(gde, joints[-1], aim=aim, u=up, wu=world_up, wut='vector')
             elif world_up_type == ROOT_GUIDE:
@@ -175,12 +175,12 @@ def create_limb_guide_chain(
     guides, joints = [], []
     for label, pos in zip(labels, positions):
         gde = create_guide(side=side, module_name=module_name, label=label, size=size, parent=grp)
-        pm.xform(gde, ws=True, t=pos)
-        jnt = pm.createNode('joint', n=f'{side}_{module_name}_{label}_JNT')
-        jnt.displayLocalAxis.set(True)
+        sceneutl.set_world_transform(gde, translation=pos)
+        jnt = pm.PyNode(sceneutl.create_node('joint', f'{side}_{module_name}_{label}_JNT'))
+        sceneutl.set_attr(f'{jnt}.displayLocalAxis', True)
         pm.pointConstraint(gde, jnt)
         if joints:
-            jnt.setParent(joints[-1])
+            sceneutl.set_parent(jnt, joints[-1])
         guides.append(gde)
         joints.append(jnt)
 
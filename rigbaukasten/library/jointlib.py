@@ -1,5 +1,5 @@
 import pymel.core as pm
-from rigbaukasten.utils import connectutl, attrutl, mathutl
+from rigbaukasten.utils import connectutl, constraintutl, attrutl, mathutl, sceneutl
 
 
 def fk_ik_joints(joints, fk_ik_plug, names=('Fk', 'Ik'), constraint=True):
@@ -12,19 +12,17 @@ def fk_ik_joints(joints, fk_ik_plug, names=('Fk', 'Ik'), constraint=True):
     for j in joints:
         for i, lst in enumerate((fk_joints, ik_joints)):
             dup = pm.duplicate(j, n=j.replace('_JNT', f'{names[i]}_JNT'), po=True)[0]
-            dup.radius.set(dup.radius.get() * 0.5)
+            sceneutl.set_attr(f'{dup}.radius', sceneutl.get_attr(f'{dup}.radius') * 0.5)
             if lst:
-                dup.setParent(lst[-1])
+                sceneutl.set_parent(dup, lst[-1])
             lst.append(dup)
         if constraint:
-            pac = pm.parentConstraint(fk_joints[-1], ik_joints[-1], j)
-            plugs = pm.parentConstraint(pac, q=1, wal=1)
-            fk_ik_plug >> plugs[1]
-            rvs.outputX >> plugs[0]
-            scc = pm.scaleConstraint(fk_joints[-1], ik_joints[-1], j)
-            plugs = pm.scaleConstraint(scc, q=1, wal=1)
-            fk_ik_plug >> plugs[1]
-            rvs.outputX >> plugs[0]
+            constraintutl.parent_constraint(
+                [fk_joints[-1], ik_joints[-1]],
+                j,
+                mo=False,
+                weights=[rvs.outputX, fk_ik_plug]
+            )
         else:
             bm = connectutl.create_node(
                 'blendMatrix',
@@ -54,11 +52,11 @@ def duplicate_joint_chain(joint_chain, root_parent=None, search='_JNT', replace=
     for i, jnt in enumerate(joint_chain):
         new = pm.duplicate(jnt, po=True, n=jnt.replace(search, replace))[0]
         new_chain.append(new)
-        new.radius.set(new.radius.get() * 1.5)
+        sceneutl.set_attr(f'{new}.radius', sceneutl.get_attr(f'{new}.radius') * 1.5)
         if i == 0 and root_parent:
-            new.setParent(root_parent)
+            sceneutl.set_parent(new, root_parent)
         if i:
-            new.setParent(new_chain[-1])
+            sceneutl.set_parent(new, new_chain[-1])
     return new_chain
 
 
@@ -71,7 +69,7 @@ def driven_joint(name, parent, **attr_keys):
                       tx={'driver': driver_jnt.rx, 'dv': (0, 90), 'v': (0, -10)}
     :return: the joint
     """
-    jnt = pm.createNode('joint', n=name, p=parent, ss=True)
+    jnt = pm.PyNode(sceneutl.create_node('joint', name, parent))
     for attr, settings in attr_keys.items():
         connectutl.driven_keys(driven=jnt.attr(attr), **settings)
     return jnt
@@ -129,7 +127,7 @@ def motion_path_joints_uniform(
             n=f'{name}NormalizedUpVector{i}_VEC'
         )
 
-        jnt = pm.createNode('joint', name=f'{name}{i:02d}')
+        jnt = pm.PyNode(sceneutl.create_node('joint', f'{name}{i:02d}'))
         jnts.append(jnt)
         mop = connectutl.create_node(
             'motionPath',
@@ -152,7 +150,7 @@ def motion_path_joints_uniform(
             dv=(0, 1),
             v=('XYZ'.index(up_axis[-1]), 'XYZ'.index(side_axis))
         )
-        jnt.displayLocalAxis.set(True)
+        sceneutl.set_attr(f'{jnt}.displayLocalAxis', True)
 
     stretch_plug = attrutl.add(attrs_holder or start_ctl, 'stretch', mn=0, mx=1, default=1)
     anchor_plug = attrutl.add(attrs_holder or start_ctl, 'anchor', mn=0, mx=1)
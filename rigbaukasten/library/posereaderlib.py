@@ -1,6 +1,36 @@
 import pymel.core as pm
 
-from rigbaukasten.utils import attrutl, errorutl
+from rigbaukasten.utils import attrutl, connectutl, errorutl
+
+
+def _axis_reader_template():
+    """ See axis_reader(), the output Y is kept inbetween -180 and 180. """
+    tmp = connectutl.NetworkTemplate('axisReader')
+    tmp.add_node('multMatrix', '_MMX', matrixIn__0___='$matrix', matrixIn__1___='$reference_inverse_matrix')
+    tmp.add_node('decomposeMatrix', '_DCM', inputMatrix='_MMX.matrixSum')
+    for ax in 'XYZ':
+        tmp.add_node(
+            'quatToEuler',
+            f'{ax}_QTE',
+            **{f'inputQuat{ax}': f'_DCM.outputQuat{ax}', 'inputQuatW': '_DCM.outputQuatW'}
+        )
+    tmp.add_node('addDoubleLinear', 'ClampTo180_ADL', i1='Y_QTE.outputRotateY', i2=-360)
+    tmp.add_node(
+        'condition',
+        'ClampTo180_CND',
+        operation=2,
+        firstTerm='Y_QTE.outputRotateY',
+        secondTerm=180,
+        colorIfFalseR='Y_QTE.outputRotateY',
+        colorIfTrueR='ClampTo180_ADL.o'
+    )
+    tmp.add_output('X', 'X_QTE.outputRotateX')
+    tmp.add_output('Y', 'ClampTo180_CND.outColorR')
+    tmp.add_output('Z', 'Z_QTE.outputRotateZ')
+    return tmp
+
+
+AXIS_READER_TEMPLATE = _axis_reader_template()
 
 
 def axis_reader(read_trn, reference_trn, module_key, label, buffer=True):
@@ -20,37 +50,20 @@ def axis_reader(read_trn, reference_trn, module_key, label, buffer=True):
     if hasattr(read_trn, attr_name + 'X'):
         return [read_trn.attr(attr_name + xyz) for xyz in 'XYZ']
 
-    mmx = pm.createNode('multMatrix', n=f'{module_key}_{label}_MMX')
-    read_trn.wm[0] >> mmx.matrixIn[0]
     if buffer:
         buffer_trn = pm.group(em=True, p=reference_trn, n=f'{module_key}_{label}Buffer_TRN')
         pm.delete(pm.parentConstraint(read_trn, buffer_trn))
-        buffer_trn.wim[0] >> mmx.matrixIn[1]
+        reference_inverse_matrix = buffer_trn.wim[0]
     else:
-        reference_trn.wim[0] >> mmx.matrixIn[1]
-
-    dcm = pm.createNode('decomposeMatrix', n=f'{module_key}_{label}_DCM')
-    mmx.matrixSum >> dcm.inputMatrix
+        reference_inverse_matrix = reference_trn.wim[0]
 
+    outputs = AXIS_READER_TEMPLATE.instantiate(
+        prefix=f'{module_key}_{label}',
+        inputs={'matrix': read_trn.wm[0], 'reference_inverse_matrix': reference_inverse_matrix}
+    )
     output_plugs = []
     for ax in 'XYZ':
-        qte = pm.createNode('quatToEuler', n=f'{module_key}_{label}{ax}_QTE')
-        dcm.attr(f'outputQuat{ax}') >> qte.attr(f'inputQuat{ax}')
-        dcm.outputQuatW >> qte.inputQuatW
-        if ax == 'Y':
-            # keep outputs inbetween -180 and 180
-            adl = pm.createNode('addDoubleLinear', n=f'{module_key}_{label}ClampTo180_ADL')
-            qte.outputRotateY >> adl.i1
-            adl.i2.set(-360)
-            cnd = pm.createNode('condition', n=f'{module_key}_{label}ClampTo180_CND')
-            cnd.operation.set(2)
-            qte.outputRotateY >> cnd.firstTerm
-            cnd.secondTerm.set(180)
-            qte.outputRotateY >> cnd.colorIfFalseR
-            adl.o >> cnd.colorIfTrueR
-            pm.addAttr(read_trn, ln=f'{attr_name}{ax}', pxy=cnd.outColorR)
-        else:
-            pm.addAttr(read_trn, ln=f'{attr_name}{ax}', pxy=qte.attr(f'outputRotate{ax}'))
+        pm.addAttr(read_trn, ln=f'{attr_name}{ax}', pxy=outputs[ax])
         output_plugs.append(read_trn.attr(f'{attr_name}{ax}'))
 
     return output_plugs
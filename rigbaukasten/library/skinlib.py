@@ -1,10 +1,18 @@
 
+import json
 import os
 
 import pymel.core as pm
+from maya.api import OpenMaya, OpenMayaAnim
 
 import rigbaukasten
-from rigbaukasten.utils import errorutl, pymelutl
+from rigbaukasten.utils import errorutl, ioutl, pymelutl
+from rigbaukasten.utils.ioutl import np
+
+
+SKIN_WEIGHTS_FORMAT = 'rbkSkinWeights'
+SKIN_WEIGHTS_VERSION = 1
+SKIN_WEIGHTS_TOLERANCE = 0.0001  # same as the weightTolerance used for the json export
 
 
 def create_skin(side, module_name, joints, geo):
@@ -37,6 +45,36 @@ def get_joint_names_from_skin_data(data):
     return joint_names
 
 
+def get_header_from_skin_data(data):
+    """ Get shape, deformer and joint names from data that was previously exported via pm.deformerWeights, in a
+        single pass over the weights.
+    """
+    shapes, deformers, joint_names = set(), set(), set()
+    for x in data['deformerWeight']['weights']:
+        shapes.add(x['shape'])
+        deformers.add(x['deformer'])
+        joint_names.add(x['source'])
+    if len(shapes) > 1:
+        pm.warning('More than one shape in skinWeights file, not sure what to do here. Only using first.')
+    if len(deformers) > 1:
+        pm.warning('More than one deformers in skinWeights file, not sure what to do here. Only using first.')
+    return {'shape': list(shapes)[0], 'deformer': list(deformers)[0], 'influences': list(joint_names)}
+
+
+def get_header_from_skin_file(path, skn):
+    """ Create the header for a file that was just exported via pm.deformerWeights (see ioutl.write_header).
+        :param path: str - the exported file
+        :param skn: PyNode - the exported skinCluster
+    """
+    with open(path, 'r') as f:
+        header = get_header_from_skin_data(json.load(f))
+    geo = skn.getGeometry()[0]
+    header['format'] = 'deformerWeights'
+    header['vertex_count'] = geo.numVertices() if isinstance(geo, pm.nt.Mesh) else None
+    header['checksum'] = ioutl.file_checksum(path)
+    return header
+
+
 def get_path_from_skin_data(data):
     """ Get the file path from the skin data that was previously exported via pm.deformerWeights.
 
@@ -87,22 +125,33 @@ def ensure_skin_cluster_is_connected_to_all_joints(skn, joints):
             skn.addInfluence(jnt)
 
 
-def create_skin_from_data(data):
-    geo = get_geo_name_from_skin_data(data)
-    deformer_name = get_deformer_name_from_skin_data(data)
-    joint_names = get_joint_names_from_skin_data(data)
-    path = get_path_from_skin_data(data)
-
-    if pm.objExists(geo):
-        geo = pm.PyNode(geo)
+def create_skin_from_header(header):
+    """ Create (or get) the skinCluster that is described by the given rig data header, with all its influences.
+        :param header: dict - with shape, deformer and influences (see get_header_from_skin_data)
+        :return: PyNode - the skinCluster, without weights loaded
+    """
+    if pm.objExists(header['shape']):
+        geo = pm.PyNode(header['shape'])
     else:
-        raise errorutl.RbkNotFound(f'Geometry "{geo}" does not exist.')
+        raise errorutl.RbkNotFound(f'Geometry "{header["shape"]}" does not exist.')
 
-    joints = ensure_all_joints_exist(joint_names)
-    skn = ensure_skin_cluster_exists(deformer_name, geo, joints)
+    joints = ensure_all_joints_exist(header['influences'])
+    skn = ensure_skin_cluster_exists(header['deformer'], geo, joints)
     ensure_skin_cluster_is_connected_to_all_joints(skn, joints)
+    return skn
+
 
+def create_skin_from_data(data):
+    skn = create_skin_from_header(get_header_from_skin_data(data))
+    apply_weights_from_file(get_path_from_skin_data(data), skn)
+    return skn
+
+
+def create_skin_from_json_file(path, header):
+    """ Create the skinCluster from a deformerWeights file using its header, without parsing the file in python. """
+    skn = create_skin_from_header(header)
     apply_weights_from_file(path, skn)
+    return skn
 
 
 def apply_weights_from_file(path, skn):
@@ -124,6 +173,124 @@ def apply_weights_from_file(path, skn):
     skn.forceNormalizeWeights()
 
 
+def get_skin_fn(skn):
+    """ Get an OpenMaya MFnSkinCluster for the given skinCluster. """
+    sel = OpenMaya.MSelectionList()
+    sel.add(str(skn))
+    return OpenMayaAnim.MFnSkinCluster(sel.getDependNode(0))
+
+
+def get_all_vertices(vertex_count):
+    """ Get a component that contains all vertices of a mesh with the given vertex count. """
+    comp_fn = OpenMaya.MFnSingleIndexedComponent()
+    components = comp_fn.create(OpenMaya.MFn.kMeshVertComponent)
+    comp_fn.setCompleteData(vertex_count)
+    return components
+
+
+def get_skin_weights(skn, tolerance=SKIN_WEIGHTS_TOLERANCE):
+    """ Get the weights of the given skinCluster as sparse numpy arrays, using one API call per influence.
+        Only the points each influence affects are converted to python, not the dense vertex x influence matrix.
+        :param skn: PyNode - skinCluster on a mesh
+        :param tolerance: float - weights below this value are not stored
+        :return: (header, arrays) - header is a json serializable dict with shape, deformer, influences and
+                 vertex_count, arrays contains the vertex_ids, influence_ids and weights of all non-zero weights.
+    """
+    fn = get_skin_fn(skn)
+    geo_path = fn.getPathAtIndex(0)
+    if not geo_path.hasFn(OpenMaya.MFn.kMesh):
+        raise errorutl.RbkInvalidObjectError(f'Binary skin weights only work for meshes: {geo_path}')
+    vertex_count = OpenMaya.MFnMesh(geo_path).numVertices
+    vertex_ids, influence_ids, weights = [], [], []
+    for i, influence in enumerate(fn.influenceObjects()):
+        points, values = fn.getPointsAffectedByInfluence(influence)
+        if not points.length():
+            continue
+        ids = OpenMaya.MFnSingleIndexedComponent(points.getComponent(0)[1]).getElements()
+        vertex_ids.append(np.array(ids, dtype=np.int32))
+        influence_ids.append(np.full(len(ids), i, dtype=np.int32))
+        weights.append(np.array(values, dtype=np.float32))
+    vertex_ids = np.concatenate(vertex_ids) if vertex_ids else np.zeros(0, dtype=np.int32)
+    influence_ids = np.concatenate(influence_ids) if influence_ids else np.zeros(0, dtype=np.int32)
+    weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32)
+    keep = weights > tolerance
+    order = np.lexsort((influence_ids[keep], vertex_ids[keep]))  # vertex major, like the dense matrix
+    header = {
+        'format': SKIN_WEIGHTS_FORMAT,
+        'version': SKIN_WEIGHTS_VERSION,
+        'shape': geo_path.partialPathName(),
+        'deformer': skn.name(),
+        'influences': [p.partialPathName() for p in fn.influenceObjects()],
+        'vertex_count': vertex_count,
+    }
+    arrays = {
+        'vertex_ids': vertex_ids[keep][order],
+        'influence_ids': influence_ids[keep][order],
+        'weights': weights[keep][order],
+    }
+    header['checksum'] = ioutl.arrays_checksum(arrays)
+    return header, arrays
+
+
+def set_skin_weights(skn, header, arrays):
+    """ Set the weights from get_skin_weights() on the given skinCluster. All weights are cleared with one API call,
+        then the stored weights are set per influence, so only the non-zero weights are converted from numpy.
+        :param skn: PyNode - skinCluster, all influences from the header must already be connected
+        :param header: dict - header from get_skin_weights()
+        :param arrays: dict - arrays from get_skin_weights(), the weights are normalized per vertex
+    """
+    fn = get_skin_fn(skn)
+    geo_path = fn.getPathAtIndex(0)
+    vertex_count = OpenMaya.MFnMesh(geo_path).numVertices
+    if vertex_count != header['vertex_count']:
+        raise errorutl.RbkValueError(
+            f'Vertex count of {geo_path} changed, cannot load skin weights ({vertex_count} != {header["vertex_count"]})'
+        )
+    current = [p.partialPathName().split('|')[-1] for p in fn.influenceObjects()]
+    missing = [name for name in header['influences'] if name.split('|')[-1] not in current]
+    if missing:
+        raise errorutl.RbkNotFound(f'Influences of the skin weights are not connected to {skn}: {missing}')
+    columns = [current.index(name.split('|')[-1]) for name in header['influences']]
+    # weights below the tolerance are not stored, so the remaining ones are normalized per vertex again
+    weights = arrays['weights'].astype(np.float64)
+    sums = np.bincount(arrays['vertex_ids'], weights=weights, minlength=vertex_count)
+    weights /= np.where(sums > 0, sums, 1.0)[arrays['vertex_ids']]
+    fn.setWeights(
+        geo_path,
+        get_all_vertices(vertex_count),
+        OpenMaya.MIntArray(list(range(len(current)))),
+        OpenMaya.MDoubleArray(vertex_count * len(current), 0.0),
+        normalize=False
+    )
+    for i, column in enumerate(columns):
+        mask = arrays['influence_ids'] == i
+        if not mask.any():
+            continue
+        comp_fn = OpenMaya.MFnSingleIndexedComponent()
+        components = comp_fn.create(OpenMaya.MFn.kMeshVertComponent)
+        comp_fn.addElements(arrays['vertex_ids'][mask].tolist())
+        fn.setWeights(
+            geo_path,
+            components,
+            OpenMaya.MIntArray([column]),
+            OpenMaya.MDoubleArray(weights[mask].tolist()),
+            normalize=False
+        )
+
+
+def create_skin_from_weights_file(path, data=None):
+    """ Create (or update) the skinCluster from a binary weights file that was written with get_skin_weights().
+        :param path: str - the .npz file
+        :param data: (header, arrays) - the already parsed file, e.g. from iocor.CACHE
+    """
+    header, arrays = data or ioutl.read_npz(path)
+    if header.get('checksum') and header['checksum'] != ioutl.arrays_checksum(arrays):
+        pm.warning(f'Checksum mismatch, skin weights file might be corrupted: {path}')
+    skn = create_skin_from_header(header)
+    set_skin_weights(skn, header, arrays)
+    return skn
+
+
 def get_skin(obj):
     """ Get the skinCluster on the given mesh. """
     skn = pm.listHistory(obj, type='skinCluster')
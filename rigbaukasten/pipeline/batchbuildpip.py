@@ -0,0 +1,191 @@
+""" Build many rigs at once in parallel mayapy processes.
+
+    Usage:
+        mayapy -m rigbaukasten.pipeline.batchbuildpip --project /path/to/project character/hero character/villain
+            --mayapy /usr/autodesk/maya2023/bin/mayapy --workers 4
+
+    Each asset is given as <asset_type>/<asset_name>, optionally followed by :<build file> if the rig build does not
+    use the default <asset_name>.<asset_name>_build module. Every asset is built in its own mayapy process with its
+    own rigbaukasten environment. The resulting rig is saved to --output-dir (default: the batch build cache of the
+    asset), the log of each build is written next to it and a summary of all builds is printed and saved as json.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+DEFAULT_MAYAPY = 'mayapy'
+
+
+class BatchJob(object):
+    """ A single asset to build in a worker process. """
+    def __init__(self, asset, project_path, output_dir=None):
+        """
+        :param asset: str - <asset_type>/<asset_name>[:<build file>], e.g. 'character/hero'
+        :param project_path: str - the rigbaukasten project folder
+        :param output_dir: str - where to save the rig and log, default is the assets batch build cache
+        """
+        self.asset = asset
+        asset_path, _, build_file = asset.partition(':')
+        self.asset_type, self.asset_name = asset_path.replace('\\', '/').split('/')
+        self.build_file = build_file or f'{self.asset_name}.{self.asset_name}_build'
+        self.project_path = project_path
+        self.output_dir = output_dir or os.path.join(
+            project_path, self.asset_type, self.asset_name, 'rigcache', 'batch'
+        )
+
+    @property
+    def rig_path(self):
+        return os.path.join(self.output_dir, f'{self.asset_name}_rig.ma')
+
+    @property
+    def log_path(self):
+        return os.path.join(self.output_dir, f'{self.asset_name}_batchBuild.log')
+
+    @property
+    def result_path(self):
+        return os.path.join(self.output_dir, f'{self.asset_name}_batchBuild.json')
+
+
+def run_job(job, mayapy=DEFAULT_MAYAPY, stop_after_step='finalize', timeout=None):
+    """ Build the given job in a new mayapy process and wait for it.
+        :return: dict - the result of the build (status, duration, error, paths)
+    """
+    if not os.path.exists(job.output_dir):
+        os.makedirs(job.output_dir)
+    if os.path.exists(job.result_path):
+        os.remove(job.result_path)
+    cmd = [
+        mayapy, '-m', 'rigbaukasten.pipeline.batchbuildpip', '--worker',
+        '--project', job.project_path,
+        '--stop-after', stop_after_step,
+        '--output-dir', job.output_dir,
+        job.asset,
+    ]
+    start = time.perf_counter()
+    result = {'asset': job.asset, 'status': 'failed', 'error': None, 'rig_path': None, 'log_path': job.log_path}
+    with open(job.log_path, 'w') as log:
+        try:
+            process = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            result['error'] = f'Timed out after {timeout}s'
+        except OSError as e:
+            result['error'] = f'Cannot start {mayapy}: {e}'
+        else:
+            if os.path.exists(job.result_path):
+                with open(job.result_path, 'r') as f:
+                    result.update(json.load(f))
+            else:
+                result['error'] = f'Worker exited with code {process.returncode} without a result, see log.'
+    result['duration'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(assets, project_path, workers=2, mayapy=DEFAULT_MAYAPY, stop_after_step='finalize', output_dir=None,
+              timeout=None, summary_path=None):
+    """ Build all given assets with a pool of mayapy worker processes.
+        :param assets: [str, ] - <asset_type>/<asset_name>[:<build file>]
+        :param project_path: str - the rigbaukasten project folder
+        :param workers: int - number of builds running at the same time
+        :param mayapy: str - path to the mayapy executable
+        :param stop_after_step: str - build step to stop after
+        :param output_dir: str - save all rigs and logs to this folder instead of each assets batch build cache
+        :param timeout: float - max seconds per build
+        :param summary_path: str - where to write the json summary, default is batchBuild_<time>.json in the
+                                   current folder
+        :return: [dict, ] - the results of all builds
+    """
+    jobs = [BatchJob(asset, project_path, output_dir) for asset in assets]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda j: run_job(j, mayapy, stop_after_step, timeout), jobs))
+
+    summary_path = summary_path or os.path.join(os.getcwd(), f'batchBuild_{time.strftime("%Y%m%d_%H%M%S")}.json')
+    with open(summary_path, 'w') as f:
+        json.dump(results, f, indent=4)
+    print_summary(results)
+    print(f'Summary written to {summary_path}')
+    return results
+
+
+def print_summary(results):
+    print(f'{"asset":<40}{"status":<10}{"seconds":>10}  error')
+    for result in results:
+        error = (result['error'] or '').splitlines()[-1] if result['error'] else ''
+        print(f'{result["asset"]:<40}{result["status"]:<10}{result["duration"]:>10.1f}  {error}')
+    failed = [r for r in results if r['status'] != 'success']
+    print(f'{len(results) - len(failed)} of {len(results)} rigs built successfully.')
+
+
+def build_in_worker(job, stop_after_step='finalize'):
+    """ Build a single rig inside this (mayapy) process and write the result json for the parent process. """
+    result = {'status': 'failed', 'error': None, 'rig_path': None}
+    start = time.perf_counter()
+    try:
+        import maya.standalone
+        try:
+            maya.standalone.initialize(name='python')
+        except RuntimeError:
+            pass  # already initialized
+
+        # Only load the rig building code in the workers, the parent process just starts them.
+        import pymel.core as pm
+        import rigbaukasten
+        from rigbaukasten.core import modulecor
+
+        rigbaukasten.environment.set(
+            project_path=job.project_path,
+            asset_type=job.asset_type,
+            asset_name=job.asset_name
+        )
+        rigbaukasten.environment.get_rig_builds_path()  # adds the project scripts to sys.path
+        modulecor.build_rig(file=job.build_file, stop_after_step=stop_after_step, force_rebuild=True)
+        pm.saveAs(job.rig_path, type='mayaAscii', force=True)
+        result['status'] = 'success'
+        result['rig_path'] = job.rig_path
+    except Exception:
+        traceback.print_exc()
+        result['error'] = traceback.format_exc()
+    result['build_duration'] = time.perf_counter() - start
+    with open(job.result_path, 'w') as f:
+        json.dump(result, f, indent=4)
+    return result
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Build rigbaukasten rigs in parallel mayapy processes.')
+    parser.add_argument('assets', nargs='+', help='<asset_type>/<asset_name>[:<build file>]')
+    parser.add_argument('--project', required=True, help='rigbaukasten project folder')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--mayapy', default=os.environ.get('MAYAPY', DEFAULT_MAYAPY))
+    parser.add_argument('--stop-after', default='finalize', help='build step to stop after')
+    parser.add_argument('--output-dir', default=None, help='folder for the rigs and logs')
+    parser.add_argument('--timeout', type=float, default=None, help='max seconds per build')
+    parser.add_argument('--summary', default=None, help='path of the json summary')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parsed = parser.parse_args(args)
+
+    if parsed.worker:
+        job = BatchJob(parsed.assets[0], parsed.project, parsed.output_dir)
+        result = build_in_worker(job, stop_after_step=parsed.stop_after)
+        return 0 if result['status'] == 'success' else 1
+
+    results = run_batch(
+        parsed.assets,
+        parsed.project,
+        workers=parsed.workers,
+        mayapy=parsed.mayapy,
+        stop_after_step=parsed.stop_after,
+        output_dir=parsed.output_dir,
+        timeout=parsed.timeout,
+        summary_path=parsed.summary
+    )
+    return 0 if all(r['status'] == 'success' for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
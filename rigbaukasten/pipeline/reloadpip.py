@@ -5,7 +5,7 @@ import sys
 def reload_rigbaukasten():
     """ Reload all rigbaukasten modules in the correct order. """
     mods = {k: m for k, m in sys.modules.items() if 'rigbaukasten' in k}
-    order = ['utils', 'library', 'functions', 'pipeline', 'core', 'base', 'puppet', 'deform', 'templates']
+    order = ['utils', 'library', 'functions', 'pipeline', 'core', 'base', 'puppet', 'deform', 'templates', 'benchmarks']
     for current in order:
         for k, mod in mods.items():
             if current in k:
@@ -3,6 +3,7 @@ import pymel.core as pm
 
 from rigbaukasten.functions import chainfunc
 from rigbaukasten.library import controllib, curvelib, guidelib
+from rigbaukasten.utils import constraintutl
 
 
 class AimCtl(modulecor.RigPuppetModule):
@@ -110,8 +111,7 @@ class AimCtl(modulecor.RigPuppetModule):
         crv.template.set(True)
 
     def connect_to_joint(self):
-        pm.parentConstraint(self.center_ctl.trn, self.puppet_joints[0], mo=True)
-        pm.scaleConstraint(self.center_ctl.trn, self.puppet_joints[0])
+        constraintutl.parent_constraint(self.center_ctl.trn, self.puppet_joints[0])
 
     def connect_to_hook(self):
         self.constraint_to_hook(self.center_ctl.grp)
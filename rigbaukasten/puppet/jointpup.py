@@ -2,7 +2,7 @@ from rigbaukasten.core import modulecor
 import pymel.core as pm
 
 from rigbaukasten.library import guidelib, curvelib, posereaderlib
-from rigbaukasten.utils import attrutl, connectutl, mathutl
+from rigbaukasten.utils import attrutl, connectutl, constraintutl, mathutl
 
 
 class StretchyJoint(modulecor.RigPuppetModule):
@@ -164,8 +164,7 @@ class StretchyJoint(modulecor.RigPuppetModule):
                 hook = hook.puppet_joint_equivalent.listConnections(s=False, d=True)[0]
             buffer = pm.group(em=True, n=f'{self.module_key}_startHookBuffer_TRN', p=hook)
             pm.delete(pm.parentConstraint(self.start_trn, buffer))
-            pm.parentConstraint(buffer, self.start_trn, mo=True)
-            pm.scaleConstraint(buffer, self.start_trn)
+            constraintutl.parent_constraint(buffer, self.start_trn)
 
             hook.wm[0] >> self.global_scale_read_dcm.inputMatrix
 
@@ -175,8 +174,7 @@ class StretchyJoint(modulecor.RigPuppetModule):
                 end_hook = end_hook.puppet_joint_equivalent.listConnections(s=False, d=True)[0]
             end_buffer = pm.group(em=True, n=f'{self.module_key}_endHookBuffer_TRN', p=end_hook)
             pm.delete(pm.parentConstraint(self.end_trn, end_buffer))
-            pm.parentConstraint(end_buffer, self.end_trn, mo=True)
-            pm.scaleConstraint(end_buffer, self.end_trn)
+            constraintutl.parent_constraint(end_buffer, self.end_trn)
 
     def out_hook(self, index):
         """ Return a transform that other modules can hook to. """
@@ -398,13 +396,11 @@ class SimpleHingeHelpers(modulecor.RigPuppetModule):
         hook = self.get_hook(self.hook)
         parent_hook = self.get_hook(self.parent_hook)
 
-        pm.parentConstraint(hook, self.lower_jnts_grp)
-        pm.scaleConstraint(hook, self.lower_jnts_grp)
+        constraintutl.parent_constraint(hook, self.lower_jnts_grp, mo=False)
 
         pm.delete(pm.pointConstraint(hook, self.upper_jnts_grp))
         pm.delete(pm.orientConstraint(parent_hook, self.upper_jnts_grp))
-        pm.parentConstraint(parent_hook, self.upper_jnts_grp, mo=True)
-        pm.scaleConstraint(parent_hook, self.upper_jnts_grp)
+        constraintutl.parent_constraint(parent_hook, self.upper_jnts_grp)
 
         posereaderlib.update_axis_reader_buffer(self.axis_reader)
 
@@ -574,13 +570,11 @@ class HingeSidePush(modulecor.RigPuppetModule):
         hook = self.get_hook(self.hook)
         parent_hook = self.get_hook(self.parent_hook)
 
-        pm.parentConstraint(hook, self.jnts_grp)
-        pm.scaleConstraint(hook, self.jnts_grp)
+        constraintutl.parent_constraint(hook, self.jnts_grp, mo=False)
 
         pm.delete(pm.pointConstraint(hook, self.parent_ref_trn))
         pm.delete(pm.orientConstraint(parent_hook, self.parent_ref_trn))
-        pm.parentConstraint(parent_hook, self.parent_ref_trn, mo=True)
-        pm.scaleConstraint(parent_hook, self.parent_ref_trn)
+        constraintutl.parent_constraint(parent_hook, self.parent_ref_trn)
 
         posereaderlib.update_axis_reader_buffer(self.axis_reader)
 
@@ -737,11 +731,9 @@ class VolumePushers(modulecor.RigPuppetModule):
         hook = self.get_hook(self.hook)
         parent_hook = self.get_hook(self.parent_hook)
 
-        pm.parentConstraint(hook, self.jnts_grp)
-        pm.scaleConstraint(hook, self.jnts_grp)
+        constraintutl.parent_constraint(hook, self.jnts_grp, mo=False)
 
-        pm.parentConstraint(parent_hook, self.ref_grp)
-        pm.scaleConstraint(parent_hook, self.ref_grp)
+        constraintutl.parent_constraint(parent_hook, self.ref_grp, mo=False)
 
         posereaderlib.update_axis_reader_buffer(self.axis_reader)
 
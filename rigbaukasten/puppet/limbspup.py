@@ -3,7 +3,7 @@ import pymel.core as pm
 from rigbaukasten.core import modulecor
 from rigbaukasten.functions import chainfunc, twistfunc, animtoolsfunc
 from rigbaukasten.library import controllib, jointlib, posereaderlib, guidelib, curvelib
-from rigbaukasten.utils import attrutl, connectutl
+from rigbaukasten.utils import attrutl, connectutl, constraintutl
 
 
 class FKIkLimb(modulecor.RigPuppetModule):
@@ -191,8 +191,7 @@ class FKIkLimb(modulecor.RigPuppetModule):
         pm.rotate(self.root_ctl.shp.cv, 90 * self.inv, 90 * self.inv, 0, r=True)
         pm.move(self.root_ctl.shp.cv, self.joints[1].tx.get() * 0.5, 0, 0, r=True)
 
-        pm.parentConstraint(self.root_ctl.trn, self.puppet_joints[0])
-        pm.scaleConstraint(self.root_ctl.trn, self.puppet_joints[0])
+        constraintutl.parent_constraint(self.root_ctl.trn, self.puppet_joints[0], mo=False)
 
     def duplicate_joints(self):
         attrutl.label_attr(self.root_ctl.trn, 'settings')
@@ -255,7 +254,7 @@ class FKIkLimb(modulecor.RigPuppetModule):
             ctl.grp.setParent(self.root_hook_grp)
 
     def setup_twist_ctls(self):
-        pm.parentConstraint(self.puppet_joints[0], self.twist_ctls[0].grp, mo=True)
+        constraintutl.parent_constraint(self.puppet_joints[0], self.twist_ctls[0].grp, scale=False)
         shoulder_correction_grp = pm.group(
             self.twist_ctls[0].trn,
             p=self.twist_ctls[0].grp,
@@ -278,7 +277,7 @@ class FKIkLimb(modulecor.RigPuppetModule):
         orc = pm.orientConstraint(self.puppet_joints[1], self.puppet_joints[2], self.twist_ctls[1].grp)
         orc.interpType.set(2)
 
-        pm.parentConstraint(self.puppet_joints[3], self.twist_ctls[2].grp, mo=True)
+        constraintutl.parent_constraint(self.puppet_joints[3], self.twist_ctls[2].grp, scale=False)
         if not self.as_leg:
             wrist_correction_grp = pm.group(
                 self.twist_ctls[2].trn,
@@ -395,10 +394,12 @@ class FKIkLimb(modulecor.RigPuppetModule):
         tip_fk_buffer = pm.group(em=True, n=self.mk('footRollTipFkBuffer_TRN'), p=self.fk_joints[-1])
         pm.delete(pm.parentConstraint(tip_trn, tip_fk_buffer))
 
-        pac = pm.parentConstraint(tip_fk_buffer, tip_trn, self.foot_ctl.grp, mo=True)
-        plugs = pm.parentConstraint(pac, q=1, wal=1)
-        self.fk_ik_plug >> plugs[1]
-        self.fk_ik_rvs_plug >> plugs[0]
+        constraintutl.parent_constraint(
+            [tip_fk_buffer, tip_trn],
+            self.foot_ctl.grp,
+            scale=False,
+            weights=[self.fk_ik_rvs_plug, self.fk_ik_plug]
+        )
 
         roll_ikh = pm.ikHandle(
             sj=self.puppet_joints[3], ee=self.puppet_joints[4], sol='ikSCsolver', n=self.mk('footRoll_IKH'))[0]
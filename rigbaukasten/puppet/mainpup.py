@@ -1,11 +1,13 @@
 import pymel.core as pm
 from rigbaukasten.core import modulecor, iocor
 from rigbaukasten.library import controllib, guidelib
-from rigbaukasten.utils import attrutl, connectutl
+from rigbaukasten.utils import attrutl, connectutl, constraintutl
 
 
 class MainControl(modulecor.RigPuppetModule):
     """ The main CTL for the rig (big quad arrow at teh origin). """
+    sync_steps = ('puppet_connect_post',)  # show helper joints attr is connected to all joints in the scene
+
     def __init__(
             self,
             side='C',
@@ -119,14 +121,13 @@ class MainControl(modulecor.RigPuppetModule):
     def connect_show_helper_joints_attr(self):
         mods_grp = self.get_asset_root_module().modules_grp
         jnts = pm.listRelatives(mods_grp, ad=True, type='joint')
-        anim_crv = connectutl.driven_keys(
+        connectutl.driven_keys(
             driver=self.ctls[0].trn.showHelperJoints,
-            driven=jnts[0].drawStyle,
+            driven=[jnt.drawStyle for jnt in jnts],
             v=(2, 0),
-            dv=(0, 1)
-        )[0]
-        for jnt in jnts[1:]:
-            anim_crv.o >> jnt.drawStyle
+            dv=(0, 1),
+            shared=True
+        )
 
     def connect_plumbob_to_hook(self):
         if self.plumbob_shp:
@@ -134,8 +135,7 @@ class MainControl(modulecor.RigPuppetModule):
             cluster, handle = pm.cluster(self.plumbob_shp, n=self.mk('plumbob_CLS'))
             cluster.relative.set(True)
             pm.parent(handle, self.ctls[0].trn)
-            pm.parentConstraint(hook, handle, mo=True)
-            pm.scaleConstraint(hook, handle)
+            constraintutl.parent_constraint(hook, handle)
             pm.hide(handle)
 
     def out_hook(self, index):
@@ -1,48 +1,79 @@
+""" Rigbaukasten menu, run main() at maya startup.
+
+    This runs for every artist on every maya start, so only maya.cmds and the lightweight rigbaukasten modules are
+    imported here. Everything else (pymel, modulecor, the libraries, Qt) is imported when a menu command is used,
+    and submenus that need the file system are populated when they are opened for the first time.
+    See benchmarks/startupbench.py for the startup time budget.
+"""
 import os
 import sys
 import time
 from functools import partial
 
-from maya import cmds
-import pymel.core as pm
+from maya import cmds, mel
 
 import rigbaukasten
-from rigbaukasten.core import modulecor
-from rigbaukasten.library import controllib, rigsetlib
-from rigbaukasten.pipeline import reloadpip, newrigbuildpip
-from rigbaukasten.utils import mathutl, errorutl, mirrorutl, fileutl, pysideutl
-from rigbaukasten.tools import fkiksnaptool
+from rigbaukasten.utils import errorutl
+
+
+IO_TYPES = ['guides', 'ctls', 'constraints', 'skinClusters', 'blendshapes', 'rigsets', 'drivenKeys']
 
 
 def rigbaukasten_menu():
     if 'Rigbaukasten' in cmds.lsUI(type='menu'):
         cmds.deleteUI('Rigbaukasten')
 
-    maya_main_window = pm.melGlobals['gMainWindow']
-    pm.menu('Rigbaukasten', p=maya_main_window, to=True)
+    maya_main_window = mel.eval('$tmp = $gMainWindow')
+    cmds.menu('Rigbaukasten', p=maya_main_window, to=True)
 
-    pm.menuItem(label='Set Environment', c=lambda _: set_environemtn())
-    pm.menuItem(divider=True)
-    pm.menuItem(label='Reload Rigbaukasten', c=reload_rigbaukasten)
-    pm.menuItem(label='Rebuild Menu', c=lambda _: rigbaukasten_menu())
+    cmds.menuItem(label='Set Environment', c=lambda _: set_environemtn())
+    cmds.menuItem(divider=True)
+    cmds.menuItem(label='Reload Rigbaukasten', c=reload_rigbaukasten)
+    cmds.menuItem(label='Rebuild Menu', c=lambda _: rigbaukasten_menu())
     try:
         asset_name = rigbaukasten.environment.get_asset_name()
     except errorutl.RbkEnvironmentError:
         asset_name = 'rig'
-    pm.menuItem(divider=True, l=asset_name)
+    cmds.menuItem(divider=True, l=asset_name)
     rig_builds_menu()
     publish_menu()
-    pm.menuItem(divider=True, label='Guides', p='Rigbaukasten')
+    cmds.menuItem(divider=True, label='Guides', p='Rigbaukasten')
     mirror_transforms_menu()
-    pm.menuItem(divider=True, label='Rig Sets', p='Rigbaukasten')
-    pm.menuItem(label='Make All Sets Active', c=make_sets_active_cmd, p='Rigbaukasten')
-    pm.menuItem(label='Make All Sets Inactive', c=make_sets_inactive_cmd, p='Rigbaukasten')
-    pm.menuItem(divider=True, label='Control Shapes', p='Rigbaukasten')
-    pm.menuItem(label='Mirror CTL', c=mirror_ctl_cmd, p='Rigbaukasten')
-    pm.menuItem(label='Store Selected shape', c=store_selected_shape_cmd, p='Rigbaukasten')
+    cmds.menuItem(divider=True, label='Rig Sets', p='Rigbaukasten')
+    cmds.menuItem(label='Make All Sets Active', c=make_sets_active_cmd, p='Rigbaukasten')
+    cmds.menuItem(label='Make All Sets Inactive', c=make_sets_inactive_cmd, p='Rigbaukasten')
+    cmds.menuItem(divider=True, label='Control Shapes', p='Rigbaukasten')
+    cmds.menuItem(label='Mirror CTL', c=mirror_ctl_cmd, p='Rigbaukasten')
+    cmds.menuItem(label='Store Selected shape', c=store_selected_shape_cmd, p='Rigbaukasten')
     change_ctl_shape_menu()
-    pm.menuItem(divider=True, label='Tools', p='Rigbaukasten')
-    pm.menuItem(label='Fk Ik Snap', c=lambda _: fkiksnaptool.FkIkSnapUI(), p='Rigbaukasten')
+    cmds.menuItem(divider=True, label='Tools', p='Rigbaukasten')
+    cmds.menuItem(label='Fk Ik Snap', c=fk_ik_snap_cmd, p='Rigbaukasten')
+    cmds.menuItem(label='Evaluation Cost Report', c=evaluation_report_cmd, p='Rigbaukasten')
+
+
+def deferred_sub_menu(name, label, populate_cmd, parent='Rigbaukasten'):
+    """ Create a sub menu that is populated by populate_cmd when it is opened for the first time.
+        :param name: str - name of the sub menu menuItem, an existing sub menu with this name is cleared
+        :param label: str - label of the sub menu
+        :param populate_cmd: callable - gets the name of the sub menu, creates the items in it
+        :param parent: str - parent menu
+    """
+    if cmds.menuItem(name, q=True, ex=True) and not cmds.menuItem(name, q=True, subMenu=True):
+        cmds.deleteUI(name)
+    if cmds.menuItem(name, q=True, ex=True):  # keep the position in the menu, just clear it
+        cmds.menu(name, e=True, deleteAllItems=True)
+        cmds.menuItem(name, e=True, postMenuCommand=lambda *_: populate_cmd(name), postMenuCommandOnce=True)
+        return
+    cmds.menuItem(
+        name,
+        subMenu=True,
+        label=label,
+        to=True,
+        p=parent,
+        postMenuCommand=lambda *_: populate_cmd(name),
+        postMenuCommandOnce=True
+    )
+    cmds.setParent(parent, menu=True)
 
 
 def set_environemtn():
@@ -53,59 +84,83 @@ def set_environemtn():
 
 
 def reload_rigbaukasten(*_):
+    from rigbaukasten.pipeline import reloadpip
     reloadpip.reload_rigbaukasten()
 
 
 def rig_builds_menu():
-    """  """
-    if pm.menuItem('Rigbaukasten_builds', q=True, ex=True):
-        pm.deleteUI('Rigbaukasten_builds')
-    pm.menuItem('Rigbaukasten_builds', subMenu=True, label='Build Rig', to=True, p='Rigbaukasten')
+    """ Create the 'Build Rig' and 'Edit Build_script' sub menus, both are populated when opened. """
+    deferred_sub_menu('Rigbaukasten_builds', 'Build Rig', populate_rig_builds_menu)
+    deferred_sub_menu('Rigbaukasten_edit_build_script', 'Edit Build_script', populate_edit_build_script_menu)
+
+
+def get_build_script_path():
+    """ Get the path of the build script for the current asset.
+        :return: str - path (may not exist yet) or None if the environment is not set
+    """
     try:
         asset_name = rigbaukasten.environment.get_asset_name()
     except errorutl.RbkEnvironmentError:
-        pm.menuItem(
-            label='Set environment first!',
-            p='Rigbaukasten_builds',
-            en=False
-        )
-        pm.menuItem('Rigbaukasten_edit_build_script', label='Edit Build_script', p='Rigbaukasten', en=False)
-        return
+        return None
+    return os.path.join(rigbaukasten.environment.get_rig_builds_path(), asset_name, f'{asset_name}_build.py')
+
 
-    build_path = os.path.join(rigbaukasten.environment.get_rig_builds_path(), asset_name, f'{asset_name}_build.py')
-    if os.path.exists(build_path):
-        rig_steps_menu(parent_menu='Rigbaukasten_builds', file=f'{asset_name}.{asset_name}_build')
-        open_script_menu(parent_menu='Rigbaukasten', script_file_path=build_path)
+def populate_rig_builds_menu(parent_menu):
+    build_path = get_build_script_path()
+    if build_path is None:
+        cmds.menuItem(label='Set environment first!', p=parent_menu, en=False)
+    elif os.path.exists(build_path):
+        asset_name = rigbaukasten.environment.get_asset_name()
+        rig_steps_menu(parent_menu=parent_menu, file=f'{asset_name}.{asset_name}_build')
     else:
-        pm.menuItem(
-            label=f'Create new rig build for {asset_name}...',
-            p='Rigbaukasten_builds',
+        cmds.menuItem(
+            label=f'Create new rig build for {rigbaukasten.environment.get_asset_name()}...',
+            p=parent_menu,
             c=create_new_rig_build
         )
-        pm.menuItem('Rigbaukasten_edit_build_script', label='Edit Build_script', p='Rigbaukasten', en=False)
+
+
+def populate_edit_build_script_menu(parent_menu):
+    build_path = get_build_script_path()
+    if build_path is None:
+        cmds.menuItem(label='Set environment first!', p=parent_menu, en=False)
+    elif not os.path.exists(build_path):
+        cmds.menuItem(label='No build script yet', p=parent_menu, en=False)
+    else:
+        open_script_menu(parent_menu=parent_menu, script_file_path=build_path)
 
 
 def open_script_menu(parent_menu, script_file_path):
-    pm.menuItem('Rigbaukasten_edit_build_script', subMenu=True, label='Edit Build_script', p=parent_menu)
-    pm.menuItem(
+    cmds.menuItem(
         label='Open in Script Editor',
-        p='Rigbaukasten_edit_build_script',
-        c=lambda _: fileutl.open_in_script_editor(script_file_path)
+        p=parent_menu,
+        c=partial(open_script_cmd, script_file_path=script_file_path, app='script_editor')
     )
-    pm.menuItem(
+    cmds.menuItem(
         label='Open in Default Editor',
-        p='Rigbaukasten_edit_build_script',
-        c=lambda _: fileutl.open_in_default_app(script_file_path)
+        p=parent_menu,
+        c=partial(open_script_cmd, script_file_path=script_file_path, app='default')
     )
-    pm.menuItem(
+    cmds.menuItem(
         label='Copy file path to clipboard',
-        p='Rigbaukasten_edit_build_script',
-        c=lambda _: pysideutl.set_clipboard_text(script_file_path)
+        p=parent_menu,
+        c=partial(open_script_cmd, script_file_path=script_file_path, app='clipboard')
     )
 
 
+def open_script_cmd(*_, script_file_path, app):
+    from rigbaukasten.utils import fileutl, pysideutl
+    if app == 'script_editor':
+        fileutl.open_in_script_editor(script_file_path)
+    elif app == 'default':
+        fileutl.open_in_default_app(script_file_path)
+    else:
+        pysideutl.set_clipboard_text(script_file_path)
+
+
 def create_new_rig_build(*_):
     """ Create a new rig build for the current asset and update the menu. """
+    from rigbaukasten.pipeline import newrigbuildpip
     if newrigbuildpip.choose_template_and_create_new_rig_build():
         time.sleep(.5)
         rigbaukasten_menu()
@@ -120,13 +175,13 @@ def rig_steps_menu(parent_menu, file):
         :param parent_menu: (str) name of the parent menu, e.g. 'Rigbaukasten_builds'
         :param file: (str) name of the rig_build file (python module), e.g. 'spiderman_build'
     """
-    pm.menuItem(
+    cmds.menuItem(
         l='Show Sub Steps',
         p=parent_menu,
         cb=False,
         c=partial(rig_steps_menu_toggle, parent_menu=parent_menu, file=file)
     )
-    pm.menuItem(divider=True, p=parent_menu)
+    cmds.menuItem(divider=True, p=parent_menu)
     rig_steps_menu_toggle(sub_steps=False, parent_menu=parent_menu, file=file)
 
 
@@ -141,9 +196,9 @@ def rig_steps_menu_toggle(sub_steps, parent_menu, file):
         :param parent_menu: (str) name of the parent menu, e.g. 'Rigbaukasten_builds'
         :param file: (str) name of the rig_build file (python module), e.g. 'spiderman_build'
     """
-    step_itmes = cmds.menu(parent_menu, q=1, itemArray=1)[2:]
+    step_itmes = (cmds.menu(parent_menu, q=1, itemArray=1) or [])[2:]
     if step_itmes:
-        pm.deleteUI(step_itmes)
+        cmds.deleteUI(step_itmes)
 
     step_icons = {
         'skeleton_build': 'kinDisconnect.png',
@@ -156,26 +211,26 @@ def rig_steps_menu_toggle(sub_steps, parent_menu, file):
     }
     for step, icon in step_icons.items():
         if sub_steps:
-            pm.menuItem(
+            cmds.menuItem(
                 f'{step}_pre',
                 c=partial(build_rig, file=file, stop_after_step=step, stop_after_sub_step='pre'),
                 p=parent_menu,
                 i=icon
             )
-            pm.menuItem(
+            cmds.menuItem(
                 step,
                 c=partial(build_rig, file=file, stop_after_step=step, stop_after_sub_step=''),
                 p=parent_menu,
                 i=icon
             )
-            pm.menuItem(
+            cmds.menuItem(
                 f'{step}_post',
                 c=partial(build_rig, file=file, stop_after_step=step, stop_after_sub_step='post'),
                 p=parent_menu,
                 i=icon
             )
         else:
-            pm.menuItem(
+            cmds.menuItem(
                 step,
                 c=partial(build_rig, file=file, stop_after_step=step, stop_after_sub_step='post'),
                 p=parent_menu,
@@ -185,7 +240,8 @@ def rig_steps_menu_toggle(sub_steps, parent_menu, file):
 
 def build_rig(*_, file='myRig_build', stop_after_step='finalize_post', stop_after_sub_step='post'):
     """ Wrapper for modulecor.build_rig(). Uses modifier keys to force a rebuild. """
-    force_rebuild = bool(pm.getModifiers())  # Pressing any modifier key will force a rebuild.
+    from rigbaukasten.core import modulecor
+    force_rebuild = bool(cmds.getModifiers())  # Pressing any modifier key will force a rebuild.
     modulecor.build_rig(
         file=file,
         stop_after_step=stop_after_step,
@@ -195,19 +251,21 @@ def build_rig(*_, file='myRig_build', stop_after_step='finalize_post', stop_afte
 
 
 def publish_menu():
-    if pm.menuItem('Rigbaukasten_publish', q=True, ex=True):
-        pm.deleteUI('Rigbaukasten_publish')
-
     try:
         rigbaukasten.environment.get_asset_name()  # Check if environment is set
     except errorutl.RbkEnvironmentError:
-        pm.menuItem('Rigbaukasten_publish', label='Rig Data Publish', p='Rigbaukasten', en=False)
+        if cmds.menuItem('Rigbaukasten_publish', q=True, ex=True):
+            cmds.deleteUI('Rigbaukasten_publish')
+        cmds.menuItem('Rigbaukasten_publish', label='Rig Data Publish', p='Rigbaukasten', en=False)
     else:
-        pm.menuItem('Rigbaukasten_publish', subMenu=True, label='Rig Data Publish', to=True, p='Rigbaukasten')
-        for which, cmd in (('All', publish_all_cmd), ('Selected', publish_selected_cmd)):
-            pm.menuItem(divider=True, label=which)
-            for io_type in ['guides', 'ctls', 'constraints', 'skinClusters', 'blendshapes', 'rigsets', 'drivenKeys']:
-                pm.menuItem(label=f'{which} {io_type}', c=partial(cmd, io_type=io_type))
+        deferred_sub_menu('Rigbaukasten_publish', 'Rig Data Publish', populate_publish_menu)
+
+
+def populate_publish_menu(parent_menu):
+    for which, cmd in (('All', publish_all_cmd), ('Selected', publish_selected_cmd)):
+        cmds.menuItem(divider=True, label=which, p=parent_menu)
+        for io_type in IO_TYPES:
+            cmds.menuItem(label=f'{which} {io_type}', c=partial(cmd, io_type=io_type), p=parent_menu)
 
 
 def publish_all_cmd(*_, io_type):
@@ -215,6 +273,8 @@ def publish_all_cmd(*_, io_type):
 
 
 def publish_selected_cmd(*_, io_type):
+    import pymel.core as pm
+    from rigbaukasten.core import modulecor
     done = []
     for obj in pm.ls(sl=1):
         if io_type == 'skinClusters' and isinstance(obj.getShape(), pm.nt.Mesh):
@@ -233,67 +293,56 @@ def publish_selected_cmd(*_, io_type):
 
 def mirror_transforms_menu():
     """ Build a menu item for transform mirroring (e.g. guide mirroring). """
-    if pm.menuItem('Rigbaukasten_mirror_transforms', q=True, ex=True):
-        pm.deleteUI('Rigbaukasten_mirror_transforms')
-    pm.menuItem('Rigbaukasten_mirror_transforms', subMenu=True, label='Mirror Transforms', to=True, p='Rigbaukasten')
-
-    pm.menuItem(label='Pos Only', c=lambda _: mirrorutl.world_mirror(None, pos=True, rot=False))
-    pm.menuItem(divider=True, p='Rigbaukasten_mirror_transforms')
-    pm.menuItem(
-        label='Pos/Rot, Flip All',
-        c=lambda _: mirrorutl.world_mirror(None, pos=True, rot=True, flip_axis='all')
-    )
-    pm.menuItem(
-        label='Pos/Rot, Flip X',
-        c=lambda _: mirrorutl.world_mirror(None, pos=True, rot=True, flip_axis='x')
-    )
-    pm.menuItem(
-        label='Pos/Rot, Flip Y',
-        c=lambda _: mirrorutl.world_mirror(None, pos=True, rot=True, flip_axis='y')
-    )
-    pm.menuItem(
-        label='Pos/Rot, Flip Z',
-        c=lambda _: mirrorutl.world_mirror(None, pos=True, rot=True, flip_axis='z')
-    )
-    pm.menuItem(
-        label='Pos/Rot, Flip None',
-        c=lambda _: mirrorutl.world_mirror(None, pos=True, rot=True, flip_axis=None)
-    )
-    pm.menuItem(divider=True, p='Rigbaukasten_mirror_transforms')
-    pm.menuItem(
-        label='Rot Only, Flip All',
-        c=lambda _: mirrorutl.world_mirror(None, pos=False, rot=True, flip_axis='all')
-    )
-    pm.menuItem(
-        label='Rot Only, Flip X',
-        c=lambda _: mirrorutl.world_mirror(None, pos=False, rot=True, flip_axis='x')
-    )
-    pm.menuItem(
-        label='Rot Only, Flip Y',
-        c=lambda _: mirrorutl.world_mirror(None, pos=False, rot=True, flip_axis='y')
-    )
-    pm.menuItem(
-        label='Rot Only, Flip Z',
-        c=lambda _: mirrorutl.world_mirror(None, pos=False, rot=True, flip_axis='z')
-    )
-    pm.menuItem(
-        label='Rot Only, Flip None',
-        c=lambda _: mirrorutl.world_mirror(None, pos=False, rot=True, flip_axis=None)
+    if cmds.menuItem('Rigbaukasten_mirror_transforms', q=True, ex=True):
+        cmds.deleteUI('Rigbaukasten_mirror_transforms')
+    cmds.menuItem('Rigbaukasten_mirror_transforms', subMenu=True, label='Mirror Transforms', to=True, p='Rigbaukasten')
+
+    cmds.menuItem(label='Pos Only', c=partial(mirror_transforms_cmd, pos=True, rot=False))
+    cmds.menuItem(divider=True, p='Rigbaukasten_mirror_transforms')
+    for flip_axis in ('all', 'x', 'y', 'z', None):
+        cmds.menuItem(
+            label=f'Pos/Rot, Flip {str(flip_axis).title()}',
+            c=partial(mirror_transforms_cmd, pos=True, rot=True, flip_axis=flip_axis)
+        )
+    cmds.menuItem(divider=True, p='Rigbaukasten_mirror_transforms')
+    for flip_axis in ('all', 'x', 'y', 'z', None):
+        cmds.menuItem(
+            label=f'Rot Only, Flip {str(flip_axis).title()}',
+            c=partial(mirror_transforms_cmd, pos=False, rot=True, flip_axis=flip_axis)
+        )
+    cmds.setParent('Rigbaukasten', menu=True)
+
+
+def mirror_transforms_cmd(*_, pos, rot, flip_axis=None):
+    from rigbaukasten.utils import mirrorutl
+    mirrorutl.world_mirror(None, pos=pos, rot=rot, flip_axis=flip_axis)
+
+
+def evaluation_report_cmd(*_):
+    from rigbaukasten.core import evalprofilecor
+    asset_name = rigbaukasten.environment.get_asset_name()
+    evalprofilecor.profile_evaluation(
+        report_folder=rigbaukasten.environment.get_build_cache_path('profiles'),
+        name=f'{asset_name}_evalProfile'
     )
 
 
 def make_sets_active_cmd(*_):
+    from rigbaukasten.library import rigsetlib
     missing = rigsetlib.update_all_rigsets()
     if missing:
-        pm.warning(f'Could not make all sets active, missing objects: {missing}')
+        cmds.warning(f'Could not make all sets active, missing objects: {missing}')
 
 
 def make_sets_inactive_cmd(*_):
+    from rigbaukasten.library import rigsetlib
     for rigset in rigsetlib.get_all_rigsets():
         rigsetlib.make_all_members_inactive(rigset)
 
 
 def mirror_ctl_cmd(*_):
+    import pymel.core as pm
+    from rigbaukasten.library import controllib
     mirrored = []
     for ctl in pm.ls(sl=1):
         other = controllib.mirror_side_control(ctl)
@@ -302,15 +351,20 @@ def mirror_ctl_cmd(*_):
 
 
 def change_ctl_shape_menu():
-    """ Build a menu item to change the selected CTL to each available shape. """
-    if pm.menuItem('Rigbaukasten_ctls', q=True, ex=True):
-        pm.deleteUI('Rigbaukasten_ctls')
-    pm.menuItem('Rigbaukasten_ctls', subMenu=True, label='Change CTL Shape to', to=True, p='Rigbaukasten')
+    """ Build a menu item to change the selected CTL to each available shape, populated when opened. """
+    deferred_sub_menu('Rigbaukasten_ctls', 'Change CTL Shape to', populate_change_ctl_shape_menu)
+
+
+def populate_change_ctl_shape_menu(parent_menu):
+    from rigbaukasten.library import controllib
     for shape in controllib.get_available_shapes():
-        pm.menuItem(label=shape, c=partial(change_ctl_shape_to_cmd, shape=shape))
+        cmds.menuItem(label=shape, c=partial(change_ctl_shape_to_cmd, shape=shape), p=parent_menu)
 
 
 def change_ctl_shape_to_cmd(*_, shape):
+    import pymel.core as pm
+    from rigbaukasten.library import controllib
+    from rigbaukasten.utils import mathutl
     ctls = pm.ls(sl=1)
     for ctl in ctls:
         scale_before = mathutl.distance(*ctl.boundingBox())
@@ -323,10 +377,16 @@ def change_ctl_shape_to_cmd(*_, shape):
 
 def store_selected_shape_cmd(*_):
     """ Store the selected curve as ctl shape and rebuild the menu. """
+    from rigbaukasten.library import controllib
     controllib.store_selected_curve_shape()
     change_ctl_shape_menu()
 
 
+def fk_ik_snap_cmd(*_):
+    from rigbaukasten.tools import fkiksnaptool
+    fkiksnaptool.FkIkSnapUI()
+
+
 def main():
     """ Run this at maya startup after you added rigbaukasten3 to PYTHONPATH. """
     rigbaukasten_menu()
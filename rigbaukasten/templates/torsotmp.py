@@ -2,7 +2,7 @@ from rigbaukasten.core import modulecor
 import pymel.core as pm
 
 from rigbaukasten.puppet import jointpup
-from rigbaukasten.utils import attrutl, connectutl, mathutl
+from rigbaukasten.utils import attrutl, connectutl, constraintutl, mathutl
 from rigbaukasten.utils.typesutl import Ctl
 
 
@@ -87,11 +87,9 @@ class Ribcage(modulecor.RigModule):
 
     def connect_breathing_hooks(self):
         upper_chest_hook = self.get_hook(self.upper_chest_hook)
-        pm.parentConstraint(upper_chest_hook, self.upper_breathing_grp, mo=True)
-        pm.scaleConstraint(upper_chest_hook, self.upper_breathing_grp)
+        constraintutl.parent_constraint(upper_chest_hook, self.upper_breathing_grp)
         lower_chest_hook = self.get_hook(self.lower_chest_hook)
-        pm.parentConstraint(lower_chest_hook, self.lower_breathing_grp, mo=True)
-        pm.scaleConstraint(lower_chest_hook, self.lower_breathing_grp)
+        constraintutl.parent_constraint(lower_chest_hook, self.lower_breathing_grp)
 
     def create_breathing_attrs(self):
         if isinstance(self.breathing_attrs_holder, Ctl):
@@ -1,87 +1,79 @@
 import pymel.core as pm
+from maya import cmds
+
+from rigbaukasten.utils import sceneutl
 
 
 def add(obj, attr_name='attr', typ='float', mn=None, mx=None, default=0, k=True, cb=True, multi=False):
     # add attribute
     if typ.endswith('3'):
-        pm.addAttr(obj, attributeType=typ, longName=attr_name, multi=multi)
+        sceneutl.add_attr(obj, attr_name, attributeType=typ, multi=multi)
         for ax in 'XYZ':
-            pm.addAttr(obj, attributeType=typ[:-1], longName=attr_name + ax, p=attr_name, dv=default)
+            sceneutl.add_attr(obj, attr_name + ax, attributeType=typ[:-1], parent=attr_name, defaultValue=default)
     else:
-        pm.addAttr(obj, attributeType=typ, longName=attr_name, dv=default, multi=multi)
-    plug = pm.PyNode(f'{obj}.{attr_name}')
+        sceneutl.add_attr(obj, attr_name, attributeType=typ, defaultValue=default, multi=multi)
+    plug_name = f'{obj}.{attr_name}'
     if mn is not None:
-        pm.addAttr(plug, e=True, min=mn)
+        cmds.addAttr(plug_name, e=True, min=mn)
     if mx is not None:
-        pm.addAttr(plug, e=True, max=mx)
-    pm.setAttr(plug, keyable=k)
-    if not k:
-        pm.setAttr(plug, channelBox=cb)
+        cmds.addAttr(plug_name, e=True, max=mx)
+    sceneutl.set_flags(plug_name, keyable=k, channel_box=None if k else cb)
 
-    return plug
+    return pm.PyNode(plug_name)
 
 
 def add_compound(obj, attr_name, typ, child_names, k=True, cb=True, **kwargs):
-    pm.addAttr(obj, attributeType='compound', longName=attr_name, nc=len(child_names))
+    sceneutl.add_attr(obj, attr_name, attributeType='compound', numberOfChildren=len(child_names))
     for cn in child_names:
-        pm.addAttr(obj, attributeType=typ, longName=cn, p=attr_name, **kwargs)
+        sceneutl.add_attr(obj, cn, attributeType=typ, parent=attr_name, **kwargs)
+    for cn in child_names:
+        sceneutl.set_flags(f'{obj}.{cn}', keyable=k, channel_box=None if k else cb)
     child_plugs = [pm.PyNode(f'{obj}.{cn}') for cn in child_names]
     compound_plug = pm.PyNode(f'{obj}.{attr_name}')
-    for cp in child_plugs:
-        pm.setAttr(cp, keyable=k)
-        if not k:
-            pm.setAttr(cp, channelBox=cb)
     return compound_plug, child_plugs
 
 
 def add_string(obj, attr_name, default='', multi=False):
     plug_name = f'{obj}.{attr_name}'
-    if pm.objExists(plug_name):
+    if cmds.objExists(plug_name):
         return pm.PyNode(plug_name)
-    pm.addAttr(obj, dt='string', longName=attr_name, multi=multi)
-    plug = pm.PyNode(plug_name)
-    plug.set(default)
-    return plug
+    sceneutl.add_attr(obj, attr_name, dataType='string', multi=multi)
+    sceneutl.set_attr(plug_name, default)
+    return pm.PyNode(plug_name)
 
 
 def add_message(obj, attr_name, multi=False):
     plug_name = f'{obj}.{attr_name}'
-    if pm.objExists(plug_name):
-        return pm.PyNode(plug_name)
-    pm.addAttr(obj, at='message', longName=attr_name, multi=multi)
-    plug = pm.PyNode(plug_name)
-    return plug
+    if not cmds.objExists(plug_name):
+        sceneutl.add_attr(obj, attr_name, attributeType='message', multi=multi)
+    return pm.PyNode(plug_name)
 
 
 def add_enum(obj, attr_name='enumAttr', enum_names=['one', 'two'], default=0, k=True, cb=True):
-    pm.addAttr(obj, attributeType='enum', longName=attr_name, dv=default, enumName=enum_names)
-    plug = pm.PyNode(f'{obj}.{attr_name}')
-    pm.setAttr(plug, keyable=k)
-    if not k:
-        pm.setAttr(plug, channelBox=cb)
-    return plug
+    enum_names = enum_names if isinstance(enum_names, str) else ':'.join(enum_names)
+    plug_name = sceneutl.add_attr(obj, attr_name, attributeType='enum', defaultValue=default, enumName=enum_names)
+    sceneutl.set_flags(plug_name, keyable=k, channel_box=None if k else cb)
+    return pm.PyNode(plug_name)
 
 
 def label_attr(obj, label):
     attr_name = "_"
-    while pm.attributeQuery(attr_name, node=obj, exists=True):
+    while cmds.attributeQuery(attr_name, node=str(obj), exists=True):
         attr_name = attr_name + "_"
-    pm.addAttr(obj, attributeType="enum", longName=attr_name, enumName=label)
-    plug = pm.PyNode(f'{obj}.{attr_name}')
-    pm.setAttr(plug, channelBox=True)
-    pm.setAttr(plug, lock=True)
-    return plug
+    plug_name = sceneutl.add_attr(obj, attr_name, attributeType="enum", enumName=label)
+    sceneutl.set_flags(plug_name, channel_box=True)
+    sceneutl.set_flags(plug_name, lock=True)
+    return pm.PyNode(plug_name)
 
 
 def add_tag(obj, tag, value, typ='string'):
     if typ == 'string':
-        pm.addAttr(obj, dt=typ, longName=tag)
+        plug_name = sceneutl.add_attr(obj, tag, dataType=typ)
     else:
-        pm.addAttr(obj, at=typ, longName=tag)
-    plug = pm.PyNode(f'{obj}.{tag}')
-    pm.setAttr(plug, value)
-    pm.setAttr(plug, lock=True)
-    return plug
+        plug_name = sceneutl.add_attr(obj, tag, attributeType=typ)
+    sceneutl.set_attr(plug_name, value)
+    sceneutl.set_flags(plug_name, lock=True)
+    return pm.PyNode(plug_name)
 
 
 def _set_locked(attrs, locked=True, k=False, cb=False):
@@ -89,13 +81,8 @@ def _set_locked(attrs, locked=True, k=False, cb=False):
     if not isinstance(attrs, (list, tuple)):
         attrs = [attrs]
     for attr in attrs:
-        attr.set(lock=locked)
-        attr.set(k=k)
-        attr.set(cb=cb)
-        for child in attr.iterDescendants():
-            child.set(lock=locked)
-            child.set(k=k)
-            child.set(cb=cb)
+        for plug in [str(attr)] + sceneutl.get_descendant_plugs(attr):
+            sceneutl.set_flags(plug, lock=locked, keyable=k, channel_box=cb)
 
 
 def lock(attrs):
@@ -113,13 +100,13 @@ def unlock_transforms(nodes):
     if not isinstance(nodes, (list, tuple)):
         nodes = [nodes]
     for node in nodes:
-        unlock([node.t, node.r, node.s])
+        unlock([f'{node}.t', f'{node}.r', f'{node}.s'])
 
 
 def safe_set(attr, val, ignore_errors=(RuntimeError, )):
     """ Set the attr to the given value, catch errors. """
     try:
-        attr.set(val)
+        sceneutl.set_attr(attr, val)
     except ignore_errors:
-        if attr.get() != val:
+        if sceneutl.get_attr(attr) != val:
             pm.warning(f'Cannot set {attr} to {val}!')
@@ -1,4 +1,355 @@
+import contextlib
+
 import pymel.core as pm
+from maya import cmds
+from maya.api import OpenMaya, OpenMayaAnim
+
+from rigbaukasten.utils import sceneutl
+
+
+_BATCHES = []  # active NetworkBuilders, see batch()
+_DAG_TYPES = {}  # node type: bool
+# driven_keys() tangent names: MFnAnimCurve tangent type
+TANGENT_TYPES = {
+    'linear': OpenMayaAnim.MFnAnimCurve.kTangentLinear,
+    'spline': OpenMayaAnim.MFnAnimCurve.kTangentSmooth,
+    'flat': OpenMayaAnim.MFnAnimCurve.kTangentFlat,
+    'clamped': OpenMayaAnim.MFnAnimCurve.kTangentClamped,
+    'plateau': OpenMayaAnim.MFnAnimCurve.kTangentPlateau,
+    'step': OpenMayaAnim.MFnAnimCurve.kTangentStep,
+}
+# unit type of the driven plug: animCurve type with unitless input, like setDrivenKeyframe creates them
+DRIVEN_CURVE_TYPES = {
+    None: OpenMayaAnim.MFnAnimCurve.kAnimCurveUU,
+    OpenMaya.MFnUnitAttribute.kAngle: OpenMayaAnim.MFnAnimCurve.kAnimCurveUA,
+    OpenMaya.MFnUnitAttribute.kDistance: OpenMayaAnim.MFnAnimCurve.kAnimCurveUL,
+}
+
+
+def get_unit_type(plug):
+    """ Get the MFnUnitAttribute unit type of the given MPlug or None if it is unitless. """
+    attr = plug.attribute()
+    if attr.hasFn(OpenMaya.MFn.kUnitAttribute):
+        return OpenMaya.MFnUnitAttribute(attr).unitType()
+    return None
+
+
+def needs_unit_conversion(src, dst):
+    """ Check if connecting the given MPlugs needs a unitConversion node, which only connectAttr creates. """
+    if src.isCompound and dst.isCompound and src.numChildren() and dst.numChildren():
+        src, dst = src.child(0), dst.child(0)  # e.g. rotate >> input1
+    return get_unit_type(src) != get_unit_type(dst)
+
+
+class NetworkBuilder(object):
+    """ Record the values and connections of many create_node() calls and apply them with a single MDGModifier.
+
+        Nodes are created right away, so they can be named and passed on to the next create_node() call. Plugs are
+        resolved once through the API, values and connections are only applied by commit(). Values that the modifier
+        cannot set (matrices, arrays, ...) are set with pymel after the modifier ran.
+        The modifier is not part of maya's undo queue, use it for building rigs, not in interactive tools.
+    """
+    def __init__(self):
+        self.node_modifier = OpenMaya.MDGModifier()
+        self.values = []  # (MPlug, [values], plug name)
+        self.connections = {}  # destination plug name: (source MPlug, destination MPlug), the last connection wins
+        self.plugs = {}  # plug name: MPlug
+
+    @staticmethod
+    def is_dag_type(typ):
+        if typ not in _DAG_TYPES:
+            _DAG_TYPES[typ] = 'dagNode' in (cmds.nodeType(typ, isTypeName=True, inherited=True) or [])
+        return _DAG_TYPES[typ]
+
+    def create_node(self, typ, name=None):
+        """ Create a DG node, DAG nodes have to be created with pm.createNode(). """
+        mobj = self.node_modifier.createNode(typ)
+        if name:
+            self.node_modifier.renameNode(mobj, name)
+        self.node_modifier.doIt()  # only runs the operations since the last doIt()
+        return pm.PyNode(OpenMaya.MFnDependencyNode(mobj).name())
+
+    def get_plug(self, plug_name):
+        """ Get the MPlug for the given name, raises RuntimeError or TypeError if it is not a plug. """
+        plug = self.plugs.get(plug_name)
+        if plug is None:
+            sel = OpenMaya.MSelectionList()
+            sel.add(plug_name)
+            plug = sel.getPlug(0)
+            self.plugs[plug_name] = plug
+        return plug
+
+    def connect(self, src, dst):
+        self.connections[dst.name()] = (src, dst)
+
+    def set_or_connect(self, node, attr_name, val):
+        """ Record the value or connection for the given attribute, same rules as in create_node(). """
+        try:
+            plug = self.get_plug(f'{node}.{attr_name}')
+        except (RuntimeError, TypeError):
+            _set_or_connect(str(node.attr(attr_name)), val)  # let pymel resolve the attribute name
+            return
+        other_plug = None
+        if isinstance(val, (str, pm.Attribute)):
+            try:
+                other_plug = self.get_plug(str(val).replace('->', '').replace('<-', ''))
+            except (RuntimeError, TypeError):
+                pass
+        if other_plug is None:
+            self.values.append((plug, val if isinstance(val, (list, tuple)) else [val], f'{node}.{attr_name}'))
+            return
+        if str(val).startswith('->'):
+            is_input_attr = False
+        elif str(val).startswith('<-'):
+            is_input_attr = True
+        else:
+            is_input_attr = OpenMaya.MFnAttribute(plug.attribute()).writable
+        if is_input_attr:
+            self.connect(other_plug, plug)
+        else:
+            self.connect(plug, other_plug)
+
+    @staticmethod
+    def add_value(modifier, plug, values):
+        """ Add setting the given values to the modifier.
+            :return: bool - False if the attribute type is not supported by the modifier
+        """
+        if len(values) > 1 or plug.isCompound:
+            if not plug.isCompound or plug.numChildren() != len(values):
+                return False
+            return all(NetworkBuilder.add_value(modifier, plug.child(i), [v]) for i, v in enumerate(values))
+        value = values[0]
+        attr = plug.attribute()
+        try:
+            if attr.hasFn(OpenMaya.MFn.kNumericAttribute):
+                numeric_type = OpenMaya.MFnNumericAttribute(attr).numericType()
+                if numeric_type == OpenMaya.MFnNumericData.kBoolean:
+                    modifier.newPlugValueBool(plug, bool(value))
+                elif numeric_type in (
+                        OpenMaya.MFnNumericData.kByte,
+                        OpenMaya.MFnNumericData.kChar,
+                        OpenMaya.MFnNumericData.kShort,
+                        OpenMaya.MFnNumericData.kInt,
+                        OpenMaya.MFnNumericData.kLong,
+                ):
+                    modifier.newPlugValueInt(plug, int(value))
+                else:
+                    modifier.newPlugValueDouble(plug, float(value))
+            elif attr.hasFn(OpenMaya.MFn.kEnumAttribute):
+                modifier.newPlugValueShort(plug, int(value))
+            elif attr.hasFn(OpenMaya.MFn.kUnitAttribute):
+                # values are given in ui units, like in pymel
+                unit_type = OpenMaya.MFnUnitAttribute(attr).unitType()
+                if unit_type == OpenMaya.MFnUnitAttribute.kAngle:
+                    modifier.newPlugValueMAngle(plug, OpenMaya.MAngle(float(value), OpenMaya.MAngle.uiUnit()))
+                elif unit_type == OpenMaya.MFnUnitAttribute.kDistance:
+                    modifier.newPlugValueMDistance(plug, OpenMaya.MDistance(float(value), OpenMaya.MDistance.uiUnit()))
+                elif unit_type == OpenMaya.MFnUnitAttribute.kTime:
+                    modifier.newPlugValueMTime(plug, OpenMaya.MTime(float(value), OpenMaya.MTime.uiUnit()))
+                else:
+                    return False
+            elif (
+                    attr.hasFn(OpenMaya.MFn.kTypedAttribute)
+                    and OpenMaya.MFnTypedAttribute(attr).attrType() == OpenMaya.MFnData.kString
+                    and isinstance(value, str)
+            ):
+                modifier.newPlugValueString(plug, value)
+            else:
+                return False
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def commit(self):
+        """ Apply all recorded values and connections in one doIt(). """
+        modifier = OpenMaya.MDGModifier()
+        fallback = []
+        converted = []
+        for plug, values, plug_name in self.values:
+            if not self.add_value(modifier, plug, values):
+                fallback.append((plug_name, values))
+        for src, dst in self.connections.values():
+            if needs_unit_conversion(src, dst):
+                converted.append((src, dst))
+                continue
+            if dst.isDestination:
+                modifier.disconnect(dst.source(), dst)  # like connectAttr(force=True)
+            modifier.connect(src, dst)
+        modifier.doIt()
+        for plug_name, values in fallback:
+            pm.PyNode(plug_name).set(*values)
+        for src, dst in converted:
+            cmds.connectAttr(src.name(), dst.name(), force=True)
+        self.values = []
+        self.connections = {}
+        self.plugs = {}
+
+
+@contextlib.contextmanager
+def batch():
+    """ Collect the values and connections of all create_node() calls inside the with statement and apply them in one
+        go at the end. Nothing is connected or set before the with statement ends, so don't query the new network
+        inside of it. Nested batches are committed by the outermost one.
+        Usage:
+        with connectutl.batch():
+            mdl = create_node('multDoubleLinear', i1='pCube1.tx', i2=2)
+            create_node('addDoubleLinear', i1=mdl.o, i2=1, o='pCube1.ty')
+    """
+    if _BATCHES:
+        yield _BATCHES[-1]
+        return
+    builder = NetworkBuilder()
+    _BATCHES.append(builder)
+    try:
+        yield builder
+    finally:
+        _BATCHES.pop()
+    builder.commit()
+
+
+class NetworkTemplate(object):
+    """ A node network that is described once and created many times, each time with a single MDGModifier.doIt().
+
+        Nodes are added with the same keyword conventions as create_node(). Values starting with '$' are inputs of
+        the template, values of the form '<label>.<attr>' are connections to other nodes in the template (use '->'
+        for outgoing connections), everything else is set as default value.
+        Usage:
+        tmp = NetworkTemplate('double')
+        tmp.add_node('multDoubleLinear', 'Double_MDL', i1='$input', i2=2)
+        tmp.add_node('addDoubleLinear', 'Offset_ADL', i1='Double_MDL.o', i2=1)
+        tmp.add_output('output', 'Offset_ADL.o')
+        outputs = tmp.instantiate('C_test_', inputs={'input': 'pCube1.tx'}, outputs={'output': 'pCube1.ty'})
+    """
+    def __init__(self, name):
+        self.name = name
+        self.nodes = {}  # label: node type, the node is called <prefix><label>
+        self.values = []  # (label, attr, [values])
+        self.connections = []  # (src label, src attr, dst label, dst attr)
+        self.inputs = {}  # input name: [(label, attr), ]
+        self.outputs = {}  # output name: (label, attr)
+        self._attributes = {}  # (node type, attr name): attribute MObject
+
+    def add_node(self, typ, label, **attrs):
+        """ Add a node to the template, see create_node() for the attribute keywords. """
+        self.nodes[label] = typ
+        for attr_name, val in attrs.items():
+            if val is None:
+                continue
+            attr_name = attr_name.replace('___', ']').replace('__', '[')
+            if isinstance(val, str) and val.startswith('$'):
+                self.inputs.setdefault(val[1:], []).append((label, attr_name))
+            elif isinstance(val, str) and val.replace('->', '').split('.')[0] in self.nodes:
+                other_label, _, other_attr = val.replace('->', '').partition('.')
+                if val.startswith('->'):
+                    self.connections.append((label, attr_name, other_label, other_attr))
+                else:
+                    self.connections.append((other_label, other_attr, label, attr_name))
+            else:
+                self.values.append((label, attr_name, val if isinstance(val, (list, tuple)) else [val]))
+
+    def add_output(self, name, plug):
+        """ Expose the given '<label>.<attr>' plug as output of the template. """
+        label, _, attr_name = plug.partition('.')
+        self.outputs[name] = (label, attr_name)
+
+    def get_attribute(self, typ, attr_name):
+        """ Get the attribute MObject of the given node type, cached for all instances. """
+        key = (typ, attr_name)
+        if key not in self._attributes:
+            self._attributes[key] = OpenMaya.MNodeClass(typ).attribute(attr_name)
+        return self._attributes[key]
+
+    def get_plug(self, mobjs, label, attr_path):
+        """ Get the MPlug for e.g. 'i1[0]' or 'i3[1].x' on the node with the given label. """
+        plug = None
+        for part in attr_path.split('.'):
+            attr_name, _, index = part.partition('[')
+            attr = self.get_attribute(self.nodes[label], attr_name)
+            plug = OpenMaya.MPlug(mobjs[label], attr) if plug is None else plug.child(attr)
+            if index:
+                plug = plug.elementByLogicalIndex(int(index[:-1]))
+        return plug
+
+    def instantiate(self, prefix, inputs=None, outputs=None):
+        """ Create the network in the scene.
+            :param prefix: str - name prefix for all nodes, e.g. 'L_arm_softClip'
+            :param inputs: {input name: plug or value} - plugs (pm.Attribute or str) are connected, values are set
+            :param outputs: {output name: plug} - connect the outputs to these plugs
+            :return: {output name: pm.Attribute}
+        """
+        modifier = OpenMaya.MDGModifier()
+        mobjs = {}
+        for label, typ in self.nodes.items():
+            mobjs[label] = modifier.createNode(typ)
+            modifier.renameNode(mobjs[label], f'{prefix}{label}')
+
+        fallback = []
+        for label, attr_name, values in self.values:
+            if not NetworkBuilder.add_value(modifier, self.get_plug(mobjs, label, attr_name), values):
+                fallback.append((label, attr_name, values))
+
+        connections = [
+            (self.get_plug(mobjs, src, src_attr), self.get_plug(mobjs, dst, dst_attr))
+            for src, src_attr, dst, dst_attr in self.connections
+        ]
+        for name, val in (inputs or {}).items():
+            ext_plug = None
+            if isinstance(val, (str, pm.Attribute)):
+                sel = OpenMaya.MSelectionList()
+                sel.add(str(val))
+                ext_plug = sel.getPlug(0)
+            for label, attr_name in self.inputs[name]:
+                plug = self.get_plug(mobjs, label, attr_name)
+                if ext_plug is None:
+                    if not NetworkBuilder.add_value(modifier, plug, val if isinstance(val, (list, tuple)) else [val]):
+                        fallback.append((label, attr_name, val if isinstance(val, (list, tuple)) else [val]))
+                else:
+                    connections.append((ext_plug, plug))
+        for name, val in (outputs or {}).items():
+            sel = OpenMaya.MSelectionList()
+            sel.add(str(val))
+            connections.append((self.get_plug(mobjs, *self.outputs[name]), sel.getPlug(0)))
+
+        converted = []
+        for src, dst in connections:
+            if needs_unit_conversion(src, dst):
+                converted.append((src, dst))
+                continue
+            if dst.isDestination:
+                modifier.disconnect(dst.source(), dst)
+            modifier.connect(src, dst)
+        modifier.doIt()
+
+        names = {label: OpenMaya.MFnDependencyNode(mobj).name() for label, mobj in mobjs.items()}
+        for label, attr_name, values in fallback:
+            pm.PyNode(f'{names[label]}.{attr_name}').set(*values)
+        for src, dst in converted:
+            cmds.connectAttr(src.name(), dst.name(), force=True)
+        return {name: pm.PyNode(f'{names[label]}.{attr_name}') for name, (label, attr_name) in self.outputs.items()}
+
+
+def _set_or_connect(plug_name, val):
+    """ Set or connect the given plug (str), see create_node(). """
+    # attr or value
+    other = str(val) if isinstance(val, (str, pm.Attribute)) else None
+    if other and cmds.objExists(other.replace('->', '').replace('<-', '')):
+        # check if it's an input- or output attribute, then connect attribute
+        if other.startswith('->'):
+            is_input_attr = False
+            other = other[2:]
+        elif other.startswith('<-'):
+            is_input_attr = True
+            other = other[2:]
+        else:
+            node, _, attr_path = plug_name.partition('.')
+            is_input_attr = cmds.attributeQuery(attr_path.split('.')[-1].split('[')[0], node=node, w=True)
+        if is_input_attr:
+            sceneutl.connect(other, plug_name)
+        else:
+            sceneutl.connect(plug_name, other)
+    else:
+        # set value(s)
+        sceneutl.set_attr(plug_name, *(val if isinstance(val, (list, tuple)) else [val]))
 
 
 def create_node(*args, **kwargs):
@@ -8,6 +359,7 @@ def create_node(*args, **kwargs):
     connectiutl.create_node('multiplyDivide', i1x=.5, i2x='pCube1.tx', ox='locator1.ty')
     # in array attributes use double underscore for open brackets and triple underscore for close brackets
     connectiutl.create_node('blendTwoAttr', i__0___=.5, i__1___='pCube1.tx')
+    # inside a batch(), all values and connections are applied at the end of the with statement
     """
     # separate the original flags from the create_node() function from the attributes
     flags = {}
@@ -19,7 +371,16 @@ def create_node(*args, **kwargs):
             attrs[k] = v
 
     # create
-    node = pm.createNode(*args, **flags)
+    builder = _BATCHES[-1] if _BATCHES else None
+    if (
+            builder
+            and len(args) == 1
+            and set(flags) <= {'name', 'n', 'skipSelect', 'ss'}
+            and not builder.is_dag_type(args[0])
+    ):
+        node = builder.create_node(args[0], name=flags.get('name', flags.get('n')))
+    else:
+        node = pm.PyNode(cmds.createNode(*args, **{k: str(v) if isinstance(v, pm.PyNode) else v for k, v in flags.items()}))
 
     # set/connect attrs
     for attrName, val in attrs.items():
@@ -27,91 +388,174 @@ def create_node(*args, **kwargs):
             # This is for when you want to use one of the xxxconnect functions but ignore one input
             continue
         # convert characters for array attributes
-        attr = node.attr(attrName.replace('___', ']').replace('__', '['))
-        # attr or value
-        if pm.objExists(str(val).replace('->', '').replace('<-', '')):
-            # check if it's an input- or output attribute, then connect attribute
-            if val.startswith('->'):
-                is_input_attr = False
-                val = val[2:]
-            elif val.startswith('<-'):
-                is_input_attr = True
-                val = val[2:]
-            else:
-                is_input_attr = pm.attributeQuery(attr.attrName().split('[')[0], node=node, w=True)
-            if is_input_attr:
-                pm.connectAttr(val, attr, force=True)
-            else:
-                pm.connectAttr(attr, val, force=True)
+        attr_name = attrName.replace('___', ']').replace('__', '[')
+        if builder:
+            builder.set_or_connect(node, attr_name, val)
         else:
-            # set value(s)
-            if not isinstance(val, (list, tuple)):
-                val = [val]
-            attr.set(*val)
-            # pm.setAttr('%s.%s' % (node, attr), *val)
+            _set_or_connect(f'{node}.{attr_name}', val)
 
     return node
 
 
-def driven_keys(driver, driven=(), v=(), dv=(), tangents='linear'):
+def _to_internal_units(value, unit_type):
+    """ Convert a value in ui units to the internal units that MFnAnimCurve uses. """
+    if unit_type == OpenMaya.MFnUnitAttribute.kAngle:
+        return OpenMaya.MAngle(value, OpenMaya.MAngle.uiUnit()).asRadians()
+    if unit_type == OpenMaya.MFnUnitAttribute.kDistance:
+        return OpenMaya.MDistance(value, OpenMaya.MDistance.uiUnit()).asCentimeters()
+    return value
+
+
+def _create_driven_curve(driven_plug, unit_type, v, dv, tangents):
+    """ Create an unconnected animCurve with unitless input and add all keys to it.
+        :return: MFnAnimCurve
+    """
+    fn = OpenMayaAnim.MFnAnimCurve()
+    fn.create(DRIVEN_CURVE_TYPES[unit_type])
+    # same name as from setDrivenKeyframe, the drivenKeys rigdata is matched by name
+    name = driven_plug.partialName(includeNodeName=True, useLongNames=True)
+    fn.setName(name.replace('|', '_').replace('.', '_').replace('[', '_').replace(']', ''))
+    tangent = TANGENT_TYPES[tangents]
+    for value, driver_value in zip(v, dv):
+        fn.addKey(float(driver_value), _to_internal_units(value, unit_type), tangent, tangent)
+    return fn
+
+
+def _set_driven_keyframes(driver, driven_attr, v, dv, tangents):
+    """ Driven keys with setDrivenKeyframe, adds a blendWeighted if the driven plug has driven keys already. """
+    dn, at = driven_attr.split('.', 1)
+    for value, driverValue in zip(v, dv):
+        pm.setDrivenKeyframe(dn, cd=driver, at=at, v=value, dv=driverValue, ott=tangents, itt=tangents)
+    return pm.listConnections(driven_attr, s=True, d=False, p=False)
+
+
+def driven_keys(driver, driven=(), v=(), dv=(), tangents='linear', shared=False):
     """
     Creates driven keys in less lines.
+    The animCurves are created and keyed with MFnAnimCurve and connected with a single modifier, instead of one
+    setDrivenKeyframe call per key. Driven plugs that are connected already (e.g. keyed by another driver) still use
+    setDrivenKeyframe, so maya blends the drivers like before.
+    :param driver: Attribute or str - the driver plug
+    :param driven: [Attribute or str, ] - driven plug(s)
+    :param v: [float, ] - driven values in ui units
+    :param dv: [float, ] - driver values in ui units
+    :param tangents: str - one of TANGENT_TYPES
+    :param shared: bool - drive all driven plugs with one animCurve per unit type (angle, distance, unitless)
+    :return: [PyNode, ] - the animCurves
     """
     if not isinstance(driven, (list, tuple)):
         driven = [driven]
+    driver_plug = sceneutl.get_plug(driver)
+    modifier = OpenMaya.MDGModifier()
+    converted = []  # driver connections that need a unitConversion
     anim_crv_nodes = []
-    for drivenAttr in driven:
-        dn, at = drivenAttr.split('.')
-        for value, driverValue in zip(v, dv):
-            pm.setDrivenKeyframe(dn, cd=driver, at=at, v=value, dv=driverValue, ott=tangents, itt=tangents)
-        acn = pm.listConnections(drivenAttr, s=True, d=False, p=False)
-        anim_crv_nodes += acn
-    return anim_crv_nodes
+    shared_fns = {}  # unit type: MFnAnimCurve
+    for driven_attr in driven:
+        driven_attr = sceneutl.name(driven_attr)
+        driven_plug = sceneutl.get_plug(driven_attr)
+        unit_type = get_unit_type(driven_plug)
+        if driven_plug.isDestination or unit_type not in DRIVEN_CURVE_TYPES or tangents not in TANGENT_TYPES:
+            anim_crv_nodes += _set_driven_keyframes(driver, driven_attr, v, dv, tangents)
+            continue
+        fn = shared_fns.get(unit_type) if shared else None
+        if fn is None:
+            fn = _create_driven_curve(driven_plug, unit_type, v, dv, tangents)
+            shared_fns[unit_type] = fn
+            input_plug = fn.findPlug('input', False)
+            if needs_unit_conversion(driver_plug, input_plug):
+                converted.append(input_plug.name())
+            else:
+                modifier.connect(driver_plug, input_plug)
+            anim_crv_nodes.append(fn.name())
+        modifier.connect(fn.findPlug('output', False), driven_plug)
+    modifier.doIt()
+    for input_plug in converted:
+        cmds.connectAttr(sceneutl.name(driver), input_plug, force=True)
+    return [pm.PyNode(n) if isinstance(n, str) else n for n in anim_crv_nodes]
 
 
 def simple_matrix_constraint(driver, driven):
     """ Simple world matrix matching connections. """
     parent = pm.listRelatives(driven, p=True)[0]
-    mmx = create_node(
-        'multMatrix',
-        matrixIn__0___=driver.wm[0],
-        matrixIn__1___=parent.wim[0],
-    )
-    create_node(
-        'decomposeMatrix',
-        inputMatrix=mmx.matrixSum,
-        outputTranslate=driven.t,
-        outputRotate=driven.r,
-        outputScale=driven.s,
-        outputShear=driven.shear
-    )
-    if hasattr(driven, 'jointOrient'):
-        # create extra network for rotation that takes joint orient into account
-        com = create_node(
-            'composeMatrix',
-            inputRotateX=driven.jointOrientX.get(),
-            inputRotateY=driven.jointOrientY.get(),
-            inputRotateZ=driven.jointOrientZ.get(),
-        )
-        mmx2 = create_node(
-            'multMatrix',
-            matrixIn__0___=com.outputMatrix,
-            matrixIn__1___=parent.wm[0],
-        )
-        ivm = create_node(
-            'inverseMatrix',
-            inputMatrix=mmx2.matrixSum
-        )
-        mmx3 = create_node(
+    with batch():
+        mmx = create_node(
             'multMatrix',
             matrixIn__0___=driver.wm[0],
-            matrixIn__1___=ivm.outputMatrix,
+            matrixIn__1___=parent.wim[0],
         )
         create_node(
             'decomposeMatrix',
-            inputMatrix=mmx3.matrixSum,
+            inputMatrix=mmx.matrixSum,
+            outputTranslate=driven.t,
             outputRotate=driven.r,
+            outputScale=driven.s,
+            outputShear=driven.shear
         )
+        if hasattr(driven, 'jointOrient'):
+            # create extra network for rotation that takes joint orient into account
+            com = create_node(
+                'composeMatrix',
+                inputRotateX=driven.jointOrientX.get(),
+                inputRotateY=driven.jointOrientY.get(),
+                inputRotateZ=driven.jointOrientZ.get(),
+            )
+            mmx2 = create_node(
+                'multMatrix',
+                matrixIn__0___=com.outputMatrix,
+                matrixIn__1___=parent.wm[0],
+            )
+            ivm = create_node(
+                'inverseMatrix',
+                inputMatrix=mmx2.matrixSum
+            )
+            mmx3 = create_node(
+                'multMatrix',
+                matrixIn__0___=driver.wm[0],
+                matrixIn__1___=ivm.outputMatrix,
+            )
+            create_node(
+                'decomposeMatrix',
+                inputMatrix=mmx3.matrixSum,
+                outputRotate=driven.r,
+            )
+
+
+def _soft_clip_template():
+    """ See soft_clip_single() for the math. """
+    tmp = NetworkTemplate('softClip')
+    tmp.add_node('plusMinusAverage', 'ClipRange_PMA', i1__0___='$end', i1__1___='$start', op=2)
+    tmp.add_node('plusMinusAverage', 'OffsetInput_PMA', i1__0___='$input', i1__1___='$start', op=2)
+    tmp.add_node('multDoubleLinear', 'RangeScale_MDL', i1='ClipRange_PMA.o1', i2=1.5)
+    tmp.add_node('multiplyDivide', 'Normalize_MDL', i1x='OffsetInput_PMA.o1', i2x='RangeScale_MDL.o', op=2)
+    tmp.add_node('multiplyDivide', 'Power3_MDL', i1x='Normalize_MDL.ox', i2x=3, op=3)
+    tmp.add_node('multiplyDivide', 'Divide3_MDL', i1x='Power3_MDL.ox', i2x=3, op=2)
+    tmp.add_node('plusMinusAverage', 'Minus_PMA', i1__0___='Normalize_MDL.ox', i1__1___='Divide3_MDL.ox', op=2)
+    tmp.add_node('multDoubleLinear', 'RangeRestore_MDL', i1='Minus_PMA.o1', i2='RangeScale_MDL.o')
+    tmp.add_node(
+        'condition',
+        'ClipRange_CND',
+        ft='Normalize_MDL.ox',
+        st=1,
+        op=4,
+        ctr='RangeRestore_MDL.o',
+        cfr='ClipRange_PMA.o1'
+    )
+    tmp.add_node('addDoubleLinear', 'OffsetOutput_ADL', i1='$start', i2='ClipRange_CND.ocr')
+    tmp.add_node('condition', 'SwapOperation_CND', ft='$start', st='$end', op=4, ctr=4, cfr=2)
+    tmp.add_node(
+        'condition',
+        'FullRange_CND',
+        ft='$input',
+        st='$start',
+        op='SwapOperation_CND.ocr',
+        ctr='$input',
+        cfr='OffsetOutput_ADL.o'
+    )
+    tmp.add_output('output', 'FullRange_CND.ocr')
+    return tmp
+
+
+SOFT_CLIP_TEMPLATE = _soft_clip_template()
 
 
 def soft_clip_single(
@@ -150,54 +594,12 @@ def soft_clip_single(
     start_plug = attrs_holder.attr(f'{label}Start')
     end_plug = attrs_holder.attr(f'{label}End')
 
-    clip_range_pma = create_node(
-        'plusMinusAverage', i1__0___=end_plug, i1__1___=start_plug, op=2, n=f'{module_key}_{label}ClipRange_PMA')
-    offset_inout_pma = create_node(
-        'plusMinusAverage', i1__0___=input_plug, i1__1___=start_plug, op=2, n=f'{module_key}_{label}OffsetInput_PMA')
-    scale_range_mdl = create_node(
-        'multDoubleLinear', i1=clip_range_pma.o1, i2=1.5, n=f'{module_key}_{label}RangeScale_MDL')
-    normalize_mlt = create_node(
-        'multiplyDivide', i1x=offset_inout_pma.o1, i2x=scale_range_mdl.o, op=2, n=f'{module_key}_{label}Normalize_MDL')
-    power_3_mlt = create_node(
-        'multiplyDivide', i1x=normalize_mlt.ox, i2x=3, op=3, n=f'{module_key}_{label}Power3_MDL')
-    div_3_mlt = create_node(
-        'multiplyDivide', i1x=power_3_mlt.ox, i2x=3, op=2, n=f'{module_key}_{label}Divide3_MDL')
-    minus_pma = create_node(
-        'plusMinusAverage', i1__0___=normalize_mlt.ox, i1__1___=div_3_mlt.ox, op=2, n=f'{module_key}_{label}Minus_PMA')
-    restore_range_mdl = create_node(
-        'multDoubleLinear', i1=minus_pma.o1, i2=scale_range_mdl.o, n=f'{module_key}_{label}RangeRestore_MDL')
-    clip_range_cnd = create_node(
-        'condition',
-        ft=normalize_mlt.ox,
-        st=1,
-        op=4,
-        ctr=restore_range_mdl.o,
-        cfr=clip_range_pma.o1,
-        n=f'{module_key}_{label}ClipRange_CND'
-    )
-    offset_output_adl = create_node(
-        'addDoubleLinear', i1=start_plug, i2=clip_range_cnd.ocr, n=f'{module_key}_{label}OffsetOutput_ADL')
-    swap_op_cnd = create_node(
-        'condition',
-        ft=start_plug,
-        st=end_plug,
-        op=4,
-        ctr=4,
-        cfr=2,
-        n=f'{module_key}_{label}SwapOperation_CND'
+    outputs = SOFT_CLIP_TEMPLATE.instantiate(
+        prefix=f'{module_key}_{label}',
+        inputs={'input': input_plug, 'start': start_plug, 'end': end_plug},
+        outputs={'output': output_plug} if output_plug else None
     )
-    full_range_cnd = create_node(
-        'condition',
-        ft=input_plug,
-        st=start_plug,
-        op=swap_op_cnd.ocr,
-        ctr=input_plug,
-        cfr=offset_output_adl.o,
-        n=f'{module_key}_{label}FullRange_CND'
-    )
-    if output_plug:
-        full_range_cnd.ocr >> output_plug
-    return full_range_cnd.ocr
+    return outputs['output']
 
 
 def soft_clip_double(
@@ -1,6 +1,12 @@
 import pymel.core as pm
+from maya import cmds
+from maya.api import OpenMaya
 
-from rigbaukasten.utils import errorutl
+from rigbaukasten.utils import connectutl, errorutl, sceneutl
+
+
+MATRIX_CONSTRAINTS = False  # use matrix_constraint() in parent_constraint(), see set_matrix_constraints()
+MATRIX_CONSTRAINTS_API_VERSION = 20200000  # offsetParentMatrix and blendMatrix exist since maya 2020
 
 
 def get_driven_obj(constraint):
@@ -91,3 +97,129 @@ def create_constraints_from_data(data):
                 con = create_constraint(driver, driven, w=w, mo=True)[0]
                 if pm.objExists(f'{con}.interpType'):
                     con.interpType.set(2)
+
+
+def supports_matrix_constraints():
+    return int(cmds.about(apiVersion=True)) >= MATRIX_CONSTRAINTS_API_VERSION
+
+
+def set_matrix_constraints(enabled):
+    """ Switch parent_constraint() between parent/scale constraints and matrix connections into offsetParentMatrix.
+        Maya versions without offsetParentMatrix always use constraints.
+    """
+    global MATRIX_CONSTRAINTS
+    if enabled and not supports_matrix_constraints():
+        pm.warning('Matrix constraints need maya 2020 or newer, using parent and scale constraints instead.')
+        enabled = False
+    MATRIX_CONSTRAINTS = enabled
+
+
+def _get_matrix(plug):
+    return OpenMaya.MMatrix(cmds.getAttr(plug))
+
+
+def _matrix_values(matrix):
+    return [matrix[i] for i in range(16)]
+
+
+def _set_or_connect(plug, value):
+    if isinstance(value, (str, pm.Attribute)):
+        sceneutl.connect(value, plug)
+    else:
+        sceneutl.set_attr(plug, value)
+
+
+def matrix_constraint(drivers, driven, mo=True, scale=True, target_weights=()):
+    """ Drive the world matrix of driven by the drivers through its offsetParentMatrix, without constraint nodes.
+        The current local transform of driven is compensated, so its channels stay untouched and free.
+        :param drivers: [PyNode, ] - driver transforms, more than one are blended with a blendMatrix
+        :param driven: PyNode - the driven transform
+        :param mo: bool - maintain offset, keep the current world matrix of driven instead of snapping to the drivers
+        :param scale: bool - include the scale of the drivers, else only translate and rotate are driven (a
+                             pickMatrix removes scale and shear), like a parentConstraint without scaleConstraint
+        :param target_weights: [float or Attribute, ] - blendMatrix weight of every driver after the first
+        :return: [PyNode, ] - the created matrix nodes
+    """
+    if not isinstance(drivers, (list, tuple)):
+        drivers = [drivers]
+    driven_name = sceneutl.name(driven)
+    prefix = driven_name.rsplit('_', 1)[0]
+    driven_world = _get_matrix(f'{driven_name}.worldMatrix[0]')
+    nodes = []
+
+    driver_plugs = []
+    for driver in drivers:
+        driver_plug = f'{sceneutl.name(driver)}.worldMatrix[0]'
+        offset = driven_world * _get_matrix(f'{sceneutl.name(driver)}.worldInverseMatrix[0]') if mo else None
+        if offset is None or offset.isEquivalent(OpenMaya.MMatrix.kIdentity):
+            driver_plugs.append(driver_plug)
+            continue
+        if len(drivers) == 1:
+            driver_plugs.append((offset, driver_plug))  # combined with the local compensation below
+            continue
+        mmx = connectutl.create_node('multMatrix', matrixIn__1___=driver_plug, n=f'{prefix}{len(nodes)}Offset_MMX')
+        _set_or_connect(f'{mmx}.matrixIn[0]', _matrix_values(offset))
+        nodes.append(mmx)
+        driver_plugs.append(mmx.matrixSum)
+
+    if len(driver_plugs) > 1:
+        bmx = connectutl.create_node('blendMatrix', inputMatrix=driver_plugs[0], n=f'{prefix}Constraint_BMX')
+        for i, driver_plug in enumerate(driver_plugs[1:]):
+            sceneutl.connect(driver_plug, f'{bmx}.target[{i}].targetMatrix')
+            # without weights every driver gets the same share, like in a parentConstraint
+            _set_or_connect(f'{bmx}.target[{i}].weight', target_weights[i] if target_weights else 1.0 / (i + 2))
+        nodes.append(bmx)
+        world_plug = bmx.outputMatrix
+        offset = OpenMaya.MMatrix()
+    elif isinstance(driver_plugs[0], tuple):
+        offset, world_plug = driver_plugs[0]
+    else:
+        world_plug = driver_plugs[0]
+        offset = OpenMaya.MMatrix()
+
+    # world = local * offsetParentMatrix * parentMatrix, so the local transform is compensated in the offset
+    offset = _get_matrix(f'{driven_name}.matrix').inverse() * offset
+    matrices = [] if offset.isEquivalent(OpenMaya.MMatrix.kIdentity) else [_matrix_values(offset)]
+    matrices.append(world_plug)
+    parent = cmds.listRelatives(driven_name, parent=True, fullPath=True)
+    if parent:
+        matrices.append(f'{parent[0]}.worldInverseMatrix[0]')
+    mmx = connectutl.create_node('multMatrix', n=f'{prefix}Constraint_MMX')
+    for i, matrix in enumerate(matrices):
+        _set_or_connect(f'{mmx}.matrixIn[{i}]', matrix)
+    nodes.append(mmx)
+    output = mmx.matrixSum
+    if not scale:
+        # picked in parent space, so driven keeps the scale of its parent and its own scale channels
+        pmx = connectutl.create_node(
+            'pickMatrix', inputMatrix=output, useScale=False, useShear=False, n=f'{prefix}Constraint_PMX'
+        )
+        nodes.append(pmx)
+        output = pmx.outputMatrix
+    sceneutl.connect(output, f'{driven_name}.offsetParentMatrix')
+    return nodes
+
+
+def parent_constraint(drivers, driven, mo=True, scale=True, weights=()):
+    """ Parent (and scale) constrain driven to the drivers. If the rig uses matrix constraints (see
+        set_matrix_constraints()), the drivers are connected with matrix_constraint() instead, which uses the
+        weights of the drivers after the first as blendMatrix weights. That gives the same result as the
+        constraints for two drivers whose weights add up to 1, e.g. fk/ik blends.
+        :param drivers: [PyNode, ] or PyNode - driver transforms
+        :param driven: PyNode - the driven transform
+        :param mo: bool - maintain offset of the parent constraint, the scale constraint never keeps an offset
+        :param scale: bool - add a scale constraint
+        :param weights: [float or Attribute, ] - weight per driver
+        :return: [PyNode, ] - the created constraint or matrix nodes
+    """
+    if not isinstance(drivers, (list, tuple)):
+        drivers = [drivers]
+    if MATRIX_CONSTRAINTS:
+        return matrix_constraint(drivers, driven, mo=mo, scale=scale, target_weights=weights[1:])
+    constraints = [(pm.parentConstraint, pm.parentConstraint(*drivers, driven, mo=mo))]
+    if scale:
+        constraints.append((pm.scaleConstraint, pm.scaleConstraint(*drivers, driven)))
+    for create_constraint, constraint in constraints:
+        for plug, weight in zip(create_constraint(constraint, q=True, wal=True), weights):
+            _set_or_connect(str(plug), weight)
+    return [constraint for _, constraint in constraints]
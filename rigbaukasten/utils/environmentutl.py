@@ -4,9 +4,7 @@ import sys
 import abc
 import glob
 
-from PySide2 import QtWidgets
-import pymel.core as pm
-from rigbaukasten.utils import errorutl, pysideutl
+from rigbaukasten.utils import errorutl
 
 
 class AbstractEnvironment(metaclass=abc.ABCMeta):
@@ -51,6 +49,18 @@ class AbstractEnvironment(metaclass=abc.ABCMeta):
         """ Set the environment so all the methods above have enough data to work properly. """
         pass
 
+    def get_build_cache_path(self, cache=None):
+        """ Return the path to a folder where rigbaukasten can store build caches and reports for the current asset
+            (e.g. build profiles). This is not rig data, everything in here can safely be deleted.
+            Overwrite this if the caches should not live next to the rig data.
+            :param cache: (str) Immediately get the path to the given cache (e.g. 'profiles') instead of the
+                                root directory of the caches.
+        """
+        cache_path = os.path.join(os.path.dirname(self.get_rigdata_path()), 'rigcache')
+        if cache:
+            cache_path = os.path.join(cache_path, cache)
+        return cache_path
+
 
 class Environment(AbstractEnvironment):
     def __init__(self):
@@ -126,91 +136,17 @@ class Environment(AbstractEnvironment):
             sys.path.append(project_scripts_path)
         return rig_builds_path
 
-    def set(self, *args, **kwargs):
-        x = ProjectSetterUi()
-        if x.exec_():
+    def set(self, *args, project_path=None, asset_type=None, asset_name=None, **kwargs):
+        """ Show the project setter UI. If project_path, asset_type and asset_name are given, set them directly
+            without a UI instead (e.g. in batch mode).
+        """
+        if project_path and asset_type and asset_name:
+            self._project_path, self._asset_type, self._asset_name = project_path, asset_type, asset_name
+        else:
+            from rigbaukasten.tools import projectsettertool  # Qt and pymel are only needed for the UI
+            x = projectsettertool.ProjectSetterUi()
+            if not x.exec_():
+                return
             self._project_path, self._asset_type, self._asset_name = x.results()
 
-            print(f'Now working on {self.asset_type}/{self.asset_name} in {self.project_path}')
-
-
-class ProjectSetterUi(pysideutl.MayaDialog):
-    def __init__(self):
-        super().__init__()
-
-        self.setModal(True)
-        self.setWindowTitle('Rigbaukasten Project Setter')
-
-        title_layout = QtWidgets.QVBoxLayout()
-        self.setLayout(title_layout)
-        title_layout.setContentsMargins(0, 0, 0, 0)
-        title_layout.addWidget(pysideutl.TitleLabel('Set Project'))
-
-        base_widget = QtWidgets.QWidget()
-        base_lay = QtWidgets.QVBoxLayout()
-        base_widget.setLayout(base_lay)
-        title_layout.addWidget(base_widget)
-
-        path_lbl = QtWidgets.QLabel('Project Path:')
-        base_lay.addWidget(path_lbl)
-
-        path_widget = QtWidgets.QWidget()
-        path_lay = QtWidgets.QHBoxLayout()
-        path_widget.setLayout(path_lay)
-        self.path_lne = QtWidgets.QLineEdit()
-        self.path_lne.setPlaceholderText('/my/fancy/project')
-        self.path_lne.setText(pm.workspace(query=1, rootDirectory=1).replace('/', os.sep).replace('\\', os.sep))
-        path_lay.addWidget(self.path_lne)
-        path_btn = QtWidgets.QPushButton('...')
-        path_btn.setFixedWidth(30)
-        path_btn.clicked.connect(self.set_path)
-        path_lay.addWidget(path_btn)
-        base_lay.addWidget(path_widget)
-
-        asset_type_lbl = QtWidgets.QLabel('Asset Type:')
-        base_lay.addWidget(asset_type_lbl)
-
-        self.asset_type_cmb = QtWidgets.QComboBox()
-        base_lay.addWidget(self.asset_type_cmb)
-
-        asset_lbl = QtWidgets.QLabel('Asset Name:')
-        base_lay.addWidget(asset_lbl)
-
-        self.asset_cmb = QtWidgets.QComboBox()
-        base_lay.addWidget(self.asset_cmb)
-
-        self.update_asset_type_cmb()
-        self.update_asset_cmb()
-        self.asset_type_cmb.currentIndexChanged.connect(self.update_asset_cmb)
-
-        btn = QtWidgets.QPushButton('OK')
-        btn.clicked.connect(self.accept)
-        base_lay.addWidget(btn)
-
-    def results(self):
-        project_path = self.path_lne.text().strip()
-        asset_type = self.asset_type_cmb.currentText().strip()
-        asset_name = self.asset_cmb.currentText().strip()
-        return project_path, asset_type, asset_name
-
-    def set_path(self):
-        proj_path = pm.fileDialog2(fm=2, cap='Choose Project', okc='OK')[0].replace('/', os.sep).replace('\\', os.sep)
-        self.path_lne.setText(proj_path)
-        self.update_asset_type_cmb()
-        self.update_asset_cmb()
-
-    def update_asset_type_cmb(self):
-        self.asset_type_cmb.clear()
-        folder = self.path_lne.text()
-        if os.path.exists(folder):
-            types = [a for a in os.listdir(folder) if a in ('characters', 'vehicles', 'props')]
-            for typ in types:
-                self.asset_type_cmb.addItem(typ)
-
-    def update_asset_cmb(self):
-        self.asset_cmb.clear()
-        folder = os.path.join(self.path_lne.text(), self.asset_type_cmb.currentText().strip())
-        if os.path.exists(folder):
-            assets = [a for a in os.listdir(folder) if '.' not in a]
-            for asset in assets:
-                self.asset_cmb.addItem(asset)
+        print(f'Now working on {self.asset_type}/{self.asset_name} in {self.project_path}')
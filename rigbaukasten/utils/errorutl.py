@@ -44,3 +44,8 @@ class RbkEnvironmentError(RbkBaseException):
 class RbkInvalidObjectError(RbkBaseException):
     """ Raise this if a given object doesn't meet the requirements. """
     pass
+
+
+class RbkDependencyError(RbkBaseException):
+    """ Raise this if the dependencies between rig modules cannot be resolved (e.g. cyclic hooks). """
+    pass
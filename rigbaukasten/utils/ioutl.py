@@ -1,14 +1,129 @@
+import hashlib
+import json
 import os
 
+try:
+    import numpy as np
+except ImportError:  # mayapy ships without numpy before maya 2022, the binary formats are not available then
+    np = None
+
+HAS_NUMPY = np is not None
+NPZ_HEADER_KEY = 'header'
+HEADER_EXT = '.hdr'
+
+
+def get_version(name, file_prefix=''):
+    """ Get the version number of the given versioned file or folder name, e.g. 'ctls_v012' -> 12.
+        :return: int or None if the name is not <file_prefix><number>
+    """
+    if not name.startswith(file_prefix):
+        return None
+    number = name[len(file_prefix):]
+    return int(number) if number.isdigit() else None
+
 
 def get_latest_folder(folder, file_prefix=None):
+    """ Get the folder with the highest version number (numeric, so v1000 comes after v999). """
     if not os.path.exists(folder):
         return None
-    versions = os.listdir(folder)
-    if file_prefix:
-        versions = [a for a in versions if a.startswith(file_prefix)]
+    versions = [(get_version(a, file_prefix or ''), a) for a in os.listdir(folder)]
+    versions = [v for v in versions if v[0] is not None]
     if not versions:
         return None
-    versions.sort()
-    latest = os.path.join(folder, versions[-1])
+    latest = os.path.join(folder, max(versions)[1])
     return latest
+
+
+def write_json_atomic(path, data):
+    """ Write the given data to a temp file and move it in place, so readers never see a half written file. """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+    return path
+
+
+def link_to_blob(path, blob_folder, checksum):
+    """ Store the given file in a content addressed folder (<blob_folder>/<checksum[:2]>/<checksum>) and replace it
+        with a hard link to the stored blob, so identical files are only stored once.
+        If the file system does not support hard links, the file is left as it is.
+        :return: str - path of the blob or None if it could not be linked
+    """
+    blob_path = os.path.join(blob_folder, checksum[:2], checksum)
+    try:
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.link(path, blob_path)
+        elif not os.path.samefile(path, blob_path):
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            os.link(blob_path, tmp_path)
+            os.replace(tmp_path, path)
+    except OSError:
+        return None
+    return blob_path
+
+
+def write_npz(path, header, **arrays):
+    """ Write the given numpy arrays and a json header to a compressed .npz file.
+        :param path: str - file path, should end with .npz
+        :param header: dict - json serializable meta data, can be read without loading the arrays
+        :param arrays: numpy arrays to store
+    """
+    np.savez_compressed(path, **{NPZ_HEADER_KEY: np.array(json.dumps(header))}, **arrays)
+    return path
+
+
+def read_npz(path, header_only=False, names=None):
+    """ Read a file that was written with write_npz().
+        :param path: str - file path
+        :param header_only: bool - only read the json header, don't load the arrays
+        :param names: [str, ] - only load these arrays, default is all
+        :return: header dict if header_only, else (header, {name: array})
+    """
+    with np.load(path, allow_pickle=False) as npz:  # npz files are zip archives, arrays are only read on access
+        header = json.loads(str(npz[NPZ_HEADER_KEY]))
+        if header_only:
+            return header
+        names = npz.files if names is None else [n for n in names if n in npz.files]
+        arrays = {k: npz[k] for k in names if k != NPZ_HEADER_KEY}
+    return header, arrays
+
+
+def file_checksum(path):
+    """ Get the sha1 of the given files content. """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def arrays_checksum(arrays):
+    """ Get the sha1 of the given numpy arrays (dict), independent of the file they are stored in. """
+    sha = hashlib.sha1()
+    for name in sorted(arrays):
+        sha.update(name.encode())
+        sha.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return sha.hexdigest()
+
+
+def write_header(path, header):
+    """ Write a small json header next to the given rig data file (<path>.hdr), so the files meta data can be read
+        without parsing the whole file.
+    """
+    with open(path + HEADER_EXT, 'w') as f:
+        json.dump(header, f, indent=4)
+    return path + HEADER_EXT
+
+
+def read_header(path):
+    """ Read the header of the given rig data file without parsing its payload.
+        For .npz files the header is stored inside the file, for other files in a <path>.hdr file next to it.
+        :return: dict or None if the file has no header (e.g. files that were published before headers existed)
+    """
+    if path.endswith('.npz'):
+        return read_npz(path, header_only=True) if HAS_NUMPY else None
+    if os.path.exists(path + HEADER_EXT):
+        with open(path + HEADER_EXT, 'r') as f:
+            return json.load(f)
+    return None
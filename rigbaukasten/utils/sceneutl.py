@@ -0,0 +1,155 @@
+""" Fast scene access on maya.cmds and OpenMaya 2, for the code that runs thousands of times per build.
+
+    All functions take node and plug names (PyNodes are converted with str()) and return names, so no PyNodes are
+    constructed on the way. Public library functions still return PyNodes, they wrap the result with pm.PyNode() once.
+"""
+import pymel.core as pm
+from maya import cmds
+from maya.api import OpenMaya
+
+
+def name(obj):
+    """ Get the name of the given node or plug (str or PyNode). """
+    return obj if isinstance(obj, str) else str(obj)
+
+
+def exists(obj):
+    return cmds.objExists(name(obj))
+
+
+def create_node(typ, node_name=None, parent=None):
+    """ Create a node without selecting it.
+        :return: str - name of the new node
+    """
+    flags = {'skipSelect': True}
+    if node_name:
+        flags['name'] = node_name
+    if parent:
+        flags['parent'] = name(parent)
+    return cmds.createNode(typ, **flags)
+
+
+def create_group(node_name, parent=None):
+    """ Create an empty transform, like pm.group(em=True). """
+    return create_node('transform', node_name, parent)
+
+
+def set_parent(child, parent=None):
+    """ Parent the child under the given parent, or to the world if parent is None.
+        :return: str - the new name of the child
+    """
+    if parent:
+        return cmds.parent(name(child), name(parent))[0]
+    return cmds.parent(name(child), world=True)[0]
+
+
+def get_attr(plug):
+    """ Get the value of the given plug, compounds are returned as tuple (cmds returns [(x, y, z)]). """
+    value = cmds.getAttr(name(plug))
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], tuple):
+        return value[0]
+    return value
+
+
+def set_attr(plug, *values):
+    """ Set the given value(s) on the plug, like pm.Attribute.set(). Strings, matrices and compounds are supported,
+        other data types are set with pymel.
+    """
+    plug = name(plug)
+    if len(values) == 1 and isinstance(values[0], (list, tuple)):
+        values = tuple(values[0])
+    try:
+        if len(values) == 1 and isinstance(values[0], str):
+            cmds.setAttr(plug, values[0], type='string')
+        elif len(values) == 16:
+            cmds.setAttr(plug, *values, type='matrix')
+        else:
+            cmds.setAttr(plug, *values)
+    except (TypeError, RuntimeError):
+        pm.PyNode(plug).set(*values)
+
+
+def set_flags(plug, lock=None, keyable=None, channel_box=None):
+    """ Set the lock, keyable and channel box state of the plug, in that order. None leaves the state as it is. """
+    plug = name(plug)
+    if lock is not None:
+        cmds.setAttr(plug, lock=lock)
+    if keyable is not None:
+        cmds.setAttr(plug, keyable=keyable)
+    if channel_box is not None:
+        cmds.setAttr(plug, channelBox=channel_box)
+
+
+def add_attr(node, attr_name, **flags):
+    """ Add an attribute with cmds.addAttr().
+        :return: str - plug name
+    """
+    cmds.addAttr(name(node), longName=attr_name, **flags)
+    return f'{name(node)}.{attr_name}'
+
+
+def connect(src, dst, force=True):
+    cmds.connectAttr(name(src), name(dst), force=force)
+
+
+def get_plug(plug):
+    """ Get the OpenMaya.MPlug for the given plug name. """
+    sel = OpenMaya.MSelectionList()
+    sel.add(name(plug))
+    return sel.getPlug(0)
+
+
+def get_descendant_plugs(plug):
+    """ Get the names of all child and element plugs below the given plug, like pm.Attribute.iterDescendants(). """
+    descendants = []
+    stack = [get_plug(plug)]
+    while stack:
+        current = stack.pop()
+        if current.isArray:
+            children = [current.elementByPhysicalIndex(i) for i in range(current.numElements())]
+        elif current.isCompound:
+            children = [current.child(i) for i in range(current.numChildren())]
+        else:
+            children = []
+        for child in children:
+            descendants.append(child.partialName(includeNodeName=True, useLongNames=False, useFullAttributePath=True))
+            stack.append(child)
+    return descendants
+
+
+def get_dag_path(node):
+    sel = OpenMaya.MSelectionList()
+    sel.add(name(node))
+    return sel.getDagPath(0)
+
+
+def get_shape(node):
+    """ Get the first shape below the given transform (or the node itself if it is a shape). """
+    dag_path = get_dag_path(node)
+    if dag_path.node().hasFn(OpenMaya.MFn.kTransform):
+        if not dag_path.numberOfShapesDirectlyBelow():
+            return None
+        dag_path.extendToShape(0)
+    return dag_path.partialPathName()
+
+
+def get_world_matrix(node):
+    """ :return: OpenMaya.MMatrix """
+    return get_dag_path(node).inclusiveMatrix()
+
+
+def get_world_translation(node):
+    return cmds.xform(name(node), q=True, ws=True, t=True)
+
+
+def get_world_rotation(node):
+    return cmds.xform(name(node), q=True, ws=True, ro=True)
+
+
+def set_world_transform(node, translation=None, rotation=None):
+    flags = {}
+    if translation is not None:
+        flags['translation'] = list(translation)
+    if rotation is not None:
+        flags['rotation'] = list(rotation)
+    cmds.xform(name(node), ws=True, **flags)